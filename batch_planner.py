@@ -0,0 +1,150 @@
+# batch_planner.py
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from goal_planner import build_rule_based_plan
+from goal_similarity import reusable_plans
+from inference_client import InferenceClient, InferenceError, InferenceUnavailable
+from plan_cache import get_plan_cache
+from task_parsing import GOAL_PROMPT_PARAMS, goal_prompt, parse_tasks, task_list_params
+
+# --- Batch Planning Configuration ---
+BATCH_SIZE = 8   # goals per padded generate_batch request
+
+
+def find_unplanned_goals(conn) -> list:
+    """(id, title, description) of every goal that has no sub-tasks yet."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT g.id, g.title, g.description FROM goals g
+        WHERE NOT EXISTS (SELECT 1 FROM goal_tasks t WHERE t.goal_id = g.id)
+        ORDER BY g.id
+        """
+    )
+    return cursor.fetchall()
+
+
+def _model_plans(client, batch) -> list:
+    """Task lists for a batch of (id, title, description) goals in one batched request."""
+    texts = client.generate_batch(
+        [goal_prompt(title, desc or "") for _, title, desc in batch],
+        max_new_tokens=GOAL_PROMPT_PARAMS["max_new_tokens"],
+        **task_list_params(GOAL_PROMPT_PARAMS["max_tasks"]),
+    )
+    return [parse_tasks(text)[:GOAL_PROMPT_PARAMS["max_tasks"]] for text in texts]
+
+
+def plan_goals(goals, client: InferenceClient = None, use_model: bool = True, on_progress=None,
+               similar: dict = None) -> dict:
+    """Plan every goal; returns ``{goal_id: (tasks, source)}``.
+
+    Tasks of a near-duplicate goal (``similar``) and cached plans are reused, the rest
+    go to the model in batches of BATCH_SIZE, one batch in flight per service worker
+    process. Goals the model cannot plan (service down, empty output) get the
+    rule-based plan.
+    """
+    client = client or InferenceClient()
+    cache = get_plan_cache()
+    model_id = client.model_id() if use_model and client.is_ready() else None
+    plans, pending = {}, []
+    for goal_id, title, desc in goals:
+        if similar and similar.get(goal_id):
+            plans[goal_id] = (similar[goal_id], "similar")
+            continue
+        cached = cache.get(title, desc or "", model_id, GOAL_PROMPT_PARAMS) if cache and model_id else None
+        if cached:
+            plans[goal_id] = (cached, "cached")
+        else:
+            pending.append((goal_id, title, desc))
+    if on_progress:
+        on_progress(len(plans), len(goals))
+
+    service_down = threading.Event()
+
+    def run(batch):
+        if model_id and not service_down.is_set():
+            try:
+                return _model_plans(client, batch)
+            except (InferenceUnavailable, InferenceError) as e:
+                if not service_down.is_set():
+                    service_down.set()
+                    print(f"AI service unavailable, planning the remaining goals with the rule-based planner: {e}")
+        return [[] for _ in batch]
+
+    batches = [pending[start:start + BATCH_SIZE] for start in range(0, len(pending), BATCH_SIZE)]
+    workers = int(client.last_status.get("workers") or 1) if model_id else 1
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for batch, results in zip(batches, executor.map(run, batches)):
+            for (goal_id, title, desc), tasks in zip(batch, results):
+                if tasks:
+                    plans[goal_id] = (tasks, "model")
+                    if cache:
+                        cache.put(title, desc or "", client.model_id(), GOAL_PROMPT_PARAMS, tasks)
+                else:
+                    plans[goal_id] = (build_rule_based_plan(title, desc or ""), "planner")
+            if on_progress:
+                on_progress(len(plans), len(goals))
+    return plans
+
+
+def save_plans(conn, plans: dict) -> int:
+    """Insert all planned sub-tasks in one transaction; returns the number of rows written."""
+    rows = [(goal_id, task) for goal_id, (tasks, _) in plans.items() for task in tasks]
+    if not rows:
+        return 0
+    cursor = conn.cursor()
+    try:
+        cursor.executemany("INSERT INTO goal_tasks (goal_id, task_description) VALUES (%s, %s)", rows)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def plan_all_unplanned(connect_db, use_model: bool = True, on_progress=None, client: InferenceClient = None) -> dict:
+    """Plan and save sub-tasks for every goal without any; returns a summary of the run."""
+    t0 = time.perf_counter()
+    conn = connect_db()
+    if conn is None:
+        raise ConnectionError("Could not connect to the database.")
+    try:
+        goals = find_unplanned_goals(conn)
+        plans = plan_goals(goals, client, use_model, on_progress, similar=reusable_plans(connect_db, conn, goals))
+        written = save_plans(conn, plans)
+    finally:
+        conn.close()
+    elapsed = time.perf_counter() - t0
+    sources = [source for _, source in plans.values()]
+    return {
+        "goals": len(plans),
+        "tasks": written,
+        "model": sources.count("model"),
+        "cached": sources.count("cached"),
+        "similar": sources.count("similar"),
+        "planner": sources.count("planner"),
+        "seconds": round(elapsed, 2),
+        "goals_per_sec": round(len(plans) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    # Headless run: python batch_planner.py [--planner-only]
+    from db_connect import connect_db
+
+    def _progress(done, total):
+        print(f"\r⏳ Planned {done}/{total} goals", end="", flush=True)
+
+    try:
+        summary = plan_all_unplanned(connect_db, use_model="--planner-only" not in sys.argv[1:], on_progress=_progress)
+    except ConnectionError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(
+        f"\n✅ {summary['tasks']} tasks for {summary['goals']} goals in {summary['seconds']}s "
+        f"({summary['goals_per_sec']} goals/s; model {summary['model']}, cached {summary['cached']}, "
+        f"similar {summary['similar']}, planner {summary['planner']})"
+    )
@@ -0,0 +1,62 @@
+# bench_backends.py
+# Compares generation latency of the fp32, int8 and ONNX backends on the same prompts.
+# Generation is greedy with a fixed token count, so every backend does equal work.
+import statistics
+import sys
+import time
+
+from model_runtime import (
+    MODEL_PATH,
+    TOLERANCE_PROMPTS,
+    _TRANSFORMERS_AVAILABLE,
+    available_backends,
+    compare_backends,
+    load_model,
+)
+
+NEW_TOKENS = 60
+
+
+def _time_backend(model, tokenizer, runs: int) -> list:
+    latencies = []
+    for _ in range(runs):
+        for prompt in TOLERANCE_PROMPTS:
+            inputs = tokenizer(prompt, return_tensors="pt")
+            t0 = time.perf_counter()
+            model.generate(**inputs, max_new_tokens=NEW_TOKENS, min_new_tokens=NEW_TOKENS, do_sample=False,
+                           pad_token_id=tokenizer.eos_token_id)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies
+
+
+def main(runs: int = 3):
+    if not _TRANSFORMERS_AVAILABLE:
+        print("❌ transformers/torch are not installed.")
+        return 1
+    backends = available_backends(MODEL_PATH)
+    if "fp32" not in backends:
+        print(f"❌ No model cache at '{MODEL_PATH}'. Run download_model.py first.")
+        return 1
+    reference, tokenizer = load_model(MODEL_PATH, "fp32")
+    results = {}
+    for backend in backends:
+        t0 = time.perf_counter()
+        model, _ = (reference, tokenizer) if backend == "fp32" else load_model(MODEL_PATH, backend)
+        load_s = time.perf_counter() - t0
+        _time_backend(model, tokenizer, 1)  # warm-up
+        latencies = _time_backend(model, tokenizer, runs)
+        agreement = compare_backends(reference, model, tokenizer) if backend != "fp32" else None
+        results[backend] = (load_s, statistics.median(latencies), statistics.mean(latencies), agreement)
+
+    base = results["fp32"][1]
+    print(f"{'backend':8} {'load s':>7} {'p50 ms':>9} {'mean ms':>9} {'speedup':>8} {'top-1':>7} {'max Δlogp':>10}")
+    for backend, (load_s, p50, mean, agreement) in results.items():
+        top1 = f"{agreement['top1_agreement']:.1%}" if agreement else "-"
+        diff = f"{agreement['max_logprob_diff']:.3f}" if agreement else "-"
+        print(f"{backend:8} {load_s:7.2f} {p50:9.1f} {mean:9.1f} {base / p50:7.2f}x {top1:>7} {diff:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    # python bench_backends.py [runs]
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
@@ -0,0 +1,71 @@
+# bench_constrained.py
+# Compares free-form generation + parsing against constrained task-list decoding on goal prompts:
+# useful tasks (parsed and kept by clean_task) per second and generated tokens per useful task.
+import sys
+import time
+
+from model_runtime import MODEL_PATH, _TRANSFORMERS_AVAILABLE, generate_text, load_model, warm_up
+from task_parsing import GOAL_PROMPT_PARAMS, goal_prompt, parse_tasks, task_list_params
+
+GOALS = (
+    ("Learn Excel", "in 4 weeks"),
+    ("Run a half marathon", "in 3 months"),
+    ("Save money for a trip", ""),
+    ("Read 12 books", "this year"),
+    ("Learn Spanish", "for travelling"),
+)
+
+
+def _run(model, tokenizer, params: dict, runs: int) -> dict:
+    seconds, useful, tokens = 0.0, 0, 0
+    max_tasks = GOAL_PROMPT_PARAMS["max_tasks"]
+    for _ in range(runs):
+        for title, desc in GOALS:
+            prompt = goal_prompt(title, desc)
+            t0 = time.perf_counter()
+            text = generate_text(model, tokenizer, prompt, max_new_tokens=GOAL_PROMPT_PARAMS["max_new_tokens"],
+                                 **params)
+            seconds += time.perf_counter() - t0
+            useful += len(parse_tasks(text)[:max_tasks])
+            tokens += len(tokenizer.encode(text)) - len(tokenizer.encode(prompt))
+    return {
+        "useful_tasks": useful,
+        "tasks_per_sec": useful / seconds if seconds else 0.0,
+        "tokens_per_task": tokens / useful if useful else float("inf"),
+        "seconds": seconds,
+    }
+
+
+def main(runs: int = 3):
+    if not _TRANSFORMERS_AVAILABLE:
+        print("❌ transformers/torch are not installed.")
+        return 1
+    try:
+        model, tokenizer = load_model(MODEL_PATH, "fp32")
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        return 1
+    warm_up(model, tokenizer)
+
+    constrained = task_list_params(GOAL_PROMPT_PARAMS["max_tasks"])
+    if not constrained:
+        print("❌ LM_CONSTRAINED_DECODING=0 is set; nothing to compare.")
+        return 1
+    results = {
+        "free + parsing": _run(model, tokenizer, {}, runs),
+        "constrained": _run(model, tokenizer, constrained, runs),
+    }
+    print(f"{len(GOALS) * runs} generations per variant, up to {GOAL_PROMPT_PARAMS['max_tasks']} tasks each")
+    print(f"{'variant':16} {'useful':>7} {'tasks/s':>8} {'tok/task':>9} {'total s':>8}")
+    for name, r in results.items():
+        print(f"{name:16} {r['useful_tasks']:7d} {r['tasks_per_sec']:8.2f} {r['tokens_per_task']:9.1f} "
+              f"{r['seconds']:8.2f}")
+    free, fast = results["free + parsing"], results["constrained"]
+    if free["tasks_per_sec"]:
+        print(f"useful tasks per second: {fast['tasks_per_sec'] / free['tasks_per_sec']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    # python bench_constrained.py [runs]
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 3))
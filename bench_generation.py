@@ -0,0 +1,196 @@
+# bench_generation.py
+# Offline benchmark of goal-to-task generation as goals_ui runs it: the rule-based planner path and
+# the model path (prompt -> constrained stream -> parsed tasks) over a fixed corpus of goals.
+# The model is a tiny randomly initialised GPT-2 with a tokenizer trained on the spot, saved to a
+# temporary directory and loaded through model_runtime.load_model, so no network or downloaded
+# weights are needed. Its output is meaningless; only the timings are. Greedy decoding keeps runs
+# comparable. Use --json FILE to keep results for regression tracking.
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from goal_planner import build_rule_based_plan
+from inference_resources import process_rss_mb
+from model_runtime import _TRANSFORMERS_AVAILABLE, load_model, stream_text, torch, warm_up
+from task_parsing import (GOAL_PROMPT_PARAMS, GOAL_PROMPT_PREFIX, TaskStreamParser, collect_streamed_tasks,
+                          goal_prompt, task_list_params)
+
+# Optional: peak RSS comes from getrusage where available (not on Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+GOALS = (
+    ("Learn Excel", "in 4 weeks"),
+    ("Run a half marathon", "in 3 months"),
+    ("Save money for a trip to Japan", "next summer"),
+    ("Read 12 books", "this year"),
+    ("Learn Spanish", "for travelling in 8 weeks"),
+    ("Get fit", "lose 5 kg before the wedding"),
+    ("Learn Python programming", ""),
+    ("Build an emergency fund", "three months of expenses"),
+    ("Become more patient with my kids", ""),
+    ("Write a novel", "first draft in 6 months"),
+)
+TINY_CONFIG = {"n_embd": 64, "n_layer": 2, "n_head": 2, "n_positions": 512}
+TINY_VOCAB = 600
+SEED = 0
+
+
+def _percentiles(values_ms) -> dict:
+    ordered = sorted(values_ms)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))], 3)
+
+    return {"p50_ms": pct(50), "p90_ms": pct(90), "p99_ms": pct(99), "mean_ms": round(statistics.mean(ordered), 3)}
+
+
+def peak_rss_mb():
+    if resource is None:
+        return process_rss_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024, 1)   # bytes on macOS, KiB elsewhere
+
+
+def bench_planner(runs: int) -> dict:
+    latencies = []
+    for _ in range(runs):
+        for title, desc in GOALS:
+            t0 = time.perf_counter()
+            build_rule_based_plan(title, desc)
+            latencies.append((time.perf_counter() - t0) * 1000)
+    return {"requests": len(latencies), **_percentiles(latencies)}
+
+
+def build_tiny_model(directory: str):
+    """Save a random tiny GPT-2 and a byte-level BPE tokenizer trained on the prompts to ``directory``."""
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import GPT2Config, GPT2LMHeadModel, PreTrainedTokenizerFast
+
+    texts = [goal_prompt(title, desc) + "\n2. 3. 4. 5. 6. 7." for title, desc in GOALS]
+    bpe = Tokenizer(models.BPE())
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator(texts, trainers.BpeTrainer(
+        vocab_size=TINY_VOCAB, special_tokens=["<|endoftext|>"], initial_alphabet=pre_tokenizers.ByteLevel.alphabet(),
+    ))
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, eos_token="<|endoftext|>")
+    torch.manual_seed(SEED)
+    config = GPT2Config(vocab_size=len(tokenizer), bos_token_id=tokenizer.eos_token_id,
+                        eos_token_id=tokenizer.eos_token_id, **TINY_CONFIG)
+    GPT2LMHeadModel(config).save_pretrained(directory, safe_serialization=True)
+    tokenizer.save_pretrained(directory)
+
+
+def bench_model(directory: str, runs: int) -> dict:
+    t0 = time.perf_counter()
+    model, tokenizer = load_model(directory, "fp32")
+    load_s = time.perf_counter() - t0
+    prompt = goal_prompt(*GOALS[0])
+    warmup_s = warm_up(model, tokenizer, None, [(GOAL_PROMPT_PREFIX, prompt)])
+
+    params = {"max_new_tokens": GOAL_PROMPT_PARAMS["max_new_tokens"], "do_sample": False,
+              **task_list_params(GOAL_PROMPT_PARAMS["max_tasks"])}
+    latencies, first_chunk, new_tokens, gen_seconds, tasks = [], [], 0, 0.0, 0
+    for _ in range(runs):
+        for title, desc in GOALS:
+            prompt = goal_prompt(title, desc)
+            chunks, first = [], []
+
+            def on_text(chunk):
+                if not first:
+                    first.append(time.perf_counter())
+                chunks.append(chunk)
+
+            t0 = time.perf_counter()
+            text = stream_text(model, tokenizer, prompt, on_text, **params)
+            gen_seconds += time.perf_counter() - t0
+            parser = TaskStreamParser(max_tasks=GOAL_PROMPT_PARAMS["max_tasks"])
+            tasks += len(collect_streamed_tasks(iter(chunks), parser))
+            elapsed = time.perf_counter() - t0
+            latencies.append(elapsed * 1000)
+            if first:
+                first_chunk.append((first[0] - t0) * 1000)
+            new_tokens += len(tokenizer(text)["input_ids"]) - len(tokenizer(prompt)["input_ids"])
+    return {
+        "load_sec": round(load_s, 3),
+        "warmup_sec": round(warmup_s, 3),
+        "requests": len(latencies),
+        "time_to_first_token": _percentiles(first_chunk) if first_chunk else None,
+        "tokens_per_sec": round(new_tokens / gen_seconds, 1) if gen_seconds else 0.0,
+        "tasks_per_request": round(tasks / max(1, len(latencies)), 2),
+        "latency": _percentiles(latencies),
+        "params": params,
+    }
+
+
+def run(runs: int = 3, with_model: bool = True) -> dict:
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "goals": len(GOALS),
+        "runs": runs,
+        "planner": bench_planner(runs),
+        "model": None,
+    }
+    if with_model and _TRANSFORMERS_AVAILABLE:
+        import transformers
+
+        report["torch"], report["transformers"] = torch.__version__, transformers.__version__
+        report["torch_threads"] = torch.get_num_threads()
+        with tempfile.TemporaryDirectory(prefix="bench_gpt2_") as directory:
+            build_tiny_model(directory)
+            report["model"] = {"config": TINY_CONFIG, **bench_model(directory, runs)}
+    elif with_model:
+        report["model_skipped"] = "transformers/torch are not installed"
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def _print(report: dict):
+    planner = report["planner"]
+    print(f"{report['goals']} goals x {report['runs']} runs")
+    print(f"planner  p50 {planner['p50_ms']:.3f} ms  p90 {planner['p90_ms']:.3f} ms  p99 {planner['p99_ms']:.3f} ms")
+    model = report["model"]
+    if model:
+        latency, ttft = model["latency"], model["time_to_first_token"] or {}
+        print(f"model    load {model['load_sec']:.2f}s  warm-up {model['warmup_sec']:.2f}s  "
+              f"{model['tokens_per_sec']} tok/s  {model['tasks_per_request']} tasks/request")
+        print(f"         first token p50 {ttft.get('p50_ms', 0):.1f} ms  end-to-end p50 {latency['p50_ms']:.1f} ms  "
+              f"p90 {latency['p90_ms']:.1f} ms  p99 {latency['p99_ms']:.1f} ms")
+    else:
+        print(f"model    skipped ({report.get('model_skipped', 'disabled')})")
+    print(f"peak RSS {report['peak_rss_mb']} MB")
+
+
+def main(argv) -> int:
+    args = list(argv)
+    json_path = None
+    if "--json" in args:
+        i = args.index("--json")
+        json_path = args[i + 1] if i + 1 < len(args) else "-"
+        del args[i:i + 2]
+    with_model = "--planner-only" not in args
+    runs = int(next((a for a in args if not a.startswith("--")), 3))
+    report = run(runs, with_model)
+    if json_path == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        _print(report)
+        if json_path:
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"📄 Results written to {os.path.abspath(json_path)}")
+    return 0
+
+
+if __name__ == "__main__":
+    # python bench_generation.py [runs] [--planner-only] [--json FILE|-]
+    sys.exit(main(sys.argv[1:]))
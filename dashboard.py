@@ -3,11 +3,14 @@ from tkinter import messagebox, ttk
 import sys
 import os
 import subprocess
-from datetime import datetime
+from datetime import datetime, timedelta
 from tasks_ui import show_tasks as tasks_show_ui
 from expenses_ui import show_expenses as expenses_show_ui
 from goals_ui import show_goals as goals_show_ui
 from medications_ui import show_medications as medications_show_ui
+from expense_budgets import current_alerts, schedule_nightly_reconcile
+from expense_currency import BASE_CURRENCY, category_totals, format_money
+from expense_recurring import start_materializer
 from app_config import get_theme_colors, set_theme, set_language
 from localization import get_text, TRANSLATIONS
 
@@ -151,15 +154,25 @@ def show_dashboard():
             active_meds = cursor.fetchone()[0]
             cursor.execute("SELECT COUNT(*) FROM goals WHERE status != 'Achieved'")
             active_goals = cursor.fetchone()[0]
-            cursor.execute("SELECT SUM(amount) FROM expenses WHERE MONTH(date) = MONTH(CURDATE()) AND YEAR(date) = YEAR(CURDATE())")
-            monthly_expense_raw = cursor.fetchone()[0]
-            monthly_expense = f"${monthly_expense_raw:.2f}" if monthly_expense_raw else "$0.00"
             conn.close()
+            # Converted into the base currency; cached per (currency, month) until expenses change
+            month_start = datetime.now().date().replace(day=1)
+            next_month = (month_start + timedelta(days=32)).replace(day=1)
+            monthly_total = sum(category_totals(connect_db, month_start, next_month).values())
+            monthly_expense = format_money(monthly_total, BASE_CURRENCY)
         else:
             pending_tasks, active_meds, active_goals, monthly_expense = "N/A", "N/A", "N/A", "N/A"
     except Exception:
         pending_tasks, active_meds, active_goals, monthly_expense = "N/A", "N/A", "N/A", "N/A"
 
+    # Budget badge comes from the in-memory running totals, not a fresh scan
+    try:
+        alerts = current_alerts(connect_db)
+        over = sum(1 for a in alerts if a["level"] == "over")
+        budget_badge = f"⛔ {over} / ⚠️ {len(alerts) - over}" if alerts else "✅ 0"
+    except Exception:
+        budget_badge = "N/A"
+
     stat1 = create_stat_item(stats_frame, "pending_tasks", pending_tasks, "#e74c3c")
     stat1.pack(side=LEFT, expand=True, fill=X, padx=5)
     stat2 = create_stat_item(stats_frame, "active_meds", active_meds, "#16a085")
@@ -168,6 +181,8 @@ def show_dashboard():
     stat3.pack(side=LEFT, expand=True, fill=X, padx=5)
     stat4 = create_stat_item(stats_frame, "monthly_expense", monthly_expense, "#f39c12")
     stat4.pack(side=LEFT, expand=True, fill=X, padx=5)
+    stat5 = create_stat_item(stats_frame, "budget_alerts", budget_badge, "#c0392b")
+    stat5.pack(side=LEFT, expand=True, fill=X, padx=5)
 
     # Welcome message with user name
     welcome_frame = Frame(content_frame, bg=colors["card_bg"], relief="raised", bd=1)
@@ -361,6 +376,11 @@ def main():
     # Show dashboard
     show_dashboard()
 
+    # Correct any drift in the budget running totals once a night
+    schedule_nightly_reconcile(root, connect_db)
+    # Expand recurring expenses up to the materialization horizon in the background
+    start_materializer(connect_db)
+
     # Center window after layout measurements
     center_window(root)
 
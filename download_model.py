@@ -1,7 +1,11 @@
 # download_model.py
 import os
+import sys
 from transformers import AutoModelForCausalLM, AutoTokenizer
 
+from model_manifest import write_manifest
+from model_runtime import _ONNX_AVAILABLE, export_int8, export_onnx
+
 # --- Configuration ---
 MODEL_NAME = "distilgpt2"
 CACHE_DIR = os.path.join(".", "model_cache", MODEL_NAME)
@@ -25,17 +29,47 @@ def download_model():
         tokenizer.save_pretrained(CACHE_DIR)
         print("✅ Tokenizer downloaded and saved successfully.")
 
-        # Download and save the model
+        # Download and save the model as safetensors, which the service loads memory-mapped
         print("Downloading model (this may take a moment)...")
         model = AutoModelForCausalLM.from_pretrained(MODEL_NAME)
-        model.save_pretrained(CACHE_DIR)
+        model.save_pretrained(CACHE_DIR, safe_serialization=True)
+        legacy_weights = os.path.join(CACHE_DIR, "pytorch_model.bin")
+        if os.path.exists(legacy_weights):
+            os.remove(legacy_weights)   # left over from an older download; safetensors replaces it
         print("✅ Model downloaded and saved successfully.")
+
+        # Checksums let every launch verify the cache by stat() instead of re-reading the weights
+        manifest = write_manifest(CACHE_DIR)
+        print(f"✅ Manifest written for {len(manifest['files'])} files.")
         
         print(f"\n--- 🎉 Model '{MODEL_NAME}' is ready for offline use in '{CACHE_DIR}' ---")
 
     except Exception as e:
         print(f"❌ An error occurred during download: {e}")
         print("Please check your internet connection and try again.")
+        return False
+    return True
+
+def build_optimized_models():
+    """
+    Produces the faster CPU artifacts once (int8 weights, and ONNX when optimum is installed).
+    The inference service picks the fastest one automatically; each is checked against fp32 first.
+    """
+    print("\n--- ⚡ Building optimized CPU models ---")
+    steps = [("int8 (dynamic quantization)", export_int8)]
+    if _ONNX_AVAILABLE:
+        steps.append(("ONNX Runtime", export_onnx))
+    else:
+        print("ℹ️ Skipping ONNX export (pip install optimum[onnxruntime] to enable it).")
+    for label, export in steps:
+        try:
+            metrics = export(CACHE_DIR)
+            print(f"✅ {label}: top-1 agreement {metrics['top1_agreement']:.1%}, "
+                  f"max log-prob diff {metrics['max_logprob_diff']:.3f}")
+        except Exception as e:
+            print(f"⚠️ {label} skipped: {e}")
 
 if __name__ == "__main__":
-    download_model()
+    # --optimize-only rebuilds the optimized artifacts from an existing download
+    if "--optimize-only" in sys.argv[1:] or download_model():
+        build_optimized_models()
@@ -0,0 +1,283 @@
+# expense_budgets.py
+import threading
+from datetime import date, datetime, timedelta
+
+from expense_currency import ensure_currency_schema, get_rate_table, grouped_totals, to_base
+
+# --- Budget Configuration ---
+BUDGET_WARN_RATIO = 0.8  # warn once spending reaches 80% of the monthly limit
+RECONCILE_AT_HOUR = 3    # nightly drift correction runs at 03:00 local time
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def ensure_budget_schema(conn):
+    """Create the per-category monthly budget table if needed."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expense_budgets (
+                category VARCHAR(50) NOT NULL PRIMARY KEY,
+                monthly_limit DECIMAL(12, 2) NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+            """
+        )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _month_key(value):
+    """(year, month) for a date/datetime or a 'YYYY-MM-DD' string."""
+    if hasattr(value, "year"):
+        return value.year, value.month
+    d = datetime.strptime(str(value)[:10], "%Y-%m-%d")
+    return d.year, d.month
+
+
+def _is_future(value, today) -> bool:
+    """Whether an expense row's date (date/datetime or 'YYYY-MM-DD') is after ``today``."""
+    if isinstance(value, datetime):
+        value = value.date()
+    elif not isinstance(value, date):
+        value = datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    return value > today
+
+
+def _month_bounds(year: int, month: int):
+    start = datetime(year, month, 1).date()
+    end = datetime(year + (month == 12), month % 12 + 1, 1).date()
+    return start, end
+
+
+class BudgetTracker:
+    """Running monthly spend per category, kept current by save/delete deltas.
+
+    Month totals are loaded from SQL once (lazily, per month) and afterwards only
+    adjusted by ``apply_delta``, so checking a budget after a save is O(1). Only
+    expenses dated up to ``as_of`` count; a tracker from an earlier day is rebuilt
+    by ``get_tracker``.
+    """
+
+    def __init__(self):
+        self.limits = {}   # category -> monthly limit
+        self.totals = {}   # (year, month) -> {category: spent}
+        self.as_of = date.today()
+        self._lock = threading.Lock()
+
+    def load_limits(self, conn):
+        ensure_budget_schema(conn)
+        ensure_currency_schema(conn)
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT category, monthly_limit FROM expense_budgets")
+            limits = {cat: float(limit) for cat, limit in cur.fetchall()}
+        finally:
+            cur.close()
+        with self._lock:
+            self.limits = limits
+
+    def _query_month(self, conn, year: int, month: int) -> dict:
+        start, end = _month_bounds(year, month)
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT category, currency, date, SUM(amount) FROM expenses
+                WHERE date >= %s AND date < %s AND date <= %s
+                GROUP BY category, currency, date
+                """,
+                (start, end, self.as_of),
+            )
+            rows = [(cat or "General", code, d, total) for cat, code, d, total in cur.fetchall()]
+        finally:
+            cur.close()
+        return grouped_totals(conn, rows)
+
+    def ensure_month(self, conn, year: int, month: int) -> dict:
+        """Load one month of totals from SQL the first time it is needed."""
+        with self._lock:
+            if (year, month) in self.totals:
+                return self.totals[(year, month)]
+        month_totals = self._query_month(conn, year, month)
+        with self._lock:
+            return self.totals.setdefault((year, month), month_totals)
+
+    def prepare(self, conn, *rows):
+        """Load the months the given rows fall in.
+
+        Call this before writing the rows so later deltas start from pre-write totals.
+        """
+        get_rate_table(conn)
+        for row in rows:
+            if row:
+                self.ensure_month(conn, *_month_key(row["date"]))
+
+    def status_for(self, row):
+        """``status`` for the category and month of an expense row."""
+        return self.status(row.get("category") or "General", *_month_key(row["date"]))
+
+    def apply_delta(self, old=None, new=None):
+        """Move spending from an old row version to a new one (either may be None).
+
+        Rows are dicts with ``date``, ``category``, ``amount`` and optionally ``currency``.
+        Months that were never loaded and rows dated after ``as_of`` are skipped.
+        """
+        with self._lock:
+            for row, sign in ((old, -1), (new, 1)):
+                if not row or _is_future(row["date"], self.as_of):
+                    continue
+                month = self.totals.get(_month_key(row["date"]))
+                if month is None:
+                    continue
+                cat = row.get("category") or "General"
+                month[cat] = month.get(cat, 0.0) + sign * to_base(row)
+
+    def status(self, category: str, year: int, month: int):
+        """Return ``(level, spent, limit)`` where level is 'ok', 'warn', 'over' or None (no budget)."""
+        with self._lock:
+            limit = self.limits.get(category)
+            spent = self.totals.get((year, month), {}).get(category, 0.0)
+        if not limit:
+            return None, spent, limit
+        if spent > limit:
+            return "over", spent, limit
+        if spent >= limit * BUDGET_WARN_RATIO:
+            return "warn", spent, limit
+        return "ok", spent, limit
+
+    def alerts(self, year: int, month: int) -> list:
+        """Budgets that are near or over their limit for the given month."""
+        found = []
+        for category in sorted(self.limits):
+            level, spent, limit = self.status(category, year, month)
+            if level in ("warn", "over"):
+                found.append({"category": category, "level": level, "spent": spent, "limit": limit})
+        return found
+
+    def has_month(self, year: int, month: int) -> bool:
+        with self._lock:
+            return (year, month) in self.totals
+
+    def reconcile(self, conn) -> dict:
+        """Recompute every loaded month and the current one from SQL.
+
+        Returns the corrected drift per category of the months that were already loaded.
+        """
+        self.load_limits(conn)
+        now = datetime.now()
+        with self._lock:
+            months = set(self.totals) | {(now.year, now.month)}
+        drift = {}
+        for year, month in sorted(months):
+            fresh = self._query_month(conn, year, month)
+            with self._lock:
+                if (year, month) not in self.totals:
+                    self.totals[(year, month)] = fresh
+                    continue
+                cached = self.totals[(year, month)]
+                for cat in set(fresh) | set(cached):
+                    diff = fresh.get(cat, 0.0) - cached.get(cat, 0.0)
+                    if abs(diff) > 0.005:
+                        drift[(year, month, cat)] = diff
+                self.totals[(year, month)] = fresh
+        return drift
+
+
+def get_tracker(connect_db):
+    """Shared tracker for this process, loaded with limits and the current month."""
+    global _tracker
+    with _tracker_lock:
+        # Rows dated today only start counting on a tracker built today
+        if _tracker is not None and _tracker.as_of == date.today():
+            return _tracker
+    tracker = BudgetTracker()
+    conn = connect_db()
+    if conn is None:
+        return tracker
+    try:
+        tracker.load_limits(conn)
+        now = datetime.now()
+        tracker.ensure_month(conn, now.year, now.month)
+    finally:
+        conn.close()
+    with _tracker_lock:
+        if _tracker is None or _tracker.as_of != tracker.as_of:
+            _tracker = tracker
+        return _tracker
+
+
+def invalidate_tracker():
+    """Drop the shared tracker (e.g. after a bulk import) so it is rebuilt on next use."""
+    global _tracker
+    with _tracker_lock:
+        _tracker = None
+
+
+def current_alerts(connect_db) -> list:
+    """Near/over-budget categories for the current month."""
+    now = datetime.now()
+    tracker = get_tracker(connect_db)
+    if not tracker.has_month(now.year, now.month):
+        # The month rolled over since the tracker was built
+        conn = connect_db()
+        if conn is not None:
+            try:
+                tracker.ensure_month(conn, now.year, now.month)
+            finally:
+                conn.close()
+    return tracker.alerts(now.year, now.month)
+
+
+def format_alert(alert: dict) -> str:
+    icon = "⛔" if alert["level"] == "over" else "⚠️"
+    pct = alert["spent"] / alert["limit"] * 100 if alert["limit"] else 0
+    return f"{icon} {alert['category']}: {alert['spent']:.2f} / {alert['limit']:.2f} ({pct:.0f}%)"
+
+
+def run_reconcile(connect_db) -> dict:
+    """Correct the shared tracker against SQL and report any drift."""
+    conn = connect_db()
+    if conn is None:
+        return {}
+    try:
+        drift = get_tracker(connect_db).reconcile(conn)
+    finally:
+        conn.close()
+    for (year, month, cat), diff in sorted(drift.items()):
+        print(f"Budget drift corrected: {year}-{month:02d} {cat} {diff:+.2f}")
+    return drift
+
+
+def schedule_nightly_reconcile(widget, connect_db):
+    """Use the Tk event loop to reconcile budget totals every night."""
+    now = datetime.now()
+    next_run = now.replace(hour=RECONCILE_AT_HOUR, minute=0, second=0, microsecond=0)
+    if next_run <= now:
+        next_run += timedelta(days=1)
+
+    def _run():
+        try:
+            run_reconcile(connect_db)
+        except Exception as e:
+            print(f"Budget reconciliation failed: {e}")
+        schedule_nightly_reconcile(widget, connect_db)
+
+    try:
+        widget.after(int((next_run - now).total_seconds() * 1000), _run)
+    except Exception:
+        pass
+
+
+if __name__ == "__main__":
+    # Print this month's budget alerts: python expense_budgets.py
+    from db_connect import connect_db
+
+    alerts = current_alerts(connect_db)
+    for a in alerts:
+        print(format_alert(a))
+    if not alerts:
+        print("✅ All budgets are within limits.")
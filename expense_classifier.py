@@ -0,0 +1,275 @@
+# expense_classifier.py
+import os
+import sys
+import threading
+import time
+import zlib
+
+from expense_utils import EXPENSE_CATEGORIES, normalize_title
+
+# Optional: NumPy powers the vectorized model (installed via requirements)
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    _NUMPY_AVAILABLE = False
+
+# --- Classifier Configuration ---
+N_FEATURES = 1 << 14          # hashed vocabulary size (power of two)
+SMOOTHING = 0.5               # additive (Lidstone) smoothing
+MIN_CONFIDENCE = 0.55         # below this the form keeps the user's category
+TRAIN_BATCH_SIZE = 5000
+MODEL_FILE = os.path.join(".", "model_cache", "expense_classifier.npz")
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def ensure_classifier_schema(conn):
+    """Add ``expenses.category_auto``, set on rows whose category the classifier guessed.
+
+    Guessed categories are not learned from, so the model never trains on its own output.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'expenses' AND COLUMN_NAME = 'category_auto'
+            """
+        )
+        if not cur.fetchone()[0]:
+            cur.execute("ALTER TABLE expenses ADD COLUMN category_auto TINYINT(1) NOT NULL DEFAULT 0")
+            conn.commit()
+    finally:
+        cur.close()
+
+
+def _tokens(text: str) -> list:
+    """Words (ignoring bare numbers such as card or store ids) plus adjacent-word bigrams."""
+    words = [w for w in normalize_title(text).split() if not w.isdigit()]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hash_features(text: str) -> list:
+    """Stable hashed feature ids for a title/notes string."""
+    return [zlib.crc32(tok.encode("utf-8")) & (N_FEATURES - 1) for tok in _tokens(text)]
+
+
+class ExpenseClassifier:
+    """Multinomial naive Bayes over hashed bag-of-words features.
+
+    Counts are kept per category so new examples are learned incrementally;
+    log-probabilities are refreshed lazily before the next prediction.
+    """
+
+    def __init__(self, categories=EXPENSE_CATEGORIES):
+        self.categories = list(categories)
+        self._cat_index = {c: i for i, c in enumerate(self.categories)}
+        self.feature_counts = np.zeros((len(self.categories), N_FEATURES), dtype=np.float64)
+        self.class_counts = np.zeros(len(self.categories), dtype=np.float64)
+        self.last_trained_id = 0
+        self._log_prob = None
+        self._log_prior = None
+        self._lock = threading.Lock()
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.class_counts.sum())
+
+    def partial_fit(self, texts, labels, weight: float = 1.0):
+        """Add labelled examples (unknown categories are ignored); a negative ``weight`` removes them."""
+        rows, cols = [], []
+        classes = []
+        for text, label in zip(texts, labels):
+            ci = self._cat_index.get(label)
+            if ci is None:
+                continue
+            feats = hash_features(text)
+            rows.extend([ci] * len(feats))
+            cols.extend(feats)
+            classes.append(ci)
+        if not classes:
+            return
+        with self._lock:
+            np.add.at(self.feature_counts, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), weight)
+            np.add.at(self.class_counts, np.asarray(classes, dtype=np.intp), weight)
+            if weight < 0:
+                np.maximum(self.feature_counts, 0.0, out=self.feature_counts)
+                np.maximum(self.class_counts, 0.0, out=self.class_counts)
+            self._log_prob = None
+
+    def forget(self, texts, labels):
+        """Remove examples learned earlier, e.g. the previous version of an edited expense."""
+        self.partial_fit(texts, labels, weight=-1.0)
+
+    def _refresh(self):
+        if self._log_prob is None:
+            smoothed = self.feature_counts + SMOOTHING
+            self._log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+            self._log_prior = np.log(self.class_counts + 1.0) - np.log(self.class_counts.sum() + len(self.categories))
+        return self._log_prob, self._log_prior
+
+    def predict(self, text: str):
+        """Return ``(category, confidence)`` for one title; (None, 0.0) when nothing is known."""
+        feats = hash_features(text)
+        if not feats or not self.trained:
+            return None, 0.0
+        with self._lock:
+            log_prob, log_prior = self._refresh()
+            scores = log_prior + log_prob[:, feats].sum(axis=1)
+        probs = np.exp(scores - scores.max())
+        probs /= probs.sum()
+        best = int(probs.argmax())
+        return self.categories[best], float(probs[best])
+
+    def predict_batch(self, texts, min_confidence: float = MIN_CONFIDENCE) -> list:
+        """Categorize many texts in one vectorized pass; low-confidence entries come back as None."""
+        texts = list(texts)
+        if not texts or not self.trained:
+            return [None] * len(texts)
+        feats = [hash_features(t) for t in texts]
+        lengths = np.fromiter((len(f) for f in feats), dtype=np.intp, count=len(feats))
+        flat = np.fromiter((i for f in feats for i in f), dtype=np.intp, count=int(lengths.sum()))
+        with self._lock:
+            log_prob, log_prior = self._refresh()
+            scores = np.tile(log_prior[:, None], (1, len(texts)))
+            if flat.size:
+                # Sum each document's feature columns: reduceat over the concatenated token ids
+                non_empty = lengths > 0
+                offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))[non_empty]
+                scores[:, non_empty] += np.add.reduceat(log_prob[:, flat], offsets, axis=1)
+        scores -= scores.max(axis=0, keepdims=True)
+        probs = np.exp(scores)
+        probs /= probs.sum(axis=0, keepdims=True)
+        best = probs.argmax(axis=0)
+        confidence = probs[best, np.arange(len(texts))]
+        return [
+            self.categories[b] if lengths[i] and confidence[i] >= min_confidence else None
+            for i, b in enumerate(best)
+        ]
+
+    def train_from_db(self, conn, batch_size: int = TRAIN_BATCH_SIZE) -> int:
+        """Learn from expenses added since the last training run (keyset over id).
+
+        Rows categorized by the classifier itself (``category_auto``) are skipped.
+        """
+        learned = 0
+        cur = conn.cursor()
+        try:
+            while True:
+                cur.execute(
+                    """
+                    SELECT id, title, notes, category, category_auto FROM expenses
+                    WHERE id > %s ORDER BY id LIMIT %s
+                    """,
+                    (self.last_trained_id, batch_size),
+                )
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                labelled = [r for r in rows if not r[4]]
+                self.partial_fit([f"{t or ''} {n or ''}" for _, t, n, _, _ in labelled], [r[3] for r in labelled])
+                self.last_trained_id = rows[-1][0]
+                learned += len(labelled)
+        finally:
+            cur.close()
+        return learned
+
+    def save(self, path: str = MODEL_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            np.savez_compressed(
+                path,
+                categories=np.array(self.categories),
+                feature_counts=self.feature_counts,
+                class_counts=self.class_counts,
+                last_trained_id=np.array(self.last_trained_id),
+                n_features=np.array(N_FEATURES),
+            )
+
+    @classmethod
+    def load(cls, path: str = MODEL_FILE):
+        """Load a saved model, or None when missing or built with different settings."""
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        if int(data["n_features"]) != N_FEATURES or list(data["categories"]) != list(EXPENSE_CATEGORIES):
+            return None
+        model = cls()
+        model.feature_counts = data["feature_counts"]
+        model.class_counts = data["class_counts"]
+        model.last_trained_id = int(data["last_trained_id"])
+        return model
+
+
+def get_classifier(connect_db):
+    """Shared classifier: loaded from disk, then caught up on rows saved since (None without NumPy)."""
+    global _classifier
+    if not _NUMPY_AVAILABLE:
+        return None
+    with _classifier_lock:
+        if _classifier is not None:
+            return _classifier
+        model = ExpenseClassifier.load() or ExpenseClassifier()
+        conn = connect_db()
+        if conn is not None:
+            try:
+                ensure_classifier_schema(conn)
+                if model.train_from_db(conn):
+                    model.save()
+            finally:
+                conn.close()
+        _classifier = model
+        return _classifier
+
+
+def learn_recent(connect_db, row_id=None, text=None, category=None, old=None) -> int:
+    """Catch the shared classifier up on newly saved rows (plus an edited example) and persist it.
+
+    For an edit of row ``row_id``, ``old`` is the ``(text, category)`` it was learned with
+    (None when it was never learned, e.g. an auto-categorized import row); it is forgotten
+    before the new version is learned. Rows past the last training run are left to
+    ``train_from_db``, which reads their current values.
+    """
+    clf = get_classifier(connect_db)
+    if clf is None:
+        return 0
+    if row_id is not None and int(row_id) <= clf.last_trained_id:
+        if old and old[0] and old[1]:
+            clf.forget([old[0]], [old[1]])
+        if text and category:
+            clf.partial_fit([text], [category])
+    conn = connect_db()
+    if conn is None:
+        return 0
+    try:
+        learned = clf.train_from_db(conn)
+    finally:
+        conn.close()
+    clf.save()
+    return learned
+
+
+def peek_classifier():
+    """The shared classifier if it has already been built, without touching the database."""
+    return _classifier
+
+
+if __name__ == "__main__":
+    # Train/refresh the saved model and time predictions: python expense_classifier.py [--rebuild]
+    if not _NUMPY_AVAILABLE:
+        print("❌ NumPy is not installed (pip install numpy).")
+        sys.exit(1)
+    from db_connect import connect_db
+
+    if "--rebuild" in sys.argv[1:] and os.path.exists(MODEL_FILE):
+        os.remove(MODEL_FILE)
+    t0 = time.perf_counter()
+    clf = get_classifier(connect_db)
+    print(f"Model ready in {time.perf_counter() - t0:.2f}s (trained through id {clf.last_trained_id}).")
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        clf.predict("uber ride to airport")
+    print(f"predict(): {(time.perf_counter() - t0):.3f} ms per call")
@@ -0,0 +1,300 @@
+# expense_currency.py
+import csv
+import os
+import sys
+import threading
+from bisect import bisect_right
+from datetime import date, datetime
+
+# Optional: NumPy vectorizes conversions over whole result sets (installed via requirements)
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    _NUMPY_AVAILABLE = False
+
+# --- Currency Configuration ---
+# Budgets, range totals and the dashboard are kept in the base currency.
+# Rates are stored as "1 unit of currency = rate units of the base currency".
+BASE_CURRENCY = os.environ.get("EXPENSE_BASE_CURRENCY", "USD").upper()
+CURRENCY_SYMBOLS = {"USD": "$", "EUR": "€", "GBP": "£", "BDT": "৳", "INR": "₹", "JPY": "¥"}
+AGGREGATE_CACHE_SIZE = 64
+
+_rates = None
+_rates_lock = threading.Lock()
+_aggregates = {}   # (currency, start, end) -> {category: total}
+_aggregates_lock = threading.Lock()
+_schema_ready = False   # ensure_currency_schema already ran in this process
+
+
+def ensure_currency_schema(conn):
+    """Add ``expenses.currency`` and create the local exchange-rate table if needed (once per process)."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS exchange_rates (
+                currency CHAR(3) NOT NULL,
+                rate_date DATE NOT NULL,
+                rate DECIMAL(18, 8) NOT NULL,
+                PRIMARY KEY (currency, rate_date)
+            )
+            """
+        )
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'expenses' AND COLUMN_NAME = 'currency'
+            """
+        )
+        if not cur.fetchone()[0]:
+            # Existing rows were entered in the base currency
+            cur.execute(f"ALTER TABLE expenses ADD COLUMN currency CHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}'")
+        conn.commit()
+        _schema_ready = True
+    finally:
+        cur.close()
+
+
+def _ordinal(value) -> int:
+    if isinstance(value, datetime):
+        return value.date().toordinal()
+    if isinstance(value, date):
+        return value.toordinal()
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date().toordinal()
+
+
+def format_money(amount, currency: str = BASE_CURRENCY) -> str:
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    return f"{symbol}{amount:,.2f}" if symbol else f"{amount:,.2f} {currency}"
+
+
+class RateTable:
+    """Exchange rates per currency, looked up as the latest rate on or before a date.
+
+    Rates are kept as sorted per-currency date arrays, so a lookup is one bisect;
+    single lookups are additionally memoized per (currency, day).
+    """
+
+    def __init__(self, base: str = BASE_CURRENCY):
+        self.base = base
+        self._dates = {}    # currency -> sorted date ordinals
+        self._values = {}   # currency -> rates aligned with _dates
+        self._cache = {}    # (currency, ordinal) -> rate
+
+    def load(self, conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT currency, rate_date, rate FROM exchange_rates ORDER BY currency, rate_date")
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        dates, values = {}, {}
+        for currency, rate_date, rate in rows:
+            dates.setdefault(currency.upper(), []).append(_ordinal(rate_date))
+            values.setdefault(currency.upper(), []).append(float(rate))
+        if _NUMPY_AVAILABLE:
+            dates = {c: np.asarray(d, dtype=np.int64) for c, d in dates.items()}
+            values = {c: np.asarray(v, dtype=np.float64) for c, v in values.items()}
+        self._dates, self._values, self._cache = dates, values, {}
+
+    @property
+    def currencies(self) -> list:
+        """Currencies that can be converted (the base plus every currency with a rate)."""
+        return sorted(set(self._dates) | {self.base})
+
+    def rate(self, currency: str, when) -> float:
+        """Value of one unit of ``currency`` in the base currency on ``when``."""
+        currency = (currency or self.base).upper()
+        if currency == self.base:
+            return 1.0
+        key = (currency, _ordinal(when))
+        cached = self._cache.get(key)
+        if cached is None:
+            dates = self._dates.get(currency)
+            if dates is None or not len(dates):
+                raise LookupError(f"No exchange rate for {currency}")
+            # Before the first known rate, fall back to the earliest one
+            i = max(0, bisect_right(dates, key[1]) - 1)
+            cached = self._cache[key] = float(self._values[currency][i])
+        return cached
+
+    def _factors(self, currencies, ordinals):
+        """Per-row base-currency rates for NumPy arrays of currency codes and date ordinals."""
+        factors = np.ones(len(currencies), dtype=np.float64)
+        for currency in np.unique(currencies):
+            if currency == self.base:
+                continue
+            if currency not in self._dates:
+                raise LookupError(f"No exchange rate for {currency}")
+            mask = currencies == currency
+            idx = np.searchsorted(self._dates[currency], ordinals[mask], side="right") - 1
+            factors[mask] = self._values[currency][np.maximum(idx, 0)]
+        return factors
+
+    def convert(self, amounts, currencies, dates, to: str = None):
+        """Convert parallel sequences of amounts into ``to`` (default: base currency).
+
+        With NumPy the whole result set is converted with one searchsorted per
+        currency; otherwise each row goes through the memoized ``rate`` lookup.
+        """
+        to = (to or self.base).upper()
+        currencies = [(c or self.base).upper() for c in currencies]
+        if not _NUMPY_AVAILABLE:
+            return [
+                float(a) * self.rate(c, d) / self.rate(to, d)
+                for a, c, d in zip(amounts, currencies, dates)
+            ]
+        values = np.asarray([float(a) for a in amounts], dtype=np.float64)
+        if not len(values):
+            return values
+        codes = np.asarray(currencies)
+        ordinals = np.fromiter((_ordinal(d) for d in dates), dtype=np.int64, count=len(values))
+        values = values * self._factors(codes, ordinals)
+        if to != self.base:
+            values = values / self._factors(np.full(len(values), to), ordinals)
+        return values
+
+    def to_base(self, amount, currency: str, when) -> float:
+        return float(amount or 0) * self.rate(currency, when)
+
+
+def get_rate_table(conn=None):
+    """Shared rate table, loaded from ``exchange_rates`` on first use (needs ``conn`` the first time)."""
+    global _rates
+    with _rates_lock:
+        if _rates is not None or conn is None:
+            return _rates
+    table = RateTable()
+    table.load(conn)
+    with _rates_lock:
+        if _rates is None:
+            _rates = table
+        return _rates
+
+
+def to_base(row: dict) -> float:
+    """An expense row's amount in the base currency (rows without a currency are already in it)."""
+    currency = (row.get("currency") or BASE_CURRENCY).upper()
+    amount = float(row.get("amount") or 0)
+    if currency == BASE_CURRENCY:
+        return amount
+    table = get_rate_table()
+    if table is None:
+        raise LookupError("Exchange rates are not loaded")
+    return table.to_base(amount, currency, row["date"])
+
+
+def invalidate_aggregates():
+    """Drop cached period totals after expenses change."""
+    with _aggregates_lock:
+        _aggregates.clear()
+
+
+def invalidate_rates():
+    """Drop the shared rate table (after importing rates) and every total computed with it."""
+    global _rates
+    with _rates_lock:
+        _rates = None
+    invalidate_aggregates()
+
+
+def grouped_totals(conn, rows, to: str = None) -> dict:
+    """Sum ``(key, currency, date, amount)`` rows per key after one vectorized conversion."""
+    table = get_rate_table(conn)
+    if not rows:
+        return {}
+    keys, currencies, dates, amounts = zip(*rows)
+    converted = table.convert(amounts, currencies, dates, to)
+    totals = {}
+    for key, value in zip(keys, converted):
+        totals[key] = totals.get(key, 0.0) + float(value)
+    return totals
+
+
+def category_totals(connect_db, start, end, currency: str = BASE_CURRENCY) -> dict:
+    """Per-category spending in ``start <= date < end`` converted to ``currency``.
+
+    Results are cached per (currency, period) until expenses or rates change.
+    """
+    key = (currency, start, end)
+    with _aggregates_lock:
+        if key in _aggregates:
+            return dict(_aggregates[key])
+    conn = connect_db()
+    if conn is None:
+        raise ConnectionError("Unable to connect to database.")
+    try:
+        ensure_currency_schema(conn)
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT category, currency, date, SUM(amount) FROM expenses
+                WHERE date >= %s AND date < %s
+                GROUP BY category, currency, date
+                """,
+                (start, end),
+            )
+            rows = [(cat or "General", cur_code, d, total) for cat, cur_code, d, total in cur.fetchall()]
+        finally:
+            cur.close()
+        totals = grouped_totals(conn, rows, currency)
+    finally:
+        conn.close()
+    with _aggregates_lock:
+        if len(_aggregates) >= AGGREGATE_CACHE_SIZE:
+            _aggregates.pop(next(iter(_aggregates)))
+        _aggregates[key] = totals
+    return dict(totals)
+
+
+def import_rates(conn, path: str) -> int:
+    """Upsert rates from a CSV with ``date``, ``currency`` and ``rate`` columns (rate in base currency)."""
+    rows = []
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for line_no, raw in enumerate(csv.DictReader(f), start=2):
+            raw = {k.strip().lower(): (v or "").strip() for k, v in raw.items() if k}
+            try:
+                when = datetime.strptime(raw["date"], "%Y-%m-%d").date()
+                code = raw["currency"].upper()
+                rate = float(raw["rate"])
+            except (KeyError, ValueError):
+                raise ValueError(f"Line {line_no}: expected date (YYYY-MM-DD), currency and rate columns")
+            if len(code) != 3 or rate <= 0:
+                raise ValueError(f"Line {line_no}: invalid currency code or rate")
+            rows.append((code, when, rate))
+    ensure_currency_schema(conn)
+    cur = conn.cursor()
+    try:
+        cur.executemany(
+            "INSERT INTO exchange_rates (currency, rate_date, rate) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE rate = VALUES(rate)",
+            rows,
+        )
+        conn.commit()
+    finally:
+        cur.close()
+    invalidate_rates()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    # Load a rate file (no network): python expense_currency.py rates.csv
+    if len(sys.argv) < 2:
+        print("Usage: python expense_currency.py <rates.csv>")
+        sys.exit(1)
+    from db_connect import connect_db
+
+    conn = connect_db()
+    if conn is None:
+        print("❌ Unable to connect to database.")
+        sys.exit(1)
+    try:
+        print(f"✅ Imported {import_rates(conn, sys.argv[1])} exchange rate(s) into {BASE_CURRENCY}.")
+    finally:
+        conn.close()
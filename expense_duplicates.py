@@ -0,0 +1,302 @@
+# expense_duplicates.py
+import math
+import sys
+from collections import defaultdict
+from datetime import timedelta
+from difflib import SequenceMatcher
+
+from expense_budgets import invalidate_tracker
+from expense_currency import invalidate_aggregates
+from expense_rangesum import invalidate_range_index
+from expense_utils import normalize_title
+
+# --- Duplicate Detection Configuration ---
+DATE_WINDOW_DAYS = 3        # candidates must be at most this many days apart
+AMOUNT_TOLERANCE = 0.01     # ... and within 1% of each other's amount
+MIN_TITLE_SCORE = 0.8       # SequenceMatcher ratio on normalized titles
+SCAN_CHUNK_SIZE = 2000
+
+
+def ensure_duplicate_schema(conn):
+    """Create the candidate table and the incremental scan bookmark."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expense_duplicate_candidates (
+                id_a INT NOT NULL,
+                id_b INT NOT NULL,
+                score DECIMAL(4, 3) NOT NULL,
+                status VARCHAR(10) NOT NULL DEFAULT 'open',
+                found_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (id_a, id_b),
+                INDEX idx_dup_status (status)
+            )
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS expense_dedup_state (
+                id TINYINT NOT NULL PRIMARY KEY,
+                last_scanned_id INT NOT NULL DEFAULT 0
+            )
+            """
+        )
+        cur.execute("INSERT IGNORE INTO expense_dedup_state (id, last_scanned_id) VALUES (1, 0)")
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _amount_bucket(amount: float) -> int:
+    """Log-scale bucket of width AMOUNT_TOLERANCE (amounts are ordered by bucket)."""
+    return int(math.floor(math.log(max(float(amount), 0.01)) / math.log1p(AMOUNT_TOLERANCE)))
+
+
+def _amount_range(amount: float) -> tuple:
+    """Lowest and highest amount ``_is_candidate`` accepts next to ``amount``.
+
+    Below one unit the absolute 0.01 tolerance is wider than 1%, so small amounts
+    reach more than one bucket away.
+    """
+    amount = float(amount)
+    lo = amount - max(0.01, amount * AMOUNT_TOLERANCE)
+    hi = max(amount + 0.01, amount / (1 - AMOUNT_TOLERANCE))
+    return lo - 1e-9, hi + 1e-9
+
+
+def _blocking_key(row) -> tuple:
+    return _amount_bucket(row["amount"]), row["date"].toordinal() // DATE_WINDOW_DAYS
+
+
+def title_score(a: str, b: str) -> float:
+    """Similarity of two normalized titles in [0, 1]."""
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def _is_candidate(a, b) -> bool:
+    if a["currency"] != b["currency"]:
+        return False
+    if abs((a["date"] - b["date"]).days) > DATE_WINDOW_DAYS:
+        return False
+    hi = max(float(a["amount"]), float(b["amount"]))
+    return abs(float(a["amount"]) - float(b["amount"])) <= max(0.01, hi * AMOUNT_TOLERANCE)
+
+
+def _fetch(cur, sql, params):
+    cur.execute(sql, params)
+    cols = ("id", "date", "amount", "title", "currency")
+    rows = [dict(zip(cols, r)) for r in cur.fetchall()]
+    for r in rows:
+        r["key"] = normalize_title(r["title"])
+    return rows
+
+
+def _neighbour_spans(rows) -> list:
+    """Merged ``(first_date, last_date, min_amount, max_amount)`` spans whose rows can pair with ``rows``.
+
+    Each new row needs its own and the adjacent date blocks; overlapping spans are
+    merged so every neighbour is read once per chunk.
+    """
+    window = timedelta(days=DATE_WINDOW_DAYS)
+    spans = []
+    for row in sorted(rows, key=lambda r: r["date"]):
+        lo, hi = _amount_range(row["amount"])
+        first, last = row["date"] - window, row["date"] + window
+        if spans and first <= spans[-1][1]:
+            prev = spans[-1]
+            spans[-1] = (prev[0], max(prev[1], last), min(prev[2], lo), max(prev[3], hi))
+        else:
+            spans.append((first, last, lo, hi))
+    return spans
+
+
+def scan(connect_db, full: bool = False, on_progress=None) -> int:
+    """Find duplicate candidates among expenses added since the last scan.
+
+    New rows are walked in (date, id) order, so each chunk covers a short stretch
+    of dates even for a full rescan or a historical import, and neighbours are
+    read per merged date/amount span around the chunk's rows. Rows are then
+    grouped by blocking key (log amount bucket, date window) and only compared
+    with rows in the blocks their tolerance can reach, so the work grows with the
+    number of near-collisions instead of n². Returns the number of new candidate
+    pairs.
+    """
+    conn = connect_db()
+    if conn is None:
+        raise ConnectionError("Unable to connect to database.")
+    found = 0
+    cur = None
+    try:
+        ensure_duplicate_schema(conn)
+        cur = conn.cursor()
+        if full:
+            cur.execute("UPDATE expense_dedup_state SET last_scanned_id = 0 WHERE id = 1")
+        cur.execute("SELECT last_scanned_id FROM expense_dedup_state WHERE id = 1")
+        last_id = cur.fetchone()[0]
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM expenses")
+        max_id = cur.fetchone()[0]
+        scanned = 0
+        after = None   # (date, id) of the last new row handled
+        while True:
+            sql = "SELECT id, date, amount, title, currency FROM expenses WHERE id > %s AND id <= %s"
+            params = (last_id, max_id)
+            if after:
+                sql += " AND (date > %s OR (date = %s AND id > %s))"
+                params += (after[0], after[0], after[1])
+            new_rows = _fetch(cur, sql + " ORDER BY date, id LIMIT %s", params + (SCAN_CHUNK_SIZE,))
+            if not new_rows:
+                break
+            after = (new_rows[-1]["date"], new_rows[-1]["id"])
+            blocks = defaultdict(list)
+            for first, last, lo, hi in _neighbour_spans(new_rows):
+                for row in _fetch(
+                    cur,
+                    """
+                    SELECT id, date, amount, title, currency FROM expenses
+                    WHERE date BETWEEN %s AND %s AND amount BETWEEN %s AND %s AND id <= %s
+                    """,
+                    (first, last, lo, hi, max_id),
+                ):
+                    blocks[_blocking_key(row)].append(row)
+
+            pairs = []
+            for row in new_rows:
+                _, date_block = _blocking_key(row)
+                lo, hi = _amount_range(row["amount"])
+                for bucket in range(_amount_bucket(lo), _amount_bucket(hi) + 1):
+                    for dd in (-1, 0, 1):
+                        for other in blocks.get((bucket, date_block + dd), ()):
+                            # Pairs of two new rows are scored once, from the newer row
+                            if other["id"] == row["id"] or (other["id"] > last_id and other["id"] > row["id"]):
+                                continue
+                            if not _is_candidate(row, other):
+                                continue
+                            score = title_score(row["key"], other["key"])
+                            if score >= MIN_TITLE_SCORE:
+                                pairs.append((min(row["id"], other["id"]), max(row["id"], other["id"]), round(score, 3)))
+            if pairs:
+                cur.executemany(
+                    "INSERT IGNORE INTO expense_duplicate_candidates (id_a, id_b, score) VALUES (%s, %s, %s)",
+                    pairs,
+                )
+                found += cur.rowcount if cur.rowcount and cur.rowcount > 0 else 0
+            # The bookmark only moves once every new row is done; an interrupted scan
+            # repeats its chunks and INSERT IGNORE drops the pairs it already stored
+            conn.commit()
+            scanned += len(new_rows)
+            if on_progress:
+                on_progress(scanned, found)
+        cur.execute("UPDATE expense_dedup_state SET last_scanned_id = %s WHERE id = 1", (max_id,))
+        conn.commit()
+        return found
+    finally:
+        try:
+            if cur:
+                cur.close()
+        except Exception:
+            pass
+        conn.close()
+
+
+def list_candidates(conn, limit: int = 500) -> list:
+    """Open candidate pairs with both expenses, best matches first."""
+    ensure_duplicate_schema(conn)
+    cur = conn.cursor(dictionary=True)
+    try:
+        cur.execute(
+            """
+            SELECT d.id_a, d.id_b, d.score,
+                   a.date AS date_a, a.title AS title_a, a.amount AS amount_a,
+                   b.date AS date_b, b.title AS title_b, b.amount AS amount_b
+            FROM expense_duplicate_candidates d
+            JOIN expenses a ON a.id = d.id_a
+            JOIN expenses b ON b.id = d.id_b
+            WHERE d.status = 'open'
+            ORDER BY d.score DESC, d.id_b DESC
+            LIMIT %s
+            """,
+            (limit,),
+        )
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def _kept_ids(pairs) -> dict:
+    """Map each removed id to the row that survives its chain of pairs.
+
+    Pairs are (older, newer), so the oldest id of each connected group is never
+    removed; with (1, 2) and (2, 3) both 2 and 3 merge into 1.
+    """
+    parent = {}
+
+    def root(i):
+        while parent.get(i, i) != i:
+            parent[i] = parent.get(parent[i], parent[i])
+            i = parent[i]
+        return i
+
+    for id_a, id_b in pairs:
+        ra, rb = root(id_a), root(id_b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    return {id_b: root(id_b) for _, id_b in pairs}
+
+
+def resolve(conn, pairs, action: str) -> int:
+    """Apply a review decision to candidate pairs ``[(id_a, id_b), ...]``.
+
+    ``delete`` removes the newer expense of each pair, ``merge`` additionally appends
+    its notes to the row that is finally kept (chained pairs merge into the oldest
+    row), and ``dismiss`` marks the pair as not a duplicate.
+    """
+    pairs = list(pairs)
+    if not pairs:
+        return 0
+    cur = conn.cursor()
+    try:
+        if action == "dismiss":
+            cur.executemany(
+                "UPDATE expense_duplicate_candidates SET status = 'dismissed' WHERE id_a = %s AND id_b = %s", pairs
+            )
+        elif action in ("delete", "merge"):
+            removed = sorted({id_b for _, id_b in pairs})
+            if action == "merge":
+                keep = _kept_ids(pairs)
+                cur.executemany(
+                    """
+                    UPDATE expenses a JOIN expenses b ON b.id = %s
+                    SET a.notes = TRIM(CONCAT_WS('\\n', NULLIF(a.notes, ''), NULLIF(b.notes, '')))
+                    WHERE a.id = %s AND COALESCE(b.notes, '') <> '' AND COALESCE(a.notes, '') <> b.notes
+                    """,
+                    [(id_b, keep[id_b]) for id_b in removed],
+                )
+            cur.executemany("DELETE FROM expenses WHERE id = %s", [(i,) for i in removed])
+            cur.executemany(
+                "DELETE FROM expense_duplicate_candidates WHERE id_a = %s OR id_b = %s", [(i, i) for i in removed]
+            )
+        else:
+            raise ValueError(f"Unknown action: {action}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    if action != "dismiss":
+        invalidate_tracker()
+        invalidate_range_index()
+        invalidate_aggregates()
+    return len(pairs)
+
+
+if __name__ == "__main__":
+    # Incremental scan (add --full to rescan everything): python expense_duplicates.py
+    from db_connect import connect_db
+
+    total = scan(connect_db, full="--full" in sys.argv[1:],
+                 on_progress=lambda n, f: print(f"  scanned {n:,} rows, {f} candidate pair(s)"))
+    print(f"✅ Duplicate scan finished: {total} new candidate pair(s).")
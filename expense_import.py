@@ -0,0 +1,389 @@
+# expense_import.py
+import csv
+import os
+import re
+import sys
+from datetime import datetime
+
+from expense_classifier import ensure_classifier_schema, get_classifier
+from expense_currency import BASE_CURRENCY, ensure_currency_schema, get_rate_table
+from expense_utils import (
+    EXPENSE_CATEGORIES,
+    EXPENSE_STATUSES,
+    PAYMENT_METHODS,
+    content_hash,
+    validate_expense,
+)
+
+# --- Import Configuration ---
+BATCH_SIZE = 1000
+DEFAULT_DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y", "%d.%m.%Y", "%Y/%m/%d")
+IMPORT_FIELDS = ("date", "title", "amount", "category", "payment_method", "status", "notes", "currency")
+REQUIRED_FIELDS = ("date", "title", "amount")
+MAX_REPORTED_ERRORS = 50
+
+# Header names commonly used by bank statement exports, per expense field
+_HEADER_GUESSES = {
+    "date": ("date", "transaction date", "posting date", "value date", "booking date"),
+    "title": ("title", "description", "details", "narration", "payee", "merchant", "memo"),
+    "amount": ("amount", "debit", "value", "withdrawal", "amount (usd)"),
+    "category": ("category", "type"),
+    "payment_method": ("payment method", "payment", "method", "channel"),
+    "status": ("status",),
+    "notes": ("notes", "note", "reference", "remarks"),
+    "currency": ("currency", "ccy", "currency code"),
+}
+_AMOUNT_CLEAN_RE = re.compile(r"[^\d,.\-()]")
+
+
+def ensure_import_schema(conn):
+    """Add the indexed ``content_hash`` column to ``expenses`` and backfill it once."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'expenses' AND COLUMN_NAME = 'content_hash'
+            """
+        )
+        if cur.fetchone()[0]:
+            return
+        cur.execute(
+            """
+            ALTER TABLE expenses
+            ADD COLUMN content_hash CHAR(40) NULL,
+            ADD INDEX idx_expenses_content_hash (content_hash)
+            """
+        )
+        conn.commit()
+    finally:
+        cur.close()
+    backfill_content_hashes(conn)
+
+
+def backfill_content_hashes(conn, batch_size: int = BATCH_SIZE, rehash: bool = False) -> int:
+    """Compute ``content_hash`` for rows saved before the column existed.
+
+    ``rehash`` recomputes every row, e.g. after the hash key gained the currency and
+    accent folding (``python expense_import.py --rehash``).
+    """
+    updated = 0
+    last_id = 0
+    cur = conn.cursor()
+    pending = "" if rehash else "content_hash IS NULL AND "
+    try:
+        while True:
+            cur.execute(
+                f"""
+                SELECT id, date, amount, title, currency FROM expenses
+                WHERE {pending}id > %s
+                ORDER BY id LIMIT %s
+                """,
+                (last_id, batch_size),
+            )
+            rows = cur.fetchall()
+            if not rows:
+                break
+            cur.executemany(
+                "UPDATE expenses SET content_hash=%s WHERE id=%s",
+                [(content_hash(d, a, t, c), rid) for rid, d, a, t, c in rows],
+            )
+            conn.commit()
+            updated += len(rows)
+            last_id = rows[-1][0]
+    finally:
+        cur.close()
+    return updated
+
+
+def read_header(path: str) -> list:
+    """Return the header row of a CSV file (used to build the column mapping)."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+
+def guess_mapping(headers) -> dict:
+    """Best-effort mapping of expense fields to CSV headers by name."""
+    lowered = {h.strip().lower(): h for h in headers}
+    mapping = {}
+    for field, candidates in _HEADER_GUESSES.items():
+        for cand in candidates:
+            if cand in lowered:
+                mapping[field] = lowered[cand]
+                break
+    return mapping
+
+
+def parse_amount(raw, negative_debits: bool = False):
+    """Parse a statement amount like '1,234.50', '(12.00)' or '-12.00 USD'.
+
+    With ``negative_debits`` the statement lists spending as negative numbers,
+    so those are flipped and positive rows (credits) are rejected.
+    """
+    text = _AMOUNT_CLEAN_RE.sub("", str(raw or "")).strip()
+    if not text:
+        return ""
+    negative = text.startswith("-") or (text.startswith("(") and text.endswith(")"))
+    text = text.strip("()-")
+    # Treat ',' as a decimal separator only when it is the last separator with 1-2 digits after it
+    if "," in text and "." not in text and len(text.rsplit(",", 1)[1]) in (1, 2):
+        text = text.replace(",", ".")
+    else:
+        text = text.replace(",", "")
+    if negative_debits:
+        return text if negative else "-" + text
+    return ("-" + text) if negative else text
+
+
+def parse_date(raw, date_formats=DEFAULT_DATE_FORMATS) -> str:
+    """Normalize a statement date to YYYY-MM-DD; returns the raw text if no format matches."""
+    text = str(raw or "").strip()
+    for fmt in date_formats:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return text
+
+
+def _pick(value, allowed, default):
+    value = (value or "").strip()
+    for a in allowed:
+        if a.lower() == value.lower():
+            return a
+    return default
+
+
+def map_row(raw: dict, mapping: dict, defaults: dict, date_formats, negative_debits: bool, currencies=None):
+    """Convert one CSV row into expense values.
+
+    Returns ``(values, error)`` where ``values`` is the INSERT tuple (ending with the
+    category_auto flag and the content hash; category is None when the file has none)
+    and ``error`` explains why the row was rejected. ``currencies`` limits the accepted
+    currency codes.
+    """
+    def col(field):
+        header = mapping.get(field)
+        return (raw.get(header) or "").strip() if header else ""
+
+    title = col("title")
+    date_str = parse_date(col("date"), date_formats)
+    amount_raw = parse_amount(col("amount"), negative_debits)
+    amount, error = validate_expense(title, amount_raw, date_str)
+    if error:
+        return None, error
+
+    # None means "not in the file": filled per batch by the categorizer or the default
+    category = _pick(col("category"), EXPENSE_CATEGORIES, None)
+    payment_method = _pick(col("payment_method"), PAYMENT_METHODS, defaults.get("payment_method", "Bank"))
+    status = _pick(col("status"), EXPENSE_STATUSES, defaults.get("status", "Paid"))
+    notes = col("notes")
+    currency = (col("currency") or defaults.get("currency") or BASE_CURRENCY).upper()
+    if currencies is not None and currency not in currencies:
+        return None, f"No exchange rate for currency '{currency}'"
+    return (
+        title[:255],
+        amount,
+        category,
+        date_str,
+        payment_method,
+        status,
+        notes,
+        currency,
+        0,
+        content_hash(date_str, amount, title, currency),
+    ), None
+
+
+def _existing_hash_counts(cur, hashes) -> dict:
+    """Count rows already stored for each hash (one indexed IN query per batch)."""
+    if not hashes:
+        return {}
+    placeholders = ", ".join(["%s"] * len(hashes))
+    cur.execute(
+        f"SELECT content_hash, COUNT(*) FROM expenses WHERE content_hash IN ({placeholders}) GROUP BY content_hash",
+        tuple(hashes),
+    )
+    return {h: int(n) for h, n in cur.fetchall()}
+
+
+def _iter_csv(path: str, progress: dict):
+    """Stream DictReader rows while tracking how far through the file we are."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        def lines():
+            for line in f:
+                progress["chars"] += len(line)
+                yield line
+        yield from csv.DictReader(lines())
+
+
+def import_csv(path, connect_db, mapping=None, defaults=None, date_formats=DEFAULT_DATE_FORMATS,
+               negative_debits=False, batch_size=BATCH_SIZE, on_progress=None, should_stop=None,
+               categorize=None):
+    """Stream a bank-statement CSV into ``expenses``.
+
+    Rows are validated like the entry form, hashed on (date, amount, normalized title, currency)
+    and inserted in batches, each batch in its own transaction. A row is only inserted
+    when the file contains more copies of its hash than the table already holds, so
+    re-importing the same or an overlapping statement is idempotent while genuine
+    same-day repeats inside one statement are kept.
+
+    Args:
+        path: CSV file to read.
+        connect_db: Callable returning a DB connection.
+        mapping: Expense field -> CSV header. Guessed from the header when omitted.
+        defaults: Fallback category/payment_method/status/currency for unmapped columns.
+        date_formats: strptime formats tried in order for the date column.
+        negative_debits: Set when the statement lists spending as negative amounts.
+        batch_size: Rows per INSERT transaction.
+        on_progress: Called with a stats dict after every batch (from the calling thread).
+        should_stop: Optional callable; the import stops after the current batch when it returns True.
+        categorize: Optional callable mapping a list of "title notes" strings to categories
+            (None = no guess), applied once per batch to rows without a category column value.
+
+    Returns:
+        A stats dict with read/inserted/duplicates/invalid counts and sample errors.
+    """
+    defaults = defaults or {}
+    if mapping is None:
+        mapping = guess_mapping(read_header(path))
+    missing = [f for f in REQUIRED_FIELDS if not mapping.get(f)]
+    if missing:
+        raise ValueError(f"Column mapping is missing required field(s): {', '.join(missing)}")
+
+    total_chars = max(1, os.path.getsize(path))
+    progress = {"chars": 0}
+    stats = {"read": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "errors": [], "fraction": 0.0,
+             "stopped": False}
+
+    conn = connect_db()
+    if conn is None:
+        raise ConnectionError("Unable to connect to database.")
+    cur = None
+    try:
+        ensure_currency_schema(conn)
+        ensure_import_schema(conn)   # the hash backfill reads currency
+        ensure_classifier_schema(conn)
+        # Rows in a currency without a local rate could not be totalled, so they are rejected
+        currencies = set(get_rate_table(conn).currencies)
+        cur = conn.cursor()
+        db_counts = {}    # hash -> rows stored before this import touched it
+        file_counts = {}  # hash -> rows seen so far in this file
+
+        default_category = defaults.get("category", "General")
+
+        def fill_categories(batch):
+            missing = [i for i, v in enumerate(batch) if v[2] is None]
+            if not missing:
+                return
+            guesses = [None] * len(missing)
+            if categorize:
+                try:
+                    guesses = categorize([f"{batch[i][0]} {batch[i][6]}" for i in missing])
+                except Exception as e:
+                    print(f"Auto-categorization skipped: {e}")
+            for i, guess in zip(missing, guesses):
+                v = batch[i]
+                # Guessed categories are flagged so the classifier does not learn its own output
+                batch[i] = v[:2] + (guess or default_category,) + v[3:8] + (int(guess is not None),) + v[9:]
+
+        def flush(batch):
+            fill_categories(batch)
+            unknown = list({v[-1] for v in batch if v[-1] not in db_counts})
+            found = _existing_hash_counts(cur, unknown)
+            for h in unknown:
+                db_counts[h] = found.get(h, 0)
+            to_insert = []
+            for values in batch:
+                h = values[-1]
+                file_counts[h] = file_counts.get(h, 0) + 1
+                if file_counts[h] > db_counts[h]:
+                    to_insert.append(values)
+                else:
+                    stats["duplicates"] += 1
+            if to_insert:
+                cur.executemany(
+                    """
+                    INSERT INTO expenses (title, amount, category, date, payment_method, status, notes, currency,
+                                          category_auto, content_hash)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    to_insert,
+                )
+            conn.commit()
+            stats["inserted"] += len(to_insert)
+            stats["fraction"] = min(1.0, progress["chars"] / total_chars)
+            if on_progress:
+                on_progress(dict(stats))
+
+        batch = []
+        for line_no, raw in enumerate(_iter_csv(path, progress), start=2):
+            stats["read"] += 1
+            values, error = map_row(raw, mapping, defaults, date_formats, negative_debits, currencies)
+            if error:
+                stats["invalid"] += 1
+                if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                    stats["errors"].append(f"Line {line_no}: {error}")
+                continue
+            batch.append(values)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+                if should_stop and should_stop():
+                    stats["stopped"] = True
+                    break
+        if batch and not stats["stopped"]:
+            flush(batch)
+        stats["fraction"] = 1.0
+        if on_progress:
+            on_progress(dict(stats))
+        return stats
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        try:
+            if cur:
+                cur.close()
+        except Exception:
+            pass
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+if __name__ == "__main__":
+    # Headless usage: python expense_import.py statement.csv [--negative-debits]
+    #                  python expense_import.py --rehash   (recompute every stored content_hash)
+    if len(sys.argv) < 2:
+        print("Usage: python expense_import.py <statement.csv> [--negative-debits] | --rehash")
+        sys.exit(1)
+    from db_connect import connect_db
+
+    if sys.argv[1] == "--rehash":
+        db = connect_db()
+        try:
+            ensure_currency_schema(db)
+            ensure_import_schema(db)
+            print(f"✅ Recomputed {backfill_content_hashes(db, rehash=True)} content hash(es).")
+        finally:
+            db.close()
+        sys.exit(0)
+
+    classifier = get_classifier(connect_db)
+    result = import_csv(
+        sys.argv[1],
+        connect_db,
+        negative_debits="--negative-debits" in sys.argv[2:],
+        categorize=classifier.predict_batch if classifier else None,
+        on_progress=lambda s: print(f"  {s['fraction']:.0%} read={s['read']} inserted={s['inserted']} "
+                                    f"duplicates={s['duplicates']} invalid={s['invalid']}"),
+    )
+    print(f"✅ Import finished: {result['inserted']} inserted, {result['duplicates']} duplicates, "
+          f"{result['invalid']} invalid.")
+    for err in result["errors"]:
+        print(f"   ⚠️ {err}")
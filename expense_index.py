@@ -0,0 +1,150 @@
+# expense_index.py
+from collections import defaultdict
+
+# Offsets of the set bits in every possible byte, used to expand a bitset into row positions
+_BYTE_BITS = tuple(tuple(b for b in range(8) if value >> b & 1) for value in range(256))
+
+
+def _bitset(positions, offset: int = 0) -> int:
+    """Build an int bitset from ascending row positions in O(n)."""
+    if not positions:
+        return 0
+    buf = bytearray(((positions[-1] - offset) >> 3) + 1)
+    for p in positions:
+        p -= offset
+        buf[p >> 3] |= 1 << (p & 7)
+    return int.from_bytes(buf, "little") << offset
+
+
+def _positions(mask: int) -> list:
+    """Expand an int bitset into ascending row positions."""
+    out = []
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    for byte_index, value in enumerate(data):
+        if value:
+            base = byte_index << 3
+            out.extend(base + b for b in _BYTE_BITS[value])
+    return out
+
+
+class ExpenseIndex:
+    """In-memory expense cache with bitset indexes for the filter bar.
+
+    Rows keep their load order (newest first). Every category and status owns an
+    int bitset of row positions and each row has a precomputed lowercase
+    "title + notes" key, so a combined filter is a couple of big-int ANDs
+    followed by a substring check over only the surviving rows.
+    """
+
+    def __init__(self, rows=()):
+        self.rows = []
+        self._text_keys = []
+        self._category_bits = {}
+        self._status_bits = {}
+        self._by_id = {}
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def clear(self):
+        self.rows = []
+        self._text_keys = []
+        self._category_bits = {}
+        self._status_bits = {}
+        self._by_id = {}
+
+    def rebuild(self, rows):
+        """Replace the cached rows and rebuild every index."""
+        self.clear()
+        self.extend(rows)
+
+    def extend(self, rows):
+        """Append rows (e.g. an older page of history) and index them."""
+        start = len(self.rows)
+        by_category = defaultdict(list)
+        by_status = defaultdict(list)
+        for pos, row in enumerate(rows, start=start):
+            self.rows.append(row)
+            self._by_id[row["id"]] = pos
+            self._text_keys.append(f"{row.get('title') or ''}\x00{row.get('notes') or ''}".lower())
+            by_category[row.get("category")].append(pos)
+            by_status[row.get("status")].append(pos)
+        for key, positions in by_category.items():
+            self._category_bits[key] = self._category_bits.get(key, 0) | _bitset(positions, start)
+        for key, positions in by_status.items():
+            self._status_bits[key] = self._status_bits.get(key, 0) | _bitset(positions, start)
+
+    def get(self, row_id):
+        """Return the cached row with the given id, or None."""
+        pos = self._by_id.get(row_id)
+        return self.rows[pos] if pos is not None else None
+
+    def count_since(self, since) -> int:
+        """Number of leading rows dated on/after ``since`` (rows are newest first)."""
+        rows = self.rows
+        lo, hi = 0, len(rows)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if rows[mid]["date"] >= since:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def filter(self, category=None, status=None, text="", since=None, also_ids=None):
+        """Return rows matching all given filters, in load order.
+
+        ``category``/``status`` of None or "All" mean no restriction; ``text`` is a
+        lowercase substring searched in the cached title/notes keys, and rows whose
+        id is in ``also_ids`` count as text matches too (e.g. notes matched in SQL).
+        ``since`` keeps only rows dated on/after that date.
+        """
+        end = self.count_since(since) if since else len(self.rows)
+        mask = None
+        if category and category != "All":
+            mask = self._category_bits.get(category, 0)
+        if status and status != "All":
+            bits = self._status_bits.get(status, 0)
+            mask = bits if mask is None else mask & bits
+        rows, keys = self.rows, self._text_keys
+        if mask is None:
+            candidates = range(end)
+        else:
+            if end < len(rows):
+                mask &= (1 << end) - 1
+            candidates = _positions(mask)
+        if not text:
+            return [rows[i] for i in candidates]
+        also_ids = also_ids or ()
+        return [rows[i] for i in candidates if text in keys[i] or rows[i]["id"] in also_ids]
+
+
+if __name__ == "__main__":
+    # Quick timing check: python expense_index.py [rows]
+    import random
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    categories = ("General", "Food", "Transport", "Utilities", "Rent", "Shopping")
+    statuses = ("Planned", "Incurred", "Paid")
+    words = ("coffee", "rent", "bus", "grocery", "netflix", "fuel", "lunch", "book")
+    data = [
+        {
+            "id": i,
+            "title": f"{random.choice(words)} {i}",
+            "category": random.choice(categories),
+            "status": random.choice(statuses),
+            "notes": random.choice(("", "card", "shared with team")),
+        }
+        for i in range(n)
+    ]
+    t0 = time.perf_counter()
+    index = ExpenseIndex(data)
+    t1 = time.perf_counter()
+    print(f"build: {(t1 - t0) * 1000:.1f} ms for {n:,} rows")
+    for args in (("Food", None, ""), ("Food", "Paid", ""), ("Food", "Paid", "coffee"), (None, None, "netflix")):
+        t0 = time.perf_counter()
+        hits = index.filter(*args)
+        print(f"filter{args}: {len(hits):,} rows in {(time.perf_counter() - t0) * 1000:.1f} ms")
@@ -0,0 +1,236 @@
+# expense_rangesum.py
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from expense_currency import grouped_totals, to_base
+
+# Days kept beyond the newest expense so future-dated entries rarely force a rebuild
+_FUTURE_PADDING_DAYS = 366
+
+_index = None
+_index_lock = threading.Lock()
+
+
+class FenwickTree:
+    """Binary indexed tree over a fixed number of slots (0-based API)."""
+
+    def __init__(self, size: int = 0, values=None):
+        if values is not None:
+            size = len(values)
+        self.size = size
+        self._tree = [0.0] * (size + 1)
+        if values is not None:
+            # O(n) build: push each node's partial sum to its parent once
+            tree = self._tree
+            for i, v in enumerate(values, start=1):
+                tree[i] += v
+                parent = i + (i & -i)
+                if parent <= size:
+                    tree[parent] += tree[i]
+
+    def add(self, index: int, delta: float):
+        i = index + 1
+        tree = self._tree
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+
+    def prefix_sum(self, index: int) -> float:
+        """Sum of slots ``0..index`` inclusive."""
+        i = min(index + 1, self.size)
+        total = 0.0
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def range_sum(self, lo: int, hi: int) -> float:
+        """Sum of slots ``lo..hi`` inclusive."""
+        lo = max(lo, 0)
+        if hi < lo or lo >= self.size:
+            return 0.0
+        return self.prefix_sum(hi) - (self.prefix_sum(lo - 1) if lo > 0 else 0.0)
+
+
+def _as_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+
+
+class DailyExpenseTotals:
+    """Per-day base-currency totals (overall and per category) answering any date range in O(log n).
+
+    Each day since the oldest expense is one Fenwick slot. Writes move single
+    amounts in O(log n); a date outside the covered span rebuilds the trees with
+    a wider span from the kept daily values. Expenses dated after ``as_of`` are
+    not counted; ``get_range_index`` rebuilds an index built on an earlier day.
+    """
+
+    def __init__(self):
+        self.epoch = date.today()
+        self.as_of = self.epoch
+        self.days = 0
+        self._daily = {}   # category (None = all) -> list of per-day totals
+        self._trees = {}
+        self._lock = threading.Lock()
+
+    def load(self, conn):
+        """Build the trees from one GROUP BY (date, category, currency) pass over ``expenses``."""
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                """
+                SELECT date, category, currency, SUM(amount) FROM expenses
+                WHERE date IS NOT NULL AND date <= %s GROUP BY date, category, currency
+                """,
+                (self.as_of,),
+            )
+            grouped = [((_as_date(d), cat or "General"), code, d, total) for d, cat, code, total in cur.fetchall()]
+        finally:
+            cur.close()
+        rows = [(d, cat, total) for (d, cat), total in grouped_totals(conn, grouped).items()]
+        today = date.today()
+        first = min([r[0] for r in rows] + [today])
+        last = max([r[0] for r in rows] + [today])
+        days = (last - first).days + 1 + _FUTURE_PADDING_DAYS
+        daily = {None: [0.0] * days}
+        for d, cat, total in rows:
+            offset = (d - first).days
+            daily[None][offset] += total
+            daily.setdefault(cat, [0.0] * days)[offset] += total
+        with self._lock:
+            self.epoch, self.days, self._daily = first, days, daily
+            self._trees = {key: FenwickTree(values=values) for key, values in daily.items()}
+
+    def _grow_to(self, d: date):
+        """Rebuild with a span that includes ``d`` (called with the lock held)."""
+        first = min(self.epoch, d)
+        last = max(self.epoch + timedelta(days=self.days - 1), d)
+        days = (last - first).days + 1 + _FUTURE_PADDING_DAYS
+        shift = (self.epoch - first).days
+        daily = {}
+        for key, values in self._daily.items():
+            grown = [0.0] * days
+            grown[shift:shift + len(values)] = values
+            daily[key] = grown
+        self.epoch, self.days, self._daily = first, days, daily
+        self._trees = {key: FenwickTree(values=values) for key, values in daily.items()}
+
+    def _add(self, d: date, category: str, amount: float):
+        offset = (d - self.epoch).days
+        if offset < 0 or offset >= self.days:
+            self._grow_to(d)
+            offset = (d - self.epoch).days
+        for key in (None, category):
+            if key not in self._daily:
+                self._daily[key] = [0.0] * self.days
+                self._trees[key] = FenwickTree(self.days)
+            self._daily[key][offset] += amount
+            self._trees[key].add(offset, amount)
+
+    def apply_delta(self, old=None, new=None):
+        """Move an expense from its old version to its new one (either may be None)."""
+        with self._lock:
+            for row, sign in ((old, -1), (new, 1)):
+                if row and _as_date(row["date"]) <= self.as_of:
+                    self._add(_as_date(row["date"]), row.get("category") or "General", sign * to_base(row))
+
+    def range_sum(self, start, end, category=None) -> float:
+        """Total spent from ``start`` to ``end`` inclusive, optionally for one category."""
+        start, end = _as_date(start), _as_date(end)
+        if end < start:
+            start, end = end, start
+        with self._lock:
+            tree = self._trees.get(category if category not in ("", "All") else None)
+            if tree is None:
+                return 0.0
+            return tree.range_sum((start - self.epoch).days, (end - self.epoch).days)
+
+
+def get_range_index(connect_db):
+    """Shared per-process range index, built on first use and again on each new day."""
+    global _index
+    with _index_lock:
+        if _index is not None and _index.as_of == date.today():
+            return _index
+    index = DailyExpenseTotals()
+    conn = connect_db()
+    if conn is None:
+        raise ConnectionError("Unable to connect to database.")
+    try:
+        index.load(conn)
+    finally:
+        conn.close()
+    with _index_lock:
+        if _index is None or _index.as_of != index.as_of:
+            _index = index
+        return _index
+
+
+def invalidate_range_index():
+    """Drop the shared index (e.g. after a bulk import) so it is rebuilt on next use."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def benchmark(connect_db, queries: int = 200):
+    """Compare random date-range totals from the index against SQL SUM.
+
+    SQL sums per (currency, date) and converts them through the same rate table, so
+    both sides are in the base currency.
+    """
+    t0 = time.perf_counter()
+    index = DailyExpenseTotals()
+    conn = connect_db()
+    if conn is None:
+        raise ConnectionError("Unable to connect to database.")
+    try:
+        index.load(conn)
+        build_ms = (time.perf_counter() - t0) * 1000
+        span = max(1, index.days - _FUTURE_PADDING_DAYS)
+        ranges = []
+        for _ in range(queries):
+            a, b = sorted(random.randrange(span) for _ in range(2))
+            ranges.append((index.epoch + timedelta(days=a), index.epoch + timedelta(days=b)))
+
+        cur = conn.cursor()
+        t0 = time.perf_counter()
+        sql_totals = []
+        for start, end in ranges:
+            cur.execute(
+                """
+                SELECT currency, date, SUM(amount) FROM expenses
+                WHERE date BETWEEN %s AND %s AND date <= %s GROUP BY currency, date
+                """,
+                (start, end, index.as_of),
+            )
+            grouped = [(None, code, d, total) for code, d, total in cur.fetchall()]
+            sql_totals.append(grouped_totals(conn, grouped).get(None, 0.0))
+        sql_ms = (time.perf_counter() - t0) * 1000
+        cur.close()
+    finally:
+        conn.close()
+
+    t0 = time.perf_counter()
+    tree_totals = [index.range_sum(start, end) for start, end in ranges]
+    tree_ms = (time.perf_counter() - t0) * 1000
+    mismatches = sum(1 for a, b in zip(sql_totals, tree_totals) if abs(a - b) > 0.01)
+    print(f"Index build: {build_ms:.1f} ms over {span:,} days")
+    print(f"SQL SUM:     {sql_ms / queries:.3f} ms/query")
+    print(f"Fenwick:     {tree_ms / queries * 1000:.1f} µs/query")
+    print(f"Mismatches:  {mismatches} of {queries}")
+
+
+if __name__ == "__main__":
+    # Benchmark against SQL SUM: python expense_rangesum.py [queries]
+    from db_connect import connect_db
+
+    benchmark(connect_db, int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,316 @@
+# expense_recurring.py
+import calendar
+import threading
+from datetime import date, datetime, timedelta
+
+from expense_budgets import invalidate_tracker
+from expense_currency import BASE_CURRENCY, get_rate_table, invalidate_aggregates
+from expense_rangesum import invalidate_range_index
+from expense_utils import content_hash
+
+# --- Recurring Expense Configuration ---
+FREQUENCIES = ("monthly", "weekly", "days")
+# Occurrences are written to `expenses` once due; later ones are only projected (projected_totals),
+# so budgets and totals never count spending that has not happened yet
+MATERIALIZE_HORIZON_DAYS = 0
+MATERIALIZE_BATCH_SIZE = 500
+MATERIALIZE_INTERVAL_SEC = 6 * 3600
+
+_RULE_COLUMNS = (
+    "id", "title", "amount", "currency", "category", "payment_method", "status", "notes",
+    "frequency", "interval_n", "start_date", "end_date", "materialized_until",
+)
+
+_worker = {"thread": None, "stop": threading.Event()}
+
+
+def ensure_recurring_schema(conn):
+    """Create the recurring-expense rule table if needed."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS recurring_expenses (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                title VARCHAR(255) NOT NULL,
+                amount DECIMAL(12, 2) NOT NULL,
+                currency CHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}',
+                category VARCHAR(50) NOT NULL DEFAULT 'General',
+                payment_method VARCHAR(50) NOT NULL DEFAULT 'Cash',
+                status VARCHAR(20) NOT NULL DEFAULT 'Planned',
+                notes TEXT,
+                frequency VARCHAR(10) NOT NULL,
+                interval_n INT NOT NULL DEFAULT 1,
+                start_date DATE NOT NULL,
+                end_date DATE NULL,
+                materialized_until DATE NULL,
+                active TINYINT(1) NOT NULL DEFAULT 1,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'recurring_expenses' AND COLUMN_NAME = 'currency'
+            """
+        )
+        if not cur.fetchone()[0]:
+            # Rules created before multi-currency support were in the base currency
+            cur.execute(
+                f"ALTER TABLE recurring_expenses ADD COLUMN currency CHAR(3) NOT NULL DEFAULT '{BASE_CURRENCY}' "
+                "AFTER amount"
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def _add_months(d: date, months: int, day: int) -> date:
+    """Shift ``d`` by ``months``, clamping ``day`` to the target month's length."""
+    month_index = d.month - 1 + months
+    year, month = d.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def iter_occurrences(rule: dict, start: date, end: date):
+    """Yield the rule's occurrence dates within ``start..end`` without walking earlier ones.
+
+    The first occurrence on/after ``start`` is computed arithmetically, so a
+    multi-year rule costs only the occurrences actually requested.
+    """
+    first = rule["start_date"]
+    step = max(1, int(rule.get("interval_n") or 1))
+    if rule.get("end_date"):
+        end = min(end, rule["end_date"])
+    start = max(start, first)
+    if end < start:
+        return
+    if rule["frequency"] == "monthly":
+        months = (start.year - first.year) * 12 + (start.month - first.month)
+        k = max(0, months // step)
+        current = _add_months(first, k * step, first.day)
+        while current < start:
+            k += 1
+            current = _add_months(first, k * step, first.day)
+        while current <= end:
+            yield current
+            k += 1
+            current = _add_months(first, k * step, first.day)
+    else:
+        days = step * (7 if rule["frequency"] == "weekly" else 1)
+        k = -(-(start - first).days // days)  # ceil division
+        current = first + timedelta(days=k * days)
+        while current <= end:
+            yield current
+            current += timedelta(days=days)
+
+
+def load_rules(conn, active_only: bool = True) -> list:
+    cur = conn.cursor()
+    try:
+        sql = f"SELECT {', '.join(_RULE_COLUMNS)} FROM recurring_expenses"
+        if active_only:
+            sql += " WHERE active = 1"
+        cur.execute(sql + " ORDER BY title")
+        return [dict(zip(_RULE_COLUMNS, r)) for r in cur.fetchall()]
+    finally:
+        cur.close()
+
+
+def add_rule(conn, values: dict) -> int:
+    """Insert a rule; ``values`` holds the expense fields plus frequency/interval_n/start_date/end_date."""
+    if values.get("frequency") not in FREQUENCIES:
+        raise ValueError(f"Frequency must be one of: {', '.join(FREQUENCIES)}")
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            INSERT INTO recurring_expenses
+                (title, amount, currency, category, payment_method, status, notes, frequency, interval_n,
+                 start_date, end_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            (
+                values["title"], values["amount"], (values.get("currency") or BASE_CURRENCY).upper(),
+                values.get("category", "General"),
+                values.get("payment_method", "Cash"), values.get("status", "Planned"), values.get("notes", ""),
+                values["frequency"], int(values.get("interval_n") or 1), values["start_date"], values.get("end_date"),
+            ),
+        )
+        conn.commit()
+        return cur.lastrowid
+    finally:
+        cur.close()
+
+
+def deactivate_rule(conn, rule_id):
+    """Stop a rule; occurrences already written to ``expenses`` are kept."""
+    cur = conn.cursor()
+    try:
+        cur.execute("UPDATE recurring_expenses SET active = 0 WHERE id = %s", (rule_id,))
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def next_occurrence(rule: dict, after: date = None):
+    """The first occurrence after ``after`` (default: yesterday), or None when the rule has ended."""
+    after = after or (date.today() - timedelta(days=1))
+    return next(iter_occurrences(rule, after + timedelta(days=1), date.max), None)
+
+
+def materialize(connect_db, horizon_days: int = MATERIALIZE_HORIZON_DAYS, batch_size: int = MATERIALIZE_BATCH_SIZE,
+                rule_id=None) -> int:
+    """Write due occurrences into ``expenses`` up to today + ``horizon_days``.
+
+    Each batch is inserted with its ``materialized_until`` bump in one transaction,
+    so an interrupted run resumes where it stopped without duplicating rows. The bump
+    only applies while the rule is still where this run read it, so concurrent runs
+    (the background materializer and the dialog) never write the same occurrences.
+    Returns the number of expenses inserted.
+    """
+    horizon = date.today() + timedelta(days=horizon_days)
+    conn = connect_db()
+    if conn is None:
+        raise ConnectionError("Unable to connect to database.")
+    inserted = 0
+    cur = None
+    try:
+        ensure_recurring_schema(conn)
+        rules = [r for r in load_rules(conn) if rule_id is None or r["id"] == int(rule_id)]
+        cur = conn.cursor()
+        for rule in rules:
+            done = rule["materialized_until"]
+            start = done + timedelta(days=1) if done else rule["start_date"]
+            batch = []
+            for when in iter_occurrences(rule, start, horizon):
+                batch.append(when)
+                if len(batch) >= batch_size:
+                    written = _write_batch(conn, cur, rule, batch, done, batch[-1])
+                    if written is None:
+                        break
+                    inserted += written
+                    done, batch = batch[-1], []
+            else:
+                # Record progress up to the horizon even when the tail produced no occurrence
+                last = min(horizon, rule["end_date"]) if rule["end_date"] else horizon
+                if batch or not done or done < last:
+                    inserted += _write_batch(conn, cur, rule, batch, done, last) or 0
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        raise
+    finally:
+        try:
+            if cur:
+                cur.close()
+        except Exception:
+            pass
+        conn.close()
+    if inserted:
+        invalidate_tracker()
+        invalidate_range_index()
+        invalidate_aggregates()
+    return inserted
+
+
+def _write_batch(conn, cur, rule: dict, dates: list, done, until: date):
+    """Insert ``dates`` and move ``materialized_until`` from ``done`` to ``until`` in one transaction.
+
+    Returns None (and writes nothing) when another run already moved the rule on.
+    """
+    # The guarded bump comes first: it locks the rule row until the commit
+    cur.execute(
+        "UPDATE recurring_expenses SET materialized_until = %s WHERE id = %s AND materialized_until <=> %s",
+        (until, rule["id"], done),
+    )
+    if cur.rowcount != 1:
+        conn.rollback()
+        return None
+    if dates:
+        currency = (rule["currency"] or BASE_CURRENCY).upper()
+        cur.executemany(
+            """
+            INSERT INTO expenses (title, amount, category, date, payment_method, status, notes, currency,
+                                  content_hash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            [
+                (rule["title"], rule["amount"], rule["category"], d, rule["payment_method"], rule["status"],
+                 rule["notes"] or "", currency, content_hash(d, rule["amount"], rule["title"], currency))
+                for d in dates
+            ],
+        )
+    conn.commit()
+    return len(dates)
+
+
+def projected_totals(connect_db, start, end) -> dict:
+    """Category totals of occurrences in ``start..end`` that are not yet in ``expenses``.
+
+    Computed on the fly from the rules, so reports can look far ahead without
+    materializing anything.
+    """
+    if isinstance(start, datetime):
+        start = start.date()
+    if isinstance(end, datetime):
+        end = end.date()
+    conn = connect_db()
+    if conn is None:
+        return {}
+    try:
+        ensure_recurring_schema(conn)
+        rules = load_rules(conn)
+        rates = get_rate_table(conn)
+    finally:
+        conn.close()
+    totals = {}
+    for rule in rules:
+        done = rule["materialized_until"]
+        first = max(start, done + timedelta(days=1)) if done else start
+        currency = (rule["currency"] or BASE_CURRENCY).upper()
+        amount = float(rule["amount"])
+        if currency == BASE_CURRENCY:
+            total = amount * sum(1 for _ in iter_occurrences(rule, first, end))
+        else:
+            total = sum(rates.to_base(amount, currency, when) for when in iter_occurrences(rule, first, end))
+        if total:
+            cat = rule["category"] or "General"
+            totals[cat] = totals.get(cat, 0.0) + total
+    return totals
+
+
+def start_materializer(connect_db, interval_sec: int = MATERIALIZE_INTERVAL_SEC):
+    """Run ``materialize`` now and then every ``interval_sec`` on a daemon thread (once per process)."""
+    if _worker["thread"] is not None and _worker["thread"].is_alive():
+        return _worker["thread"]
+    stop = _worker["stop"]
+    stop.clear()
+
+    def run():
+        while not stop.is_set():
+            try:
+                count = materialize(connect_db)
+                if count:
+                    print(f"🔁 Materialized {count} recurring expense(s).")
+            except Exception as e:
+                print(f"Recurring expense job failed: {e}")
+            stop.wait(interval_sec)
+
+    _worker["thread"] = threading.Thread(target=run, daemon=True)
+    _worker["thread"].start()
+    return _worker["thread"]
+
+
+def stop_materializer():
+    _worker["stop"].set()
+
+
+if __name__ == "__main__":
+    # One-off run (e.g. from a scheduler): python expense_recurring.py
+    from db_connect import connect_db
+
+    print(f"✅ Materialized {materialize(connect_db)} recurring expense(s).")
@@ -0,0 +1,97 @@
+# expense_utils.py
+import hashlib
+import re
+import unicodedata
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from expense_currency import BASE_CURRENCY
+
+# --- Shared expense vocabulary (used by the form, filters and importers) ---
+EXPENSE_CATEGORIES = (
+    "General",
+    "Food",
+    "Transport",
+    "Utilities",
+    "Rent",
+    "Healthcare",
+    "Entertainment",
+    "Shopping",
+    "Education",
+    "Travel",
+    "Other",
+)
+PAYMENT_METHODS = ("Cash", "Card", "Bank", "Bkash", "Nagad", "Other")
+EXPENSE_STATUSES = ("Planned", "Incurred", "Paid")
+
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def validate_expense(title, amount_raw, date_str):
+    """Validate the core expense fields exactly like the entry form does.
+
+    Returns a tuple ``(amount, error)``; ``error`` is None when the values are valid.
+    """
+    if not title:
+        return None, "Please enter a title."
+    if not amount_raw:
+        return None, "Please enter an amount."
+    try:
+        amount = float(amount_raw)
+        if amount <= 0:
+            raise ValueError("Amount must be positive")
+    except Exception:
+        return None, "Amount must be a positive number."
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None, "Date must be in YYYY-MM-DD format."
+    return amount, None
+
+
+def normalize_title(title) -> str:
+    """Lowercase, strip accents/punctuation and collapse whitespace for matching."""
+    text = unicodedata.normalize("NFKD", str(title or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(_NON_WORD_RE.sub(" ", text).split())
+
+
+def content_hash(date_value, amount, title, currency=None) -> str:
+    """Stable SHA-1 of (date, amount to the cent, normalized title, currency).
+
+    Two expenses with the same hash are considered the same statement line. The base
+    currency adds nothing to the key, so hashes stored before multi-currency support
+    stay valid for base-currency rows.
+    """
+    if hasattr(date_value, "strftime"):
+        date_key = date_value.strftime("%Y-%m-%d")
+    else:
+        date_key = str(date_value or "")[:10]
+    try:
+        amount_key = f"{Decimal(str(amount)).quantize(Decimal('0.01'))}"
+    except (InvalidOperation, ValueError):
+        amount_key = str(amount)
+    key = f"{date_key}|{amount_key}|{normalize_title(title)}"
+    currency = (currency or BASE_CURRENCY).upper()
+    if currency != BASE_CURRENCY:
+        key += f"|{currency}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def ensure_index(conn, table: str, index_name: str, columns: str):
+    """Create ``index_name`` on ``table(columns)`` unless it already exists."""
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+            """,
+            (table, index_name),
+        )
+        if not cur.fetchone()[0]:
+            cur.execute(f"CREATE INDEX {index_name} ON {table} ({columns})")
+            conn.commit()
+    finally:
+        cur.close()
@@ -1,7 +1,57 @@
 from tkinter import *
-from tkinter import messagebox, ttk
-from datetime import datetime
+from tkinter import messagebox, ttk, filedialog
+from datetime import datetime, timedelta
 import calendar
+import queue
+import threading
+
+from expense_utils import (
+    EXPENSE_CATEGORIES,
+    EXPENSE_STATUSES,
+    PAYMENT_METHODS,
+    content_hash,
+    ensure_index,
+    validate_expense,
+)
+from expense_classifier import (
+    MIN_CONFIDENCE,
+    ensure_classifier_schema,
+    get_classifier,
+    learn_recent,
+    peek_classifier,
+)
+from expense_budgets import ensure_budget_schema, format_alert, get_tracker, invalidate_tracker
+from expense_currency import (
+    BASE_CURRENCY,
+    category_totals,
+    ensure_currency_schema,
+    format_money,
+    get_rate_table,
+    import_rates,
+    invalidate_aggregates,
+)
+from expense_duplicates import ensure_duplicate_schema, list_candidates, resolve, scan
+from expense_index import ExpenseIndex
+from expense_rangesum import get_range_index, invalidate_range_index
+from expense_recurring import (
+    FREQUENCIES,
+    add_rule,
+    deactivate_rule,
+    ensure_recurring_schema,
+    load_rules,
+    materialize,
+    next_occurrence,
+    projected_totals,
+)
+from expense_import import (
+    DEFAULT_DATE_FORMATS,
+    IMPORT_FIELDS,
+    REQUIRED_FIELDS,
+    ensure_import_schema,
+    guess_mapping,
+    import_csv,
+    read_header,
+)
 
 # Optional: matplotlib for charts (installed via requirements)
 try:
@@ -17,6 +67,16 @@ try:
 except ImportError:
     _TKCALENDAR_AVAILABLE = False
 
+# --- History loading ---
+# The screen starts with a recent window; older rows are paged in on demand.
+HISTORY_RANGES = (
+    ("Last 3 months", 92),
+    ("Last 6 months", 183),
+    ("Last 12 months", 366),
+    ("All history", None),
+)
+EXPENSE_PAGE_SIZE = 500
+NOTES_SEARCH_DELAY_MS = 300
 
 
 def _clear_frame(frame: Frame):
@@ -37,6 +97,23 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     """
     _clear_frame(parent_frame)
 
+    # Make sure columns used by save/import exist before the form is used
+    try:
+        schema_conn = connect_db()
+        if schema_conn:
+            ensure_currency_schema(schema_conn)
+            ensure_import_schema(schema_conn)   # the hash backfill reads currency
+            ensure_classifier_schema(schema_conn)
+            get_rate_table(schema_conn)
+            # Keyset pagination walks (date, id) newest first
+            ensure_index(schema_conn, "expenses", "idx_expenses_date_id", "date, id")
+            ensure_budget_schema(schema_conn)
+            ensure_recurring_schema(schema_conn)
+            ensure_duplicate_schema(schema_conn)
+            schema_conn.close()
+    except Exception as e:
+        print(f"❌ Failed to prepare expenses schema: {e}")
+
     # Header
     header_frame = Frame(parent_frame, bg="#f39c12", height=70)
     header_frame.pack(fill=X, pady=(0, 20))
@@ -95,31 +172,34 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     title_entry.grid(row=0, column=1, padx=10, pady=(0, 6), sticky=W)
 
     Label(form_frame, text="Amount:", font=("Segoe UI", 12, "bold"), bg="#ffffff", fg="#2c3e50").grid(row=1, column=0, sticky=W, pady=(0, 6))
-    amount_entry = ttk.Entry(form_frame, font=("Segoe UI", 11), width=28)
-    amount_entry.grid(row=1, column=1, padx=10, pady=(0, 6), sticky=W)
+    amount_row = Frame(form_frame, bg="#ffffff")
+    amount_row.grid(row=1, column=1, padx=10, pady=(0, 6), sticky=W)
+    amount_entry = ttk.Entry(amount_row, font=("Segoe UI", 11), width=20)
+    amount_entry.pack(side=LEFT)
+    currency_var = StringVar(value=BASE_CURRENCY)
+    currency_combo = ttk.Combobox(amount_row, textvariable=currency_var, state="readonly", width=5)
+    currency_combo.pack(side=LEFT, padx=(6, 0))
+
+    def _currency_choices():
+        """Currencies with a local exchange rate (always including the base currency)."""
+        table = get_rate_table()
+        return table.currencies if table else [BASE_CURRENCY]
+
+    currency_combo.configure(values=_currency_choices())
 
     Label(form_frame, text="Category:", font=("Segoe UI", 12, "bold"), bg="#ffffff", fg="#2c3e50").grid(row=2, column=0, sticky=W, pady=(0, 6))
     category_var = StringVar(value="General")
     category_combo = ttk.Combobox(
         form_frame,
         textvariable=category_var,
-        values=(
-            "General",
-            "Food",
-            "Transport",
-            "Utilities",
-            "Rent",
-            "Healthcare",
-            "Entertainment",
-            "Shopping",
-            "Education",
-            "Travel",
-            "Other",
-        ),
+        values=EXPENSE_CATEGORIES,
         state="readonly",
         width=26,
     )
     category_combo.grid(row=2, column=1, padx=10, pady=(0, 6), sticky=W)
+    # Once the user picks a category themselves, stop auto-suggesting for this entry
+    category_chosen = {"manual": False}
+    category_combo.bind("<<ComboboxSelected>>", lambda e: category_chosen.update(manual=True))
 
     Label(form_frame, text="Date:", font=("Segoe UI", 12, "bold"), bg="#ffffff", fg="#2c3e50").grid(row=3, column=0, sticky=W, pady=(0, 6))
     if _TKCALENDAR_AVAILABLE:
@@ -138,7 +218,7 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     payment_combo = ttk.Combobox(
         form_frame,
         textvariable=payment_var,
-        values=("Cash", "Card", "Bank", "Bkash", "Nagad", "Other"),
+        values=PAYMENT_METHODS,
         state="readonly",
         width=26,
     )
@@ -149,7 +229,7 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     status_combo = ttk.Combobox(
         form_frame,
         textvariable=status_var,
-        values=("Planned", "Incurred", "Paid"),
+        values=EXPENSE_STATUSES,
         state="readonly",
         width=26,
     )
@@ -167,12 +247,17 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     info_label = Label(form_container, textvariable=info_var, font=("Segoe UI", 10), bg="#ffffff", fg="#7f8c8d")
     info_label.pack(pady=(0, 6), padx=12, anchor=W)
 
+    budget_alert_var = StringVar(value="")
+    Label(form_container, textvariable=budget_alert_var, font=("Segoe UI", 10, "bold"), bg="#ffffff", fg="#c0392b", justify=LEFT).pack(pady=(0, 6), padx=12, anchor=W)
+
     selected_expense_id = StringVar()
 
     def clear_form():
         selected_expense_id.set("")
+        category_chosen["manual"] = False
         title_entry.delete(0, END)
         amount_entry.delete(0, END)
+        currency_var.set(BASE_CURRENCY)
         category_var.set("General")
         try:
             date_entry.delete(0, END)
@@ -184,7 +269,7 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
         notes_text.delete("1.0", END)
         info_var.set("")
 
-    all_rows = []  # cache for filtering/sorting
+    expense_cache = ExpenseIndex()  # cache for filtering/sorting (bitset-indexed)
 
     # Helper to convert various date representations (str/date/datetime) to a date
     def _to_date(val):
@@ -245,59 +330,75 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
                     r["id"],
                     r["title"],
                     r["category"],
-                    f"{r['amount']:.2f}",
+                    f"{r['amount']:.2f}" + (f" {r['currency']}" if r.get("currency", BASE_CURRENCY) != BASE_CURRENCY else ""),
                     r["date"],
                     r["payment_method"],
                     r["status"],
                 ),
             )
 
-    def apply_filter(*_):
-        text = search_var.get().strip().lower()
-        cat = filter_category_var.get()
-        sts = filter_status_var.get()
+    # Keyset cursor over (date, id): every row newer than the cursor is cached.
+    history = {"cursor": None, "covered_since": None, "exhausted": False, "loading": False}
+    notes_search = {"text": "", "ids": set(), "job": None}
 
-        def ok(row):
-            if cat != "All" and row["category"] != cat:
-                return False
-            if sts != "All" and row["status"] != sts:
-                return False
-            if text and (text not in row["title"].lower() and text not in (row.get("notes") or "").lower()):
-                return False
-            return True
-
-        render_rows([r for r in all_rows if ok(r)])
+    def _range_start():
+        days = dict(HISTORY_RANGES).get(range_var.get())
+        if days is None:
+            return None
+        return datetime.now().date() - timedelta(days=days)
 
-    def refresh_table():
-        nonlocal all_rows
+    def _load_history(since=None, limit=None):
+        """Fetch rows older than the cursor (down to ``since`` or ``limit`` rows) into the cache."""
+        if history["exhausted"] or history["loading"]:
+            return 0
+        history["loading"] = True
         conn = None
         cur = None
         try:
             conn = connect_db()
             if conn is None:
                 messagebox.showerror("Database Error", "Unable to connect to database.")
-                return
+                return 0
+            clauses, params = [], []
+            if history["cursor"]:
+                cursor_date, cursor_id = history["cursor"]
+                clauses.append("(date < %s OR (date = %s AND id < %s))")
+                params += [cursor_date, cursor_date, cursor_id]
+            if since:
+                clauses.append("date >= %s")
+                params.append(since)
+            sql = "SELECT id, title, category, amount, date, payment_method, status, currency FROM expenses"
+            if clauses:
+                sql += " WHERE " + " AND ".join(clauses)
+            sql += " ORDER BY date DESC, id DESC"
+            if limit:
+                sql += " LIMIT %s"
+                params.append(limit)
             cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT id, title, category, amount, date, payment_method, status, notes
-                FROM expenses
-                ORDER BY date DESC, id DESC
-                """
-            )
+            cur.execute(sql, tuple(params))
             rows = cur.fetchall()
-            # Map to list of dicts
-            cols = ["id", "title", "category", "amount", "date", "payment_method", "status", "notes"]
-            all_rows = [dict(zip(cols, r)) for r in rows]
-            apply_filter()
-            # Update year options for report
-            try:
-                _update_year_options()
-            except Exception:
-                pass
+            # Map to list of dicts (notes are fetched on selection)
+            cols = ["id", "title", "category", "amount", "date", "payment_method", "status", "currency"]
+            page = [dict(zip(cols, r)) for r in rows]
+            for r in page:
+                r["date"] = _to_date(r["date"]) or r["date"]
+            expense_cache.extend(page)
+            if page:
+                history["cursor"] = (page[-1]["date"], page[-1]["id"])
+            if since is None and (limit is None or len(page) < limit):
+                history["exhausted"] = True
+            if since is not None:
+                covered = history["covered_since"]
+                history["covered_since"] = since if covered is None else min(covered, since)
+            elif page:
+                # A full page may stop part-way through a day, so only the next day is fully covered
+                history["covered_since"] = page[-1]["date"] + timedelta(days=1)
+            return len(page)
         except Exception as e:
             messagebox.showerror("Query Error", f"Failed to load expenses.\n{e}")
+            return 0
         finally:
+            history["loading"] = False
             try:
                 if cur:
                     cur.close()
@@ -309,6 +410,408 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
             except Exception:
                 pass
 
+    def _ensure_range_loaded():
+        since = _range_start()
+        if since is None:
+            if not expense_cache.rows:
+                _load_history(limit=EXPENSE_PAGE_SIZE)
+            return
+        covered = history["covered_since"]
+        if covered is None or since < covered:
+            _load_history(since=since)
+
+    def apply_filter(*_):
+        text = search_var.get().strip().lower()
+        also_ids = notes_search["ids"] if text and text == notes_search["text"] else None
+        render_rows(expense_cache.filter(filter_category_var.get(), filter_status_var.get(), text,
+                                         since=_range_start(), also_ids=also_ids))
+
+    def _search_notes():
+        """Find loaded rows whose notes match the search text (notes are not cached)."""
+        notes_search["job"] = None
+        text = search_var.get().strip().lower()
+        if not text or not history["cursor"]:
+            return
+        conn = None
+        try:
+            conn = connect_db()
+            if conn is None:
+                return
+            # Match %, _ and \ in the search text literally
+            pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            cur = conn.cursor()
+            cur.execute(
+                r"SELECT id FROM expenses WHERE date >= %s AND notes LIKE %s ESCAPE '\\'",
+                (history["cursor"][0], f"%{pattern}%"),
+            )
+            notes_search["text"] = text
+            notes_search["ids"] = {r[0] for r in cur.fetchall()}
+            cur.close()
+        except Exception as e:
+            print(f"Notes search failed: {e}")
+            return
+        finally:
+            try:
+                if conn:
+                    conn.close()
+            except Exception:
+                pass
+        if search_var.get().strip().lower() == text:
+            apply_filter()
+
+    def on_search_change(*_):
+        apply_filter()
+        # Debounce the notes lookup so typing does not hit the database on every keystroke
+        if notes_search["job"] is not None:
+            parent_frame.after_cancel(notes_search["job"])
+        notes_search["job"] = parent_frame.after(NOTES_SEARCH_DELAY_MS, _search_notes)
+
+    def on_range_change(*_):
+        _ensure_range_loaded()
+        apply_filter()
+
+    def on_table_scroll(first, last):
+        table_vsb.set(first, last)
+        # Reaching the bottom in "All history" pulls the next older page
+        if float(last) >= 0.999 and _range_start() is None and not history["exhausted"] and not history["loading"]:
+            parent_frame.after_idle(_load_older_page)
+
+    def _load_older_page():
+        if history["loading"] or history["exhausted"]:
+            return
+        if _load_history(limit=EXPENSE_PAGE_SIZE):
+            apply_filter()
+
+    def refresh_table():
+        expense_cache.clear()
+        history.update(cursor=None, covered_since=None, exhausted=False, loading=False)
+        notes_search.update(text="", ids=set())
+        _ensure_range_loaded()
+        apply_filter()
+        # Update year options for report
+        try:
+            _update_year_options()
+        except Exception:
+            pass
+
+    def _budget_tracker(conn, *rows):
+        """Shared budget tracker with the affected months loaded before the write (None on failure)."""
+        try:
+            tracker = get_tracker(connect_db)
+            tracker.prepare(conn, *rows)
+            return tracker
+        except Exception as e:
+            print(f"Budget tracking unavailable: {e}")
+            return None
+
+    def _range_index():
+        """Shared date-range index, built before the write so deltas start from pre-write totals."""
+        try:
+            return get_range_index(connect_db)
+        except Exception as e:
+            print(f"Range totals unavailable: {e}")
+            return None
+
+    def _refresh_budget_alerts():
+        try:
+            now = datetime.now()
+            alerts = get_tracker(connect_db).alerts(now.year, now.month)
+        except Exception:
+            alerts = []
+        budget_alert_var.set("\n".join(format_alert(a) for a in alerts))
+
+    def _run_in_background(work, on_done):
+        """Run ``work`` on a daemon thread and hand its result (or exception) to ``on_done`` on the Tk thread."""
+        results = queue.Queue()
+
+        def runner():
+            try:
+                results.put((work(), None))
+            except Exception as e:
+                results.put((None, e))
+
+        def poll():
+            try:
+                value, error = results.get_nowait()
+            except queue.Empty:
+                parent_frame.after(100, poll)
+                return
+            on_done(value, error)
+
+        threading.Thread(target=runner, daemon=True).start()
+        parent_frame.after(100, poll)
+
+    def open_recurring_dialog():
+        dialog = Toplevel(parent_frame)
+        dialog.title("🔁 Recurring Expenses")
+        dialog.configure(bg="#ffffff")
+        dialog.transient(parent_frame.winfo_toplevel())
+
+        Label(dialog, text="Rules add an expense on each due date; reports project future occurrences.", font=("Segoe UI", 10), bg="#ffffff", fg="#7f8c8d").pack(padx=12, pady=(12, 4), anchor=W)
+        rules_table = ttk.Treeview(dialog, columns=("ID", "Title", "Amount", "Category", "Every", "Next", "Ends"), show="headings", height=8, style="Custom.Treeview")
+        for col, width in (("ID", 40), ("Title", 160), ("Amount", 80), ("Category", 100), ("Every", 90), ("Next", 90), ("Ends", 90)):
+            rules_table.heading(col, text=col)
+            rules_table.column(col, width=width, anchor=W)
+        rules_table.pack(fill=BOTH, expand=True, padx=12, pady=4)
+
+        def load_rule_rows():
+            for child in rules_table.get_children():
+                rules_table.delete(child)
+            conn = connect_db()
+            if conn is None:
+                return
+            try:
+                for rule in load_rules(conn):
+                    unit = {"monthly": "month", "weekly": "week", "days": "day"}[rule["frequency"]]
+                    every = f"{rule['interval_n']} {unit}{'s' if rule['interval_n'] != 1 else ''}"
+                    rules_table.insert("", END, values=(
+                        rule["id"], rule["title"],
+                        f"{float(rule['amount']):.2f}" + (f" {rule['currency']}" if rule["currency"] != BASE_CURRENCY else ""),
+                        rule["category"], every,
+                        next_occurrence(rule) or "-", rule["end_date"] or "-",
+                    ))
+            except Exception as e:
+                messagebox.showerror("Recurring Error", f"Failed to load recurring expenses.\n{e}", parent=dialog)
+            finally:
+                conn.close()
+
+        options = Frame(dialog, bg="#ffffff")
+        options.pack(fill=X, padx=12, pady=6)
+        Label(options, text="Repeat every", bg="#ffffff").pack(side=LEFT)
+        interval_entry = ttk.Entry(options, width=4)
+        interval_entry.insert(0, "1")
+        interval_entry.pack(side=LEFT, padx=4)
+        frequency_var = StringVar(value="monthly")
+        ttk.Combobox(options, textvariable=frequency_var, values=FREQUENCIES, state="readonly", width=9).pack(side=LEFT, padx=4)
+        Label(options, text="until (optional, YYYY-MM-DD):", bg="#ffffff").pack(side=LEFT, padx=(10, 4))
+        end_entry = ttk.Entry(options, width=12)
+        end_entry.pack(side=LEFT)
+
+        def after_materialize(count, error):
+            if error:
+                print(f"Recurring expense job failed: {error}")
+            if dialog.winfo_exists():
+                load_rule_rows()
+            if count and expense_table.winfo_exists():
+                refresh_table()
+                _refresh_budget_alerts()
+                info_var.set(f"Added {count} recurring expense occurrence(s).")
+
+        def add_from_form():
+            title = title_entry.get().strip()
+            date_str = date_entry.get().strip()
+            amount, error = validate_expense(title, amount_entry.get().strip(), date_str)
+            if error:
+                messagebox.showwarning("Recurring", f"Fill in the expense form first: {error}", parent=dialog)
+                return
+            try:
+                interval_n = int(interval_entry.get().strip() or 1)
+                if interval_n < 1:
+                    raise ValueError("Interval must be positive")
+                end_raw = end_entry.get().strip()
+                end_date = datetime.strptime(end_raw, "%Y-%m-%d").date() if end_raw else None
+            except ValueError:
+                messagebox.showwarning("Recurring", "Interval must be a positive whole number and the end date YYYY-MM-DD.", parent=dialog)
+                return
+            conn = connect_db()
+            if conn is None:
+                messagebox.showerror("Database Error", "Unable to connect to database.", parent=dialog)
+                return
+            try:
+                rule_id = add_rule(conn, {
+                    "title": title, "amount": amount, "currency": currency_var.get() or BASE_CURRENCY,
+                    "category": category_var.get(),
+                    "payment_method": payment_var.get(), "status": status_var.get(),
+                    "notes": notes_text.get("1.0", END).strip(), "frequency": frequency_var.get(),
+                    "interval_n": interval_n, "start_date": date_str, "end_date": end_date,
+                })
+            except Exception as e:
+                messagebox.showerror("Recurring Error", f"Failed to save the rule.\n{e}", parent=dialog)
+                return
+            finally:
+                conn.close()
+            load_rule_rows()
+            _run_in_background(lambda: materialize(connect_db, rule_id=rule_id), after_materialize)
+
+        def stop_selected():
+            sel = rules_table.selection()
+            if not sel:
+                return
+            rule_id = rules_table.item(sel[0], "values")[0]
+            if not messagebox.askyesno("Confirm", "Stop this recurring expense? Existing entries are kept.", parent=dialog):
+                return
+            conn = connect_db()
+            if conn is None:
+                return
+            try:
+                deactivate_rule(conn, rule_id)
+            finally:
+                conn.close()
+            load_rule_rows()
+
+        buttons = Frame(dialog, bg="#ffffff")
+        buttons.pack(fill=X, padx=12, pady=(4, 12))
+        ttk.Button(buttons, text="➕ Add Rule from Form", command=add_from_form).pack(side=LEFT)
+        ttk.Button(buttons, text="⏹ Stop Rule", command=stop_selected).pack(side=LEFT, padx=6)
+        load_rule_rows()
+
+    def open_duplicates_dialog():
+        dialog = Toplevel(parent_frame)
+        dialog.title("🧹 Possible Duplicates")
+        dialog.configure(bg="#ffffff")
+        dialog.transient(parent_frame.winfo_toplevel())
+
+        dup_status_var = StringVar(value="Scanning expenses added since the last check...")
+        Label(dialog, textvariable=dup_status_var, font=("Segoe UI", 10), bg="#ffffff", fg="#7f8c8d").pack(padx=12, pady=(12, 4), anchor=W)
+        columns = ("Score", "Kept", "Date", "Title", "Amount", "Duplicate", "Dup Date", "Dup Title", "Dup Amount")
+        dup_table = ttk.Treeview(dialog, columns=columns, show="headings", height=12, selectmode="extended", style="Custom.Treeview")
+        for col, width in zip(columns, (55, 50, 90, 160, 80, 70, 90, 160, 80)):
+            dup_table.heading(col, text=col)
+            dup_table.column(col, width=width, anchor=W)
+        dup_table.pack(fill=BOTH, expand=True, padx=12, pady=4)
+
+        def load_candidates():
+            for child in dup_table.get_children():
+                dup_table.delete(child)
+            conn = connect_db()
+            if conn is None:
+                return
+            try:
+                rows = list_candidates(conn)
+            except Exception as e:
+                messagebox.showerror("Duplicates Error", f"Failed to load duplicate candidates.\n{e}", parent=dialog)
+                return
+            finally:
+                conn.close()
+            for r in rows:
+                dup_table.insert("", END, iid=f"{r['id_a']}:{r['id_b']}", values=(
+                    f"{float(r['score']):.2f}", r["id_a"], r["date_a"], r["title_a"], f"{float(r['amount_a']):.2f}",
+                    r["id_b"], r["date_b"], r["title_b"], f"{float(r['amount_b']):.2f}",
+                ))
+            dup_status_var.set(f"{len(rows)} possible duplicate pair(s). The newer entry of each pair is removed on merge/delete.")
+
+        def after_scan(found, error):
+            if error:
+                print(f"Duplicate scan failed: {error}")
+            if dialog.winfo_exists():
+                load_candidates()
+
+        def apply_action(action):
+            sel = dup_table.selection()
+            if not sel:
+                return
+            pairs = [tuple(int(part) for part in iid.split(":")) for iid in sel]
+            if action != "dismiss" and not messagebox.askyesno(
+                "Confirm", f"Remove the newer expense of {len(pairs)} pair(s)? This cannot be undone.", parent=dialog
+            ):
+                return
+            conn = connect_db()
+            if conn is None:
+                messagebox.showerror("Database Error", "Unable to connect to database.", parent=dialog)
+                return
+            try:
+                resolve(conn, pairs, action)
+            except Exception as e:
+                messagebox.showerror("Duplicates Error", f"Failed to update duplicates.\n{e}", parent=dialog)
+                return
+            finally:
+                conn.close()
+            load_candidates()
+            if action != "dismiss" and expense_table.winfo_exists():
+                clear_form()
+                refresh_table()
+                _refresh_budget_alerts()
+                info_var.set(f"Resolved {len(pairs)} duplicate pair(s).")
+
+        buttons = Frame(dialog, bg="#ffffff")
+        buttons.pack(fill=X, padx=12, pady=(4, 12))
+        ttk.Button(buttons, text="🔗 Merge Notes & Delete Newer", command=lambda: apply_action("merge")).pack(side=LEFT)
+        ttk.Button(buttons, text="🗑️ Delete Newer", command=lambda: apply_action("delete")).pack(side=LEFT, padx=6)
+        ttk.Button(buttons, text="✋ Not Duplicates", command=lambda: apply_action("dismiss")).pack(side=LEFT)
+        ttk.Button(buttons, text="🔄 Rescan", command=lambda: _run_in_background(lambda: scan(connect_db), after_scan)).pack(side=RIGHT)
+        load_candidates()
+        _run_in_background(lambda: scan(connect_db), after_scan)
+
+    def suggest_category(event=None):
+        """Prefill the category from the title as the user types (new entries only)."""
+        classifier = peek_classifier()
+        if classifier is None or category_chosen["manual"] or selected_expense_id.get():
+            return
+        guess, confidence = classifier.predict(title_entry.get())
+        if guess and confidence >= MIN_CONFIDENCE:
+            category_var.set(guess)
+
+    def open_budgets_dialog():
+        conn = connect_db()
+        if conn is None:
+            messagebox.showerror("Database Error", "Unable to connect to database.")
+            return
+        try:
+            tracker = get_tracker(connect_db)
+            tracker.load_limits(conn)
+        except Exception as e:
+            messagebox.showerror("Budget Error", f"Failed to load budgets.\n{e}")
+            return
+        finally:
+            conn.close()
+
+        dialog = Toplevel(parent_frame)
+        dialog.title("🎯 Monthly Budgets")
+        dialog.configure(bg="#ffffff")
+        dialog.transient(parent_frame.winfo_toplevel())
+        Label(dialog, text="Monthly limit per category (leave empty for no budget)", font=("Segoe UI", 12, "bold"), bg="#ffffff", fg="#2c3e50").grid(row=0, column=0, columnspan=2, padx=12, pady=(12, 8), sticky=W)
+
+        limit_entries = {}
+        for i, cat in enumerate(EXPENSE_CATEGORIES, start=1):
+            Label(dialog, text=f"{cat}:", bg="#ffffff").grid(row=i, column=0, padx=12, pady=2, sticky=W)
+            entry = ttk.Entry(dialog, width=14)
+            if tracker.limits.get(cat):
+                entry.insert(0, f"{tracker.limits[cat]:.2f}")
+            entry.grid(row=i, column=1, padx=12, pady=2, sticky=W)
+            limit_entries[cat] = entry
+
+        def save_budgets():
+            upserts, removals = [], []
+            for cat, entry in limit_entries.items():
+                raw = entry.get().strip()
+                if not raw:
+                    removals.append((cat,))
+                    continue
+                try:
+                    limit = float(raw)
+                    if limit <= 0:
+                        raise ValueError("Limit must be positive")
+                except Exception:
+                    messagebox.showwarning("Budgets", f"Limit for {cat} must be a positive number.", parent=dialog)
+                    return
+                upserts.append((cat, limit))
+            conn = connect_db()
+            if conn is None:
+                messagebox.showerror("Database Error", "Unable to connect to database.", parent=dialog)
+                return
+            try:
+                cur = conn.cursor()
+                if upserts:
+                    cur.executemany(
+                        "INSERT INTO expense_budgets (category, monthly_limit) VALUES (%s, %s) "
+                        "ON DUPLICATE KEY UPDATE monthly_limit = VALUES(monthly_limit)",
+                        upserts,
+                    )
+                if removals:
+                    cur.executemany("DELETE FROM expense_budgets WHERE category=%s", removals)
+                conn.commit()
+                cur.close()
+                tracker.load_limits(conn)
+            except Exception as e:
+                messagebox.showerror("Budget Error", f"Failed to save budgets.\n{e}", parent=dialog)
+                return
+            finally:
+                conn.close()
+            _refresh_budget_alerts()
+            dialog.destroy()
+
+        ttk.Button(dialog, text="💾 Save Budgets", command=save_budgets).grid(row=len(EXPENSE_CATEGORIES) + 1, column=0, columnspan=2, pady=(8, 12))
+
     def save_expense():
         # Validate
         title = title_entry.get().strip()
@@ -318,26 +821,16 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
         payment_method = payment_var.get()
         status = status_var.get()
         notes = notes_text.get("1.0", END).strip()
+        currency = currency_var.get() or BASE_CURRENCY
 
-        if not title:
-            info_var.set("Please enter a title.")
-            return
-        if not amount_raw:
-            info_var.set("Please enter an amount.")
-            return
-        try:
-            amount = float(amount_raw)
-            if amount <= 0:
-                raise ValueError("Amount must be positive")
-        except Exception:
-            info_var.set("Amount must be a positive number.")
-            return
-        # Validate date
-        try:
-            datetime.strptime(date_str, "%Y-%m-%d")
-        except ValueError:
-            info_var.set("Date must be in YYYY-MM-DD format.")
+        amount, error = validate_expense(title, amount_raw, date_str)
+        if error:
+            info_var.set(error)
             return
+        row_hash = content_hash(date_str, amount, title, currency)
+        row_id = selected_expense_id.get() or None
+        old_row = expense_cache.get(int(row_id)) if row_id else None
+        new_row = {"date": date_str, "category": category, "amount": amount, "currency": currency}
 
         conn = None
         cur = None
@@ -346,14 +839,27 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
             if conn is None:
                 messagebox.showerror("Database Error", "Unable to connect to database.")
                 return
+            tracker = _budget_tracker(conn, old_row, new_row)
+            range_index = _range_index()
             cur = conn.cursor()
+            learned_old, category_auto = None, 0
 
             if selected_expense_id.get():
+                # The stored version is what the classifier learned (unless it guessed the category)
+                cur.execute("SELECT title, notes, category, category_auto FROM expenses WHERE id=%s",
+                            (selected_expense_id.get(),))
+                found = cur.fetchone()
+                if found:
+                    old_title, old_notes, old_category, old_auto = found
+                    category_auto = int(bool(old_auto) and category == old_category)
+                    if not old_auto:
+                        learned_old = (f"{old_title or ''} {old_notes or ''}", old_category)
                 # Update
                 cur.execute(
                     """
                     UPDATE expenses
-                    SET title=%s, amount=%s, category=%s, date=%s, payment_method=%s, status=%s, notes=%s
+                    SET title=%s, amount=%s, category=%s, date=%s, payment_method=%s, status=%s, notes=%s,
+                        content_hash=%s, currency=%s, category_auto=%s
                     WHERE id=%s
                     """,
                     (
@@ -364,6 +870,9 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
                         payment_method,
                         status,
                         notes,
+                        row_hash,
+                        currency,
+                        category_auto,
                         selected_expense_id.get(),
                     ),
                 )
@@ -371,15 +880,30 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
                 # Insert
                 cur.execute(
                     """
-                    INSERT INTO expenses (title, amount, category, date, payment_method, status, notes)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    INSERT INTO expenses (title, amount, category, date, payment_method, status, notes, content_hash, currency)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                     """,
-                    (title, amount, category, date_str, payment_method, status, notes),
+                    (title, amount, category, date_str, payment_method, status, notes, row_hash, currency),
                 )
             conn.commit()
+            invalidate_aggregates()
+            if range_index:
+                range_index.apply_delta(old_row, new_row)
             clear_form()
             refresh_table()
-            info_var.set("Saved successfully.")
+            message = "Saved successfully."
+            if tracker:
+                tracker.apply_delta(old_row, new_row)
+                level, spent, limit = tracker.status_for(new_row)
+                if level in ("warn", "over"):
+                    message += " " + format_alert({"category": category, "level": level, "spent": spent, "limit": limit})
+                _refresh_budget_alerts()
+            info_var.set(message)
+            # Teach the auto-categorizer the new/edited example off the Tk thread
+            if peek_classifier() is not None:
+                edited = f"{title} {notes}" if not category_auto else None
+                _run_in_background(lambda: learn_recent(connect_db, row_id, edited, category, learned_old),
+                                   lambda *_: None)
         except Exception as e:
             messagebox.showerror("Save Error", f"Failed to save expense.\n{e}")
         finally:
@@ -407,23 +931,36 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
             category_var.set(vals[2])
             amount_entry.delete(0, END)
             try:
-                amount_entry.insert(0, float(vals[3]))
+                amount_entry.insert(0, float(vals[3].split()[0]))
             except Exception:
                 amount_entry.insert(0, vals[3])
+            cached = expense_cache.get(int(vals[0])) or {}
+            currency_var.set(cached.get("currency") or BASE_CURRENCY)
             date_entry.delete(0, END)
             date_entry.insert(0, vals[4])
             payment_var.set(vals[5])
             status_var.set(vals[6])
 
-            # Load notes from cache
+            # Notes are not cached with the table rows; fetch them for this row only
+            notes_text.delete("1.0", END)
+            conn = None
             try:
-                rid = int(vals[0])
-                cached = next((r for r in all_rows if r["id"] == rid), None)
-                notes_text.delete("1.0", END)
-                if cached and cached.get("notes"):
-                    notes_text.insert("1.0", cached["notes"])
+                conn = connect_db()
+                if conn:
+                    cur = conn.cursor()
+                    cur.execute("SELECT notes FROM expenses WHERE id=%s", (int(vals[0]),))
+                    found = cur.fetchone()
+                    cur.close()
+                    if found and found[0]:
+                        notes_text.insert("1.0", found[0])
             except Exception:
                 pass
+            finally:
+                try:
+                    if conn:
+                        conn.close()
+                except Exception:
+                    pass
         except Exception:
             pass
 
@@ -440,9 +977,18 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
             if conn is None:
                 messagebox.showerror("Database Error", "Unable to connect to database.")
                 return
+            old_row = expense_cache.get(int(selected_expense_id.get()))
+            tracker = _budget_tracker(conn, old_row)
+            range_index = _range_index()
             cur = conn.cursor()
             cur.execute("DELETE FROM expenses WHERE id=%s", (selected_expense_id.get(),))
             conn.commit()
+            invalidate_aggregates()
+            if range_index:
+                range_index.apply_delta(old_row, None)
+            if tracker:
+                tracker.apply_delta(old_row, None)
+                _refresh_budget_alerts()
             clear_form()
             refresh_table()
             info_var.set("Deleted successfully.")
@@ -460,6 +1006,170 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
             except Exception:
                 pass
 
+    def import_rates_file():
+        path = filedialog.askopenfilename(
+            title="Select an exchange-rate CSV (date, currency, rate)",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        conn = connect_db()
+        if conn is None:
+            messagebox.showerror("Database Error", "Unable to connect to database.")
+            return
+        try:
+            count = import_rates(conn, path)
+            get_rate_table(conn)
+        except Exception as e:
+            messagebox.showerror("Rates Error", f"Failed to import exchange rates.\n{e}")
+            return
+        finally:
+            conn.close()
+        # Base-currency totals depend on the rates, so rebuild them on next use
+        invalidate_tracker()
+        invalidate_range_index()
+        currency_combo.configure(values=_currency_choices())
+        report_currency_combo.configure(values=_currency_choices())
+        _refresh_budget_alerts()
+        info_var.set(f"Imported {count:,} exchange rate(s) into {BASE_CURRENCY}.")
+
+    def open_import_dialog():
+        path = filedialog.askopenfilename(
+            title="Import Bank Statement",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")],
+        )
+        if not path:
+            return
+        try:
+            headers = read_header(path)
+        except Exception as e:
+            messagebox.showerror("Import Error", f"Could not read the file header.\n{e}")
+            return
+        if not headers:
+            messagebox.showwarning("Import", "The selected file is empty.")
+            return
+
+        dialog = Toplevel(parent_frame)
+        dialog.title("📥 Import Expenses from CSV")
+        dialog.configure(bg="#ffffff")
+        dialog.transient(parent_frame.winfo_toplevel())
+
+        Label(dialog, text="Map statement columns to expense fields", font=("Segoe UI", 12, "bold"), bg="#ffffff", fg="#2c3e50").grid(row=0, column=0, columnspan=2, padx=12, pady=(12, 8), sticky=W)
+
+        guessed = guess_mapping(headers)
+        column_options = ["(none)"] + list(headers)
+        field_vars = {}
+        for i, field in enumerate(IMPORT_FIELDS, start=1):
+            label = field.replace("_", " ").title() + (" *" if field in REQUIRED_FIELDS else "")
+            Label(dialog, text=f"{label}:", bg="#ffffff").grid(row=i, column=0, padx=12, pady=3, sticky=W)
+            var = StringVar(value=guessed.get(field, "(none)"))
+            ttk.Combobox(dialog, textvariable=var, values=column_options, state="readonly", width=28).grid(row=i, column=1, padx=12, pady=3, sticky=W)
+            field_vars[field] = var
+
+        row = len(IMPORT_FIELDS) + 1
+        Label(dialog, text="Date format:", bg="#ffffff").grid(row=row, column=0, padx=12, pady=3, sticky=W)
+        date_format_var = StringVar(value="Auto")
+        ttk.Combobox(dialog, textvariable=date_format_var, values=("Auto",) + DEFAULT_DATE_FORMATS, width=28).grid(row=row, column=1, padx=12, pady=3, sticky=W)
+        negative_var = BooleanVar(value=False)
+        ttk.Checkbutton(dialog, text="Spending is listed as negative amounts", variable=negative_var).grid(row=row + 1, column=0, columnspan=2, padx=12, pady=3, sticky=W)
+
+        import_progress_var = DoubleVar(value=0)
+        ttk.Progressbar(dialog, variable=import_progress_var, maximum=100, length=340, mode="determinate").grid(row=row + 2, column=0, columnspan=2, padx=12, pady=(10, 4))
+        import_status_var = StringVar(value="")
+        Label(dialog, textvariable=import_status_var, bg="#ffffff", fg="#7f8c8d", justify=LEFT, wraplength=340).grid(row=row + 3, column=0, columnspan=2, padx=12, pady=(0, 6), sticky=W)
+
+        events = queue.Queue()
+        stop_import = threading.Event()
+
+        def describe(stats):
+            return (f"Read {stats['read']:,} rows · inserted {stats['inserted']:,} · "
+                    f"duplicates {stats['duplicates']:,} · invalid {stats['invalid']:,}")
+
+        def _batch_categorizer():
+            try:
+                classifier = get_classifier(connect_db)
+            except Exception as e:
+                print(f"Auto-categorizer unavailable: {e}")
+                return None
+            return classifier.predict_batch if classifier else None
+
+        def worker(mapping, date_formats, negative_debits):
+            # Runs off the Tk thread: only talks to the UI through the events queue
+            try:
+                result = import_csv(
+                    path,
+                    connect_db,
+                    mapping=mapping,
+                    date_formats=date_formats,
+                    negative_debits=negative_debits,
+                    on_progress=lambda stats: events.put(("progress", stats)),
+                    should_stop=stop_import.is_set,
+                    categorize=_batch_categorizer(),
+                )
+                events.put(("done", result))
+            except Exception as e:
+                events.put(("error", e))
+
+        def poll_import():
+            latest, final = None, None
+            try:
+                while True:
+                    kind, payload = events.get_nowait()
+                    if kind == "progress":
+                        latest = payload
+                    else:
+                        final = (kind, payload)
+            except queue.Empty:
+                pass
+            dialog_open = dialog.winfo_exists()
+            if latest and dialog_open:
+                import_progress_var.set(latest["fraction"] * 100)
+                import_status_var.set(describe(latest))
+            if final is None:
+                parent_frame.after(100, poll_import)
+                return
+            kind, payload = final
+            if kind == "error":
+                if dialog_open:
+                    import_status_var.set("Import failed.")
+                    start_btn.config(state=NORMAL)
+                messagebox.showerror("Import Error", f"Failed to import expenses.\n{payload}")
+                return
+            if dialog_open:
+                import_progress_var.set(100)
+                import_status_var.set(describe(payload) + ("\nImport stopped." if payload["stopped"] else "\nImport complete."))
+            if payload["errors"]:
+                print("Skipped rows:\n" + "\n".join(payload["errors"]))
+            invalidate_tracker()
+            invalidate_range_index()
+            invalidate_aggregates()
+            if expense_table.winfo_exists():
+                refresh_table()
+                _refresh_budget_alerts()
+                info_var.set(f"Imported {payload['inserted']:,} expenses ({payload['duplicates']:,} duplicates skipped).")
+
+        def start_import():
+            mapping = {f: v.get() for f, v in field_vars.items() if v.get() != "(none)"}
+            missing = [f for f in REQUIRED_FIELDS if f not in mapping]
+            if missing:
+                messagebox.showwarning("Import", f"Please map the required column(s): {', '.join(missing)}", parent=dialog)
+                return
+            fmt = date_format_var.get().strip()
+            date_formats = DEFAULT_DATE_FORMATS if fmt in ("", "Auto") else (fmt,)
+            start_btn.config(state=DISABLED)
+            import_status_var.set("Importing...")
+            threading.Thread(target=worker, args=(mapping, date_formats, negative_var.get()), daemon=True).start()
+            parent_frame.after(100, poll_import)
+
+        def close_dialog():
+            stop_import.set()
+            dialog.destroy()
+
+        start_btn = ttk.Button(dialog, text="📥 Import", command=start_import)
+        start_btn.grid(row=row + 4, column=0, padx=12, pady=(4, 12), sticky=W)
+        ttk.Button(dialog, text="Close", command=close_dialog).grid(row=row + 4, column=1, padx=12, pady=(4, 12), sticky=E)
+        dialog.protocol("WM_DELETE_WINDOW", close_dialog)
+
     # Buttons
     button_frame = Frame(form_container, bg="#ffffff")
     button_frame.pack(pady=10)
@@ -468,6 +1178,11 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     ttk.Button(button_frame, text="♻️ Clear", command=clear_form).grid(row=0, column=1, padx=6)
     ttk.Button(button_frame, text="🗑️ Delete", command=delete_expense).grid(row=0, column=2, padx=6)
     ttk.Button(refresh_btn_container, text="🔄 Refresh", command=lambda: [clear_form(), refresh_table()]).pack(side=RIGHT)
+    ttk.Button(refresh_btn_container, text="📥 Import CSV", command=open_import_dialog).pack(side=RIGHT, padx=(0, 6))
+    ttk.Button(refresh_btn_container, text="🎯 Budgets", command=open_budgets_dialog).pack(side=RIGHT, padx=(0, 6))
+    ttk.Button(refresh_btn_container, text="🔁 Recurring", command=open_recurring_dialog).pack(side=RIGHT, padx=(0, 6))
+    ttk.Button(refresh_btn_container, text="🧹 Duplicates", command=open_duplicates_dialog).pack(side=RIGHT, padx=(0, 6))
+    ttk.Button(refresh_btn_container, text="💱 Rates", command=import_rates_file).pack(side=RIGHT, padx=(0, 6))
 
     # Table (right)
     table_container = Frame(main_container, bg="#ffffff", relief="raised", bd=2)
@@ -493,18 +1208,25 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     filter_category = ttk.Combobox(
         filter_bar,
         textvariable=filter_category_var,
-        values=("All", "General", "Food", "Transport", "Utilities", "Rent", "Healthcare", "Entertainment", "Shopping", "Education", "Travel", "Other"),
+        values=("All",) + EXPENSE_CATEGORIES,
         state="readonly",
         width=14,
     )
     filter_category.pack(side=LEFT, padx=(6, 16))
     Label(filter_bar, text="Status:", bg="#ffffff").pack(side=LEFT)
     filter_status_var = StringVar(value="All")
-    filter_status = ttk.Combobox(filter_bar, textvariable=filter_status_var, values=("All", "Planned", "Incurred", "Paid"), state="readonly", width=12)
-    filter_status.pack(side=LEFT, padx=(6, 0))
+    filter_status = ttk.Combobox(filter_bar, textvariable=filter_status_var, values=("All",) + EXPENSE_STATUSES, state="readonly", width=12)
+    filter_status.pack(side=LEFT, padx=(6, 16))
+    Label(filter_bar, text="Show:", bg="#ffffff").pack(side=LEFT)
+    range_var = StringVar(value=HISTORY_RANGES[0][0])
+    range_combo = ttk.Combobox(filter_bar, textvariable=range_var, values=[label for label, _ in HISTORY_RANGES], state="readonly", width=14)
+    range_combo.pack(side=LEFT, padx=(6, 0))
+
+    table_frame = Frame(table_container, bg="#ffffff")
+    table_frame.pack(fill=BOTH, expand=True, padx=16, pady=10)
 
     expense_table = ttk.Treeview(
-        table_container,
+        table_frame,
         columns=("ID", "Title", "Category", "Amount", "Date", "Payment", "Status"),
         show="headings",
         style="Custom.Treeview",
@@ -526,7 +1248,10 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     expense_table.column("Payment", width=110, anchor=W)
     expense_table.column("Status", width=110, anchor=W)
 
-    expense_table.pack(fill=BOTH, expand=True, padx=16, pady=10)
+    table_vsb = ttk.Scrollbar(table_frame, orient=VERTICAL, command=expense_table.yview)
+    expense_table.configure(yscrollcommand=on_table_scroll)
+    table_vsb.pack(side=RIGHT, fill=Y)
+    expense_table.pack(fill=BOTH, expand=True)
     expense_table.bind("<<TreeviewSelect>>", on_row_select)
 
     # --------- Monthly Report (Chart) ---------
@@ -564,6 +1289,13 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     chart_type = ttk.Combobox(controls_frame, textvariable=chart_type_var, state="readonly", width=10,
                               values=("Pie", "Bar"))
     chart_type.pack(side=LEFT, padx=(6, 16))
+    Label(controls_frame, text="In:", bg="#ffffff").pack(side=LEFT)
+    report_currency_var = StringVar(value=BASE_CURRENCY)
+    report_currency_combo = ttk.Combobox(controls_frame, textvariable=report_currency_var, state="readonly", width=6,
+                                         values=_currency_choices())
+    report_currency_combo.pack(side=LEFT, padx=(6, 16))
+    include_projected_var = BooleanVar(value=True)
+    ttk.Checkbutton(controls_frame, text="Projected recurring", variable=include_projected_var).pack(side=LEFT, padx=(0, 16))
 
     # Generate button
     def _ensure_matplotlib():
@@ -575,20 +1307,65 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
             return False
         return True
 
+    # Custom range total (answered from the in-memory Fenwick index)
+    range_sum_frame = Frame(report_container, bg="#ffffff")
+    range_sum_frame.pack(fill=X, pady=(8, 0))
+    Label(range_sum_frame, text="Custom range:", bg="#ffffff").pack(side=LEFT)
+    if _TKCALENDAR_AVAILABLE:
+        range_from_entry = DateEntry(range_sum_frame, width=11, date_pattern='y-mm-dd')
+        range_to_entry = DateEntry(range_sum_frame, width=11, date_pattern='y-mm-dd')
+    else:
+        range_from_entry = ttk.Entry(range_sum_frame, width=12)
+        range_to_entry = ttk.Entry(range_sum_frame, width=12)
+        range_from_entry.insert(0, datetime.now().replace(day=1).strftime("%Y-%m-%d"))
+        range_to_entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
+    range_from_entry.pack(side=LEFT, padx=(6, 4))
+    Label(range_sum_frame, text="to", bg="#ffffff").pack(side=LEFT)
+    range_to_entry.pack(side=LEFT, padx=(4, 10))
+    range_category_var = StringVar(value="All")
+    ttk.Combobox(range_sum_frame, textvariable=range_category_var, values=("All",) + EXPENSE_CATEGORIES, state="readonly", width=12).pack(side=LEFT, padx=(0, 10))
+    range_total_var = StringVar(value="")
+
+    def show_range_total():
+        try:
+            start = datetime.strptime(range_from_entry.get().strip(), "%Y-%m-%d").date()
+            end = datetime.strptime(range_to_entry.get().strip(), "%Y-%m-%d").date()
+        except ValueError:
+            range_total_var.set("Dates must be YYYY-MM-DD.")
+            return
+        index = _range_index()
+        if index is None:
+            range_total_var.set("Range totals unavailable.")
+            return
+        total = index.range_sum(start, end, range_category_var.get())
+        range_total_var.set(f"Total: {format_money(total)}")   # the index holds base-currency amounts
+
+    ttk.Button(range_sum_frame, text="Sum", command=show_range_total).pack(side=LEFT)
+    Label(range_sum_frame, textvariable=range_total_var, font=("Segoe UI", 10, "bold"), bg="#ffffff", fg="#2c3e50").pack(side=LEFT, padx=(10, 0))
+
     chart_frame = Frame(report_container, bg="#ffffff")
     chart_frame.pack(fill=BOTH, expand=False, pady=(10, 0))
     current_canvas = {"canvas": None}
 
     def _update_year_options():
+        conn = None
         try:
-            years = set()
-            for r in all_rows:
-                d = _to_date(r.get("date"))
-                if d:
-                    years.add(str(d.year))
-            years = sorted(years, reverse=True)
+            conn = connect_db()
+            cur = conn.cursor()
+            cur.execute("SELECT DISTINCT YEAR(date) FROM expenses WHERE date IS NOT NULL ORDER BY 1 DESC")
+            years = [str(r[0]) for r in cur.fetchall() if r[0]]
+            # Keep the current year selectable so projected recurring spend can be reported
+            if str(datetime.now().year) not in years:
+                years = sorted(years + [str(datetime.now().year)], reverse=True)
+            cur.close()
         except Exception:
             years = [str(datetime.now().year)]
+        finally:
+            try:
+                if conn:
+                    conn.close()
+            except Exception:
+                pass
         if not years:
             years = [str(datetime.now().year)]
         year_combo["values"] = years
@@ -616,18 +1393,23 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
             info_var.set("Invalid month/year selected for report.")
             return
 
-        totals = {}
-        for r in all_rows:
-            d = _to_date(r.get("date"))
-            if not d:
-                continue
-            if d.year == y and d.month == m:
-                cat = r.get("category") or "General"
-                try:
-                    amt = float(r.get("amount") or 0)
-                except Exception:
-                    amt = 0.0
-                totals[cat] = totals.get(cat, 0.0) + amt
+        # Aggregate in SQL (converted and cached per currency/month): the table cache only holds the loaded window
+        report_currency = report_currency_var.get() or BASE_CURRENCY
+        try:
+            month_start = datetime(y, m, 1).date()
+            next_month = datetime(y + (m == 12), m % 12 + 1, 1).date()
+            totals = category_totals(connect_db, month_start, next_month, report_currency)
+            if include_projected_var.get():
+                # Future recurring occurrences are projected on the fly, not stored
+                projected = projected_totals(connect_db, month_start, next_month - timedelta(days=1))
+                converted = get_rate_table().convert(
+                    list(projected.values()), [BASE_CURRENCY] * len(projected), [month_start] * len(projected), report_currency
+                )
+                for cat, amt in zip(projected, converted):
+                    totals[cat] = totals.get(cat, 0.0) + float(amt)
+        except Exception as e:
+            messagebox.showerror("Query Error", f"Failed to build the report.\n{e}")
+            return
 
         if not totals:
             info_var.set("No expenses found for the selected month.")
@@ -641,7 +1423,7 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
 
         if chart_type_var.get() == "Bar":
             ax.bar(labels, values, color="#3498db")
-            ax.set_ylabel("Amount")
+            ax.set_ylabel(f"Amount ({report_currency})")
             ax.set_title(f"Spending by Category - {calendar.month_name[m]} {y}")
             ax.tick_params(axis='x', rotation=20)
         else:
@@ -658,10 +1440,14 @@ def show_expenses(parent_frame: Frame, connect_db, go_back):
     ttk.Button(controls_frame, text="Generate", command=render_report).pack(side=LEFT)
 
     # Wire filters
-    search_var.trace_add("write", apply_filter)
+    search_var.trace_add("write", on_search_change)
     filter_category_var.trace_add("write", apply_filter)
     filter_status_var.trace_add("write", apply_filter)
+    range_var.trace_add("write", on_range_change)
 
     # Initial load
     refresh_table()
-    _update_year_options()
+    _refresh_budget_alerts()
+    title_entry.bind("<KeyRelease>", suggest_category)
+    # Warm up the auto-categorizer (loads the saved model and learns rows added since)
+    _run_in_background(lambda: get_classifier(connect_db), lambda *_: None)
@@ -0,0 +1,166 @@
+# goal_planner.py
+import json
+import os
+import re
+
+# --- Planner Configuration ---
+# Topic catalog: {"default": name, "topics": {name: {"keywords": [...], "tasks": [...]}}}
+TOPICS_FILE = os.getenv("LM_PLANNER_TOPICS", os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                          "planner_topics.json"))
+# very generic study plan, also used when the catalog cannot be loaded
+GENERIC_TASKS = [
+    "Define clear learning objectives",
+    "Collect the best beginner resources",
+    "Schedule daily 30-minute study blocks",
+    "Complete one focused practice session",
+    "Create a mini project to apply skills",
+    "Review mistakes and notes daily",
+    "Seek feedback from a knowledgeable peer",
+    "Summarize learnings into a cheat sheet",
+]
+
+
+# --- Smart deterministic planner (used when the AI service is unavailable or its output is poor) ---
+def limit_words(s: str, n: int = 10) -> str:
+    words = s.strip().split()
+    return (" ".join(words[:n]) + ("..." if len(words) > n else "")).strip()
+
+
+_MONTHS_RE = re.compile(r"(\d+)\s*(month|months|mon)\b")
+_WEEKS_RE = re.compile(r"(\d+)\s*(week|weeks|wk|wks)\b")
+_DAYS_RE = re.compile(r"(\d+)\s*(day|days)\b")
+
+
+def infer_weeks_from_text(text: str) -> int:
+    """Roughly infer weeks from natural language like 'in 1 month', 'for 6 weeks', '10 days'."""
+    t = (text or "").lower()
+    # months
+    m = _MONTHS_RE.search(t)
+    if m:
+        return max(1, int(m.group(1)) * 4)
+    # weeks
+    w = _WEEKS_RE.search(t)
+    if w:
+        return max(1, int(w.group(1)))
+    # days
+    d = _DAYS_RE.search(t)
+    if d:
+        days = int(d.group(1))
+        return max(1, (days + 6) // 7)
+    return 0
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def _trie_pattern(phrases) -> str:
+    """Regex for a set of phrases, factored by common prefixes like a trie.
+
+    The regex engine then follows one path per text position instead of trying
+    every phrase, so matching cost does not grow with the number of phrases.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node) -> str:
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:   # a phrase ends here; longer phrases are tried first
+            return f"(?:{body})?"
+        return body
+
+    return emit(trie)
+
+
+class TopicIndex:
+    """Planner topic catalog (keywords -> task templates) compiled into one regex.
+
+    ``detect`` makes a single pass over the goal text; the topic with the most
+    keyword hits wins, ties going to the topic listed first in the catalog.
+    """
+
+    def __init__(self, catalog: dict):
+        self.topics = {name: [limit_words(t, 10) for t in spec.get("tasks", [])]
+                       for name, spec in catalog["topics"].items()}
+        self.default = catalog.get("default") or next(iter(self.topics))
+        self._order = {name: i for i, name in enumerate(self.topics)}
+        self._keyword_topic = {}
+        for name, spec in catalog["topics"].items():
+            for keyword in spec.get("keywords", []):
+                self._keyword_topic.setdefault(_normalize(keyword), name)
+        pattern = _trie_pattern(k for k in self._keyword_topic if k)
+        self._regex = re.compile(rf"\b{pattern}\b") if pattern else None
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def detect(self, text: str) -> str:
+        if self._regex is None:
+            return self.default
+        hits = {}
+        for match in self._regex.finditer(_normalize(text)):
+            topic = self._keyword_topic[match.group(0)]
+            hits[topic] = hits.get(topic, 0) + 1
+        if not hits:
+            return self.default
+        return min(hits, key=lambda topic: (-hits[topic], self._order[topic]))
+
+    def tasks(self, topic: str) -> list:
+        return list(self.topics.get(topic) or self.topics.get(self.default, []))
+
+
+_topic_index = None
+
+
+def get_topic_index() -> TopicIndex:
+    """The catalog from TOPICS_FILE, compiled once per process (generic plan only if it cannot be read)."""
+    global _topic_index
+    if _topic_index is None:
+        try:
+            _topic_index = TopicIndex.load(TOPICS_FILE)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Planner topic catalog unavailable ({e}); using the generic plan.")
+            _topic_index = TopicIndex({"topics": {"generic_learn": {"tasks": GENERIC_TASKS}}})
+    return _topic_index
+
+
+def detect_topic(title: str, desc: str) -> str:
+    return get_topic_index().detect(f"{title} {desc}")
+
+
+def tasks_for_topic(topic: str) -> list:
+    return get_topic_index().tasks(topic)
+
+
+def build_rule_based_plan(title: str, desc: str) -> list:
+    topic = detect_topic(title, desc)
+    weeks = infer_weeks_from_text(desc)
+    tasks = tasks_for_topic(topic)
+    # Cap total tasks to a reasonable number for short timeframes
+    max_tasks = 8 if weeks and weeks <= 4 else min(12, len(tasks))
+    tasks = tasks[:max_tasks]
+    # If we know the weeks, prefix early tasks with week labels
+    if weeks > 0:
+        # use up to min(weeks, len(tasks)) week labels
+        label_count = min(weeks, len(tasks))
+        labeled = []
+        for i, t in enumerate(tasks):
+            if i < label_count:
+                pref = f"Week {i+1}: "
+                labeled.append(limit_words(pref + t, 10))
+            else:
+                labeled.append(limit_words(t, 10))
+        tasks = labeled
+    else:
+        tasks = [limit_words(t, 10) for t in tasks]
+    # Final sanitizer: drop any empty strings
+    return [t for t in tasks if t]
@@ -0,0 +1,265 @@
+# goal_similarity.py
+import sys
+import threading
+import time
+import zlib
+
+from plan_cache import normalize_goal_text
+
+# Optional: NumPy powers the vectorized index (installed via requirements)
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    _NUMPY_AVAILABLE = False
+
+# --- Similar Goal Index Configuration ---
+N_FEATURES = 1 << 16        # hashed vocabulary size (power of two)
+DEFAULT_K = 3
+MIN_SIMILARITY = 0.25       # weaker matches are not offered at all
+AUTO_REUSE_SIMILARITY = 0.8  # batch planning reuses a plan without asking above this
+STOPWORDS = frozenset("a an and for i in my of on the to with".split())
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _tokens(text: str) -> list:
+    words = [w for w in normalize_goal_text(text).split() if w not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def hash_features(text: str) -> dict:
+    """Hashed feature id -> term count for a goal's title and description."""
+    counts = {}
+    for tok in _tokens(text):
+        f = zlib.crc32(tok.encode("utf-8")) & (N_FEATURES - 1)
+        counts[f] = counts.get(f, 0) + 1
+    return counts
+
+
+class GoalIndex:
+    """TF-IDF nearest-neighbour index over goal title + description.
+
+    Postings are kept as flat arrays (row, feature, log-tf), so a query is one
+    vectorized gather and bincount over all postings. Goals are added, replaced
+    and removed incrementally; IDF and document norms are refreshed lazily
+    before the next query.
+    """
+
+    def __init__(self):
+        self.goal_ids = []            # row -> goal id (None once replaced or removed)
+        self.titles = []
+        self._row_of = {}
+        self._rows = np.zeros(0, dtype=np.int32)
+        self._feats = np.zeros(0, dtype=np.int32)
+        self._tf = np.zeros(0, dtype=np.float32)
+        self._df = np.zeros(N_FEATURES, dtype=np.float32)
+        self._pending = []            # (row, {feature: count}) not yet merged into the flat arrays
+        self._idf = None
+        self._norms = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._row_of)
+
+    def add(self, goal_id, title: str, description: str = ""):
+        """Index a goal, replacing its previous text if it was indexed already."""
+        counts = hash_features(f"{title} {description or ''}")
+        with self._lock:
+            self._forget(goal_id)
+            row = len(self.goal_ids)
+            self.goal_ids.append(goal_id)
+            self.titles.append(title)
+            self._row_of[goal_id] = row
+            self._pending.append((row, counts))
+            if counts:
+                self._df[list(counts)] += 1
+            self._idf = None
+
+    def remove(self, goal_id):
+        with self._lock:
+            self._forget(goal_id)
+            self._idf = None
+
+    def _forget(self, goal_id):
+        row = self._row_of.pop(goal_id, None)
+        if row is None:
+            return
+        self.goal_ids[row] = None
+        self._merge()
+        feats = self._feats[self._rows == row]
+        self._df[feats] -= 1
+
+    def _merge(self):
+        if not self._pending:
+            return
+        rows, feats, tfs = [], [], []
+        for row, counts in self._pending:
+            rows.extend([row] * len(counts))
+            feats.extend(counts)
+            tfs.extend(counts.values())
+        self._rows = np.concatenate((self._rows, np.asarray(rows, dtype=np.int32)))
+        self._feats = np.concatenate((self._feats, np.asarray(feats, dtype=np.int32)))
+        self._tf = np.concatenate((self._tf, 1.0 + np.log(np.asarray(tfs, dtype=np.float32))))
+        self._pending = []
+
+    def _refresh(self):
+        if self._idf is not None:
+            return
+        self._merge()
+        live = np.fromiter((gid is not None for gid in self.goal_ids), dtype=bool, count=len(self.goal_ids))
+        if len(live) and live.sum() < len(live) // 2:
+            self._compact(live)
+            live = np.ones(len(self.goal_ids), dtype=bool)
+        n_docs = max(1, len(self._row_of))
+        self._idf = np.log((1.0 + n_docs) / (1.0 + self._df)) + 1.0
+        weights = self._tf * self._idf[self._feats]
+        self._norms = np.sqrt(np.bincount(self._rows, weights=weights * weights, minlength=len(self.goal_ids)))
+        self._norms[~live] = 0.0
+
+    def _compact(self, live):
+        """Drop rows of replaced/removed goals once they are the majority."""
+        new_row = np.cumsum(live) - 1
+        keep = live[self._rows]
+        self._rows = new_row[self._rows[keep]].astype(np.int32)
+        self._feats = self._feats[keep]
+        self._tf = self._tf[keep]
+        self.goal_ids = [gid for gid, alive in zip(self.goal_ids, live) if alive]
+        self.titles = [t for t, alive in zip(self.titles, live) if alive]
+        self._row_of = {gid: row for row, gid in enumerate(self.goal_ids)}
+
+    def similar(self, title: str, description: str = "", k: int = DEFAULT_K, exclude=None,
+                min_similarity: float = MIN_SIMILARITY) -> list:
+        """Up to ``k`` ``(goal_id, title, cosine similarity)`` tuples, most similar first."""
+        counts = hash_features(f"{title} {description or ''}")
+        if not counts:
+            return []
+        with self._lock:
+            self._refresh()
+            if not self._row_of:
+                return []
+            query = np.zeros(N_FEATURES, dtype=np.float32)
+            feats = np.fromiter(counts, dtype=np.intp, count=len(counts))
+            query[feats] = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32))) * self._idf[feats]
+            contrib = query[self._feats] * self._tf * self._idf[self._feats]
+            scores = np.bincount(self._rows, weights=contrib, minlength=len(self.goal_ids))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.where(self._norms > 0, scores / (self._norms * np.linalg.norm(query)), 0.0)
+            if exclude is not None and exclude in self._row_of:
+                scores[self._row_of[exclude]] = 0.0
+            top = np.argsort(-scores)[:k]
+            return [(self.goal_ids[r], self.titles[r], float(scores[r])) for r in top if scores[r] >= min_similarity]
+
+    def build_from_db(self, conn) -> int:
+        cur = conn.cursor()
+        try:
+            cur.execute("SELECT id, title, description FROM goals ORDER BY id")
+            rows = cur.fetchall()
+        finally:
+            cur.close()
+        for goal_id, title, description in rows:
+            self.add(goal_id, title or "", description or "")
+        return len(rows)
+
+
+def get_goal_index(connect_db):
+    """Shared index built from the goals table on first use (None without NumPy or database)."""
+    global _index
+    if not _NUMPY_AVAILABLE:
+        return None
+    with _index_lock:
+        if _index is None:
+            conn = connect_db()
+            if conn is None:
+                return None
+            try:
+                index = GoalIndex()
+                index.build_from_db(conn)
+            finally:
+                conn.close()
+            _index = index
+        return _index
+
+
+def peek_goal_index():
+    """The shared index if it has already been built, without touching the database."""
+    return _index
+
+
+def _fetch_tasks(conn, goal_ids) -> dict:
+    if not goal_ids:
+        return {}
+    cur = conn.cursor()
+    try:
+        placeholders = ", ".join(["%s"] * len(goal_ids))
+        cur.execute(
+            f"SELECT goal_id, task_description FROM goal_tasks WHERE goal_id IN ({placeholders}) "
+            "ORDER BY goal_id, created_at, id",
+            tuple(goal_ids),
+        )
+        tasks = {}
+        for goal_id, desc in cur.fetchall():
+            tasks.setdefault(goal_id, []).append(desc)
+        return tasks
+    finally:
+        cur.close()
+
+
+def suggest_plans(connect_db, title: str, description: str = "", k: int = DEFAULT_K, exclude=None) -> list:
+    """Task lists of the ``k`` most similar goals that have tasks: ``[(goal_id, title, score, tasks)]``."""
+    index = get_goal_index(connect_db)
+    if index is None:
+        return []
+    # Over-fetch: similar goals without any tasks yet are skipped
+    candidates = index.similar(title, description, k * 4, exclude=exclude)
+    if not candidates:
+        return []
+    conn = connect_db()
+    if conn is None:
+        return []
+    try:
+        tasks = _fetch_tasks(conn, [gid for gid, _, _ in candidates])
+    finally:
+        conn.close()
+    return [(gid, t, score, tasks[gid]) for gid, t, score in candidates if tasks.get(gid)][:k]
+
+
+def reusable_plans(connect_db, conn, goals, min_similarity: float = AUTO_REUSE_SIMILARITY) -> dict:
+    """``{goal_id: tasks}`` for goals with a near-duplicate that already has tasks (one task query)."""
+    index = get_goal_index(connect_db)
+    if index is None:
+        return {}
+    matches = {goal_id: index.similar(title, desc or "", DEFAULT_K, exclude=goal_id, min_similarity=min_similarity)
+               for goal_id, title, desc in goals}
+    tasks = _fetch_tasks(conn, sorted({gid for found in matches.values() for gid, _, _ in found}))
+    plans = {}
+    for goal_id, found in matches.items():
+        for gid, _, _ in found:
+            if tasks.get(gid):
+                plans[goal_id] = list(tasks[gid])
+                break
+    return plans
+
+
+if __name__ == "__main__":
+    # Query the index from the shell: python goal_similarity.py "goal title" ["description"]
+    if not _NUMPY_AVAILABLE:
+        print("❌ NumPy is not installed (pip install numpy).")
+        sys.exit(1)
+    if len(sys.argv) < 2:
+        print('Usage: python goal_similarity.py "goal title" ["description"]')
+        sys.exit(1)
+    from db_connect import connect_db
+
+    t0 = time.perf_counter()
+    get_goal_index(connect_db)
+    print(f"Index ready in {time.perf_counter() - t0:.2f}s ({len(peek_goal_index())} goals).")
+    t0 = time.perf_counter()
+    suggestions = suggest_plans(connect_db, sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "")
+    print(f"Query took {(time.perf_counter() - t0) * 1000:.1f} ms")
+    for goal_id, title, score, tasks in suggestions:
+        print(f"\n#{goal_id} {title} ({score:.0%})")
+        for task in tasks:
+            print(f"  - {task}")
@@ -1,154 +1,169 @@
 # goal_tasks_app.py
-import os
-import re
 import threading
+import time
 import tkinter as tk
 from tkinter import messagebox, scrolledtext
 
-# --- Check for Transformers ---
-try:
-    from transformers import AutoModelForCausalLM, AutoTokenizer
-except ImportError:
-    messagebox.showerror(
-        "Dependency Missing",
-        "The 'transformers' library is not installed.\n"
-        "Please install it by running: pip install transformers"
-    )
-    exit()
-
-# --- Configuration ---
-MODEL_NAME = "distilgpt2"
-MODEL_PATH = os.path.join(".", "model_cache", MODEL_NAME)
+from goal_planner import build_rule_based_plan
+from inference_client import (GENERATION_DEADLINE_SEC, USABLE_STATES, InferenceClient, InferenceError,
+                              InferenceUnavailable, describe_status, ensure_server)
+from plan_cache import get_plan_cache
+from task_parsing import (CONSTRAINED_DECODING, MIN_USEFUL_TASKS, TaskStreamParser, collect_streamed_tasks,
+                          task_list_params)
+from ui_dispatch import UIDispatcher
 
 # --- Global Variables ---
-model = None
-tokenizer = None
+ai_client = InferenceClient()
 model_loading_thread = None
-stop_event = threading.Event()
-
-# --- AI Model Handling ---
+ui = None  # UIDispatcher: worker threads reach Tk only through it
+stop_event = threading.Event()  # set by the Cancel button, checked per generated token
+SERVICE_STATUS_REFRESH_MS = 5000  # how often the service status line (state, memory) is refreshed
+# Part of the plan cache key: bump when the prompt or parsing below changes
+PLAN_CACHE_PARAMS = {"prompt": "goal_tasks_app/v3", "max_new_tokens": 100, "max_tasks": 5,
+                     "constrained": CONSTRAINED_DECODING}
+# Constant instructions go first so the AI service can reuse their encoding across requests
+PROMPT_PREFIX = (
+    "Generate a numbered list of 5 simple, actionable tasks to achieve the goal below. "
+    "Each task should be short and clear.\n\n"
+)
+
+# --- AI Service Handling ---
 def load_model_offline():
     """
-    Loads the model and tokenizer from the local cache directory.
-    Updates the UI status label accordingly.
+    Connects to the shared inference service (starting it if needed).
+    The model itself is loaded once by the service, not by this app.
     """
-    global model, tokenizer
-    
-    status_var.set("🔄 Loading model... Please wait.")
-    root.update_idletasks()
+    set_status("🔄 Connecting to the AI service... Please wait.")
 
     try:
-        if not os.path.exists(MODEL_PATH):
-            status_var.set(f"❌ Error: Model directory not found at '{MODEL_PATH}'.")
-            messagebox.showerror(
-                "Model Not Found",
-                f"The model cache was not found at '{MODEL_PATH}'.\n"
-                "Please run the `download_model.py` script first while you have an internet connection."
-            )
-            return
-
-        # Load tokenizer and model from the local directory only
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, local_files_only=True)
-        model = AutoModelForCausalLM.from_pretrained(MODEL_PATH, local_files_only=True)
-        
-        status_var.set("✅ Model loaded successfully. Ready to generate tasks!")
-        generate_button.config(state=tk.NORMAL)
+        status = ensure_server(ai_client)
+        if status.get("state") in USABLE_STATES:
+            set_status(f"✅ AI service ready ({status.get('model')}). Ready to generate tasks!")
+        elif status.get("state") == "loading":
+            set_status("🔄 The AI service is loading the model. Tasks come from the rule-based planner meanwhile.")
+        else:
+            set_status("⚠️ AI model unavailable. Tasks will come from the rule-based planner.")
+    except (InferenceUnavailable, InferenceError) as e:
+        set_status("⚠️ AI service offline. Tasks will come from the rule-based planner.")
+        print(f"AI service unavailable: {e}")
+    finally:
+        ui.post(generate_button.config, state=tk.NORMAL)
 
-    except Exception as e:
-        status_var.set("❌ Error loading model. Check console for details.")
-        messagebox.showerror("Model Loading Failed", f"An error occurred: {e}")
-        print(f"Full error: {e}")
+def set_status(message: str):
+    """Show ``message`` in the status line; rapid updates from workers collapse into the latest."""
+    ui.post_latest("status", status_var.set, message)
+
+def refresh_service_status():
+    """Poll the service's state and memory in the background, every SERVICE_STATUS_REFRESH_MS."""
+    def poll():
+        try:
+            line = describe_status(ai_client.status())
+        except (InferenceUnavailable, InferenceError):
+            line = "AI service offline"
+        ui.post_latest("service_status", service_status_var.set, line)
+
+    threading.Thread(target=poll, daemon=True).start()
+    root.after(SERVICE_STATUS_REFRESH_MS, refresh_service_status)
 
 def generate_tasks_threaded(goal_title, goal_description):
     """
     Wrapper to run the task generation in a separate thread to keep the UI responsive.
     """
+    # Disable right away (not via the dispatcher) so a quick second click cannot start another run
+    generate_button.config(state=tk.DISABLED)
     thread = threading.Thread(target=generate_tasks, args=(goal_title, goal_description))
     thread.start()
 
 def generate_tasks(goal_title, goal_description):
     """
-    Generates a list of tasks based on the goal's title and description using the local model.
+    Streams a list of tasks for the goal from the shared AI service,
+    falling back to the rule-based planner when the service is down or too slow.
+    Generation stops on Cancel (stop_event), at the deadline, or after max_tasks tasks.
     """
-    if not model or not tokenizer:
-        status_var.set("❌ Model is not loaded. Cannot generate tasks.")
-        return
+    stop_event.clear()
+    deadline = time.monotonic() + GENERATION_DEADLINE_SEC
+    set_status("⏳ Generating tasks...")
+    ui.post(generate_button.config, state=tk.DISABLED)
+    ui.post(cancel_button.config, state=tk.NORMAL)
+    ui.post(task_listbox.delete, 0, tk.END)
 
-    status_var.set("⏳ Generating tasks...")
-    generate_button.config(state=tk.DISABLED)
-    task_listbox.delete(0, tk.END)
-    root.update_idletasks()
+    def stop_requested():
+        return stop_event.is_set() or time.monotonic() >= deadline
 
     try:
         # Create a detailed prompt for the AI
         prompt = (
+            PROMPT_PREFIX +
             f"Goal: {goal_title}\n"
             f"Description: {goal_description}\n\n"
-            "Based on the goal above, generate a numbered list of 5 simple, actionable tasks to achieve it. "
-            "Each task should be short and clear.\n\n"
             "Here are the tasks:\n1."
         )
 
-        inputs = tokenizer(prompt, return_tensors="pt")
-        
-        # Generate text with adjusted parameters for better task lists
-        outputs = model.generate(
-            **inputs,
-            max_length=150,
-            num_return_sequences=1,
-            no_repeat_ngram_size=2,
-            temperature=0.7,
-            top_k=50,
-            top_p=0.95,
-            pad_token_id=tokenizer.eos_token_id
-        )
-
-        generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-        
-        # Parse the generated text to extract clean tasks
-        tasks = parse_generated_tasks(generated_text)
+        tasks, source = [], "AI service"
+        # Same goal and same model: reuse the stored plan instead of generating again
+        cache = get_plan_cache()
+        cached = cache.get(goal_title, goal_description, ai_client.model_id(), PLAN_CACHE_PARAMS) if cache else None
+        if cached:
+            tasks, source = cached, "AI service, cached"
+        else:
+            # Show each task as soon as its line is complete; stop once there are enough
+            parser = TaskStreamParser(clean=None, max_tasks=PLAN_CACHE_PARAMS["max_tasks"])
+
+            def show_task(task):
+                ui.post(task_listbox.insert, tk.END, f"{len(parser.tasks)}. {task}")
+                set_status(f"⏳ Generating tasks... ({len(parser.tasks)} so far)")
+
+            try:
+                stream = ai_client.stream(prompt, prefix=PROMPT_PREFIX, should_stop=stop_requested,
+                                          deadline_sec=GENERATION_DEADLINE_SEC,
+                                          max_new_tokens=PLAN_CACHE_PARAMS["max_new_tokens"],
+                                          **task_list_params(PLAN_CACHE_PARAMS["max_tasks"]))
+                tasks = collect_streamed_tasks(stream, parser, show_task, stop_requested)
+                if stop_event.is_set():
+                    set_status(f"⏹ Generation cancelled ({len(tasks)} tasks kept).")
+                    return
+                if stop_requested() and not parser.done:
+                    print(f"AI generation hit the {GENERATION_DEADLINE_SEC:.0f}s deadline with {len(tasks)} tasks.")
+                    if len(tasks) < MIN_USEFUL_TASKS:
+                        tasks = []
+                elif cache and tasks:
+                    cache.put(goal_title, goal_description, ai_client.model_id(), PLAN_CACHE_PARAMS, tasks)
+            except (InferenceUnavailable, InferenceError) as e:
+                print(f"AI service unavailable, using the rule-based planner: {e}")
+                tasks = []
+        if not tasks:
+            tasks, source = build_rule_based_plan(goal_title, goal_description), "rule-based planner"
 
         # Update the UI with the generated tasks
-        task_listbox.delete(0, tk.END)
+        ui.post(task_listbox.delete, 0, tk.END)
         if tasks:
-            for i, task in enumerate(tasks, 1):
-                task_listbox.insert(tk.END, f"{i}. {task}")
-            status_var.set(f"✅ Successfully generated {len(tasks)} tasks!")
+            ui.post(task_listbox.insert, tk.END, *(f"{i}. {task}" for i, task in enumerate(tasks, 1)))
+            set_status(f"✅ Successfully generated {len(tasks)} tasks ({source})!")
         else:
-            status_var.set("⚠️ Generation finished, but no tasks were found.")
-            task_listbox.insert(tk.END, "No tasks generated. Try a different goal.")
+            set_status("⚠️ Generation finished, but no tasks were found.")
+            ui.post(task_listbox.insert, tk.END, "No tasks generated. Try a different goal.")
 
     except Exception as e:
-        status_var.set("❌ Task generation failed. See console for error.")
-        messagebox.showerror("Generation Error", f"An error occurred: {e}")
+        set_status("❌ Task generation failed. See console for error.")
+        ui.post(messagebox.showerror, "Generation Error", f"An error occurred: {e}")
     finally:
-        generate_button.config(state=tk.NORMAL)
+        ui.post(generate_button.config, state=tk.NORMAL)
+        ui.post(cancel_button.config, state=tk.DISABLED)
 
-def parse_generated_tasks(text: str) -> list:
-    """
-    Parses the raw output from the model to extract a clean list of tasks.
-    It looks for numbered lines and cleans them up.
-    """
-    # Find the part of the text that contains the task list
-    tasks_section = text.split("Here are the tasks:")[-1]
-    
-    # Use regex to find numbered list items
-    # This pattern looks for a number, a dot, optional space, and then captures the text
-    tasks = re.findall(r"\d+\.\s*(.+)", tasks_section)
-    
-    # Clean up each task: strip whitespace and remove trailing noise
-    cleaned_tasks = [task.strip() for task in tasks if task.strip()]
-    
-    return cleaned_tasks
+def cancel_generation():
+    """Asks the running generation to stop; tasks already shown are kept."""
+    stop_event.set()
+    status_var.set("⏹ Cancelling...")
 
 # --- UI Setup ---
 def setup_ui():
     """
     Initializes and configures the main Tkinter UI components.
     """
-    global root, status_var, generate_button, task_listbox
+    global root, status_var, service_status_var, generate_button, cancel_button, task_listbox, ui
 
     root = tk.Tk()
+    ui = UIDispatcher(root)
     root.title("🎯 AI Goal to Task Generator (Offline)")
     root.geometry("700x600")
     root.configure(bg="#f0f2f5")
@@ -178,15 +193,28 @@ def setup_ui():
         font=("Segoe UI", 12, "bold"),
         bg="#007bff",
         fg="white",
-        state=tk.DISABLED,  # Disabled until model is loaded
+        state=tk.DISABLED,  # Enabled once the AI service has been checked
         command=lambda: generate_tasks_threaded(title_entry.get(), desc_text.get("1.0", tk.END))
     )
     generate_button.pack(side=tk.LEFT)
 
+    cancel_button = tk.Button(
+        control_frame,
+        text="⏹ Cancel",
+        font=("Segoe UI", 12),
+        state=tk.DISABLED,  # Enabled while a generation runs
+        command=cancel_generation
+    )
+    cancel_button.pack(side=tk.LEFT, padx=(10, 0))
+
     # --- Status Label ---
     status_var = tk.StringVar()
     status_label = tk.Label(main_frame, textvariable=status_var, font=("Segoe UI", 10), bg="#f0f2f5", fg="#555")
-    status_label.pack(fill=tk.X, pady=(5, 10))
+    status_label.pack(fill=tk.X, pady=(5, 0))
+    service_status_var = tk.StringVar()
+    service_status_label = tk.Label(main_frame, textvariable=service_status_var, font=("Segoe UI", 9), bg="#f0f2f5",
+                                    fg="#888")
+    service_status_label.pack(fill=tk.X, pady=(0, 10))
 
     # --- Output Frame ---
     output_frame = tk.LabelFrame(main_frame, text="Generated Tasks", font=("Segoe UI", 12, "bold"), bg="white", padx=15, pady=15)
@@ -195,10 +223,11 @@ def setup_ui():
     task_listbox = tk.Listbox(output_frame, font=("Segoe UI", 11), bg="#ffffff", selectbackground="#cce5ff")
     task_listbox.pack(fill=tk.BOTH, expand=True)
 
-    # --- Start model loading in a separate thread ---
+    # --- Connect to the AI service in a separate thread ---
     global model_loading_thread
     model_loading_thread = threading.Thread(target=load_model_offline)
     model_loading_thread.start()
+    refresh_service_status()
 
     root.mainloop()
 
@@ -1,16 +1,18 @@
-import os
-import re
 import threading
+import time
 from tkinter import *
 from tkinter import messagebox, ttk, scrolledtext
 from datetime import datetime
 
-try:
-    from transformers import AutoModelForCausalLM, AutoTokenizer
-    _TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    AutoModelForCausalLM, AutoTokenizer = None, None
-    _TRANSFORMERS_AVAILABLE = False
+from batch_planner import plan_all_unplanned
+from goal_planner import build_rule_based_plan
+from goal_similarity import get_goal_index, peek_goal_index, suggest_plans
+from inference_client import (GENERATION_DEADLINE_SEC, USABLE_STATES, InferenceClient, InferenceError,
+                              InferenceUnavailable, describe_status, ensure_server)
+from plan_cache import get_plan_cache
+from task_parsing import (GOAL_PROMPT_PARAMS, GOAL_PROMPT_PREFIX, MIN_USEFUL_TASKS, TaskStreamParser,
+                          collect_streamed_tasks, goal_prompt, task_list_params)
+from ui_dispatch import get_dispatcher
 
 try:
     from tkcalendar import DateEntry
@@ -19,12 +21,15 @@ except ImportError:
     _TKCALENDAR_AVAILABLE = False
 
 
-# --- AI Model Configuration ---
-MODEL_NAME = "distilgpt2"
-MODEL_PATH = os.path.join(".", "model_cache", MODEL_NAME)
-model = None
-tokenizer = None
-# --- End AI Configuration ---
+# --- AI Service ---
+# The model runs in the shared inference service (inference_server.py); this screen is a thin client.
+ai_client = InferenceClient()
+SERVICE_STATUS_REFRESH_MS = 5000   # how often the service status line (state, memory) is refreshed
+# --- End AI Service ---
+
+# Sub-task checkbox changes are written together once clicking pauses this long
+TOGGLE_FLUSH_MS = 600
+TOGGLE_RETRY_MS = 5000   # a failed write is retried this often while the goal stays open
 
 
 def _clear_frame(frame: Frame):
@@ -33,123 +38,49 @@ def _clear_frame(frame: Frame):
 
 def show_goals(parent_frame: Frame, connect_db, go_back):
     _clear_frame(parent_frame)
+    # Background work (AI service, batch planning) reaches Tk only through this dispatcher
+    ui = get_dispatcher(parent_frame)
 
     # --- AI Model Handling ---
-    ai_status_var = StringVar(value="AI model not loaded.")
-    
-    # --- Smart deterministic planner (fallback when LLM outputs are poor) ---
-    def _limit_words(s: str, n: int = 10) -> str:
-        words = s.strip().split()
-        return (" ".join(words[:n]) + ("..." if len(words) > n else "")).strip()
-
-    def _infer_weeks_from_text(text: str) -> int:
-        """Roughly infer weeks from natural language like 'in 1 month', 'for 6 weeks', '10 days'."""
-        t = (text or "").lower()
-        # months
-        m = re.search(r"(\d+)\s*(month|months|mon)\b", t)
-        if m:
-            return max(1, int(m.group(1)) * 4)
-        # weeks
-        w = re.search(r"(\d+)\s*(week|weeks|wk|wks)\b", t)
-        if w:
-            return max(1, int(w.group(1)))
-        # days
-        d = re.search(r"(\d+)\s*(day|days)\b", t)
-        if d:
-            days = int(d.group(1))
-            return max(1, (days + 6) // 7)
-        return 0
-
-    def _detect_topic(title: str, desc: str) -> str:
-        text = f"{title} {desc}".lower()
-        office_keywords = [
-            "ms office", "microsoft office", "word", "excel", "powerpoint", "outlook", "onedrive"
-        ]
-        if any(k in text for k in office_keywords):
-            return "ms_office"
-        return "generic_learn"
-
-    def _tasks_for_topic(topic: str) -> list:
-        if topic == "ms_office":
-            base = [
-                "Install Microsoft Office and sign in",
-                "Learn Word: formatting, styles, page layout",
-                "Write one-page document with headings",
-                "Learn Excel: cells, formulas, functions",
-                "Practice Excel: SUM, AVERAGE, IF, VLOOKUP",
-                "Create Excel chart and pivot table",
-                "Learn PowerPoint: slides, themes, layouts",
-                "Build 10-slide presentation with transitions",
-                "Learn Outlook: mail, calendar, rules",
-                "Set up OneDrive and file sharing",
-                "Practice keyboard shortcuts daily",
-                "Review templates: resume, invoice, report",
-            ]
-        else:
-            # very generic study plan
-            base = [
-                "Define clear learning objectives",
-                "Collect the best beginner resources",
-                "Schedule daily 30-minute study blocks",
-                "Complete one focused practice session",
-                "Create a mini project to apply skills",
-                "Review mistakes and notes daily",
-                "Seek feedback from a knowledgeable peer",
-                "Summarize learnings into a cheat sheet",
-            ]
-        return [_limit_words(t, 10) for t in base]
-
-    def _build_rule_based_plan(title: str, desc: str) -> list:
-        topic = _detect_topic(title, desc)
-        weeks = _infer_weeks_from_text(desc)
-        tasks = _tasks_for_topic(topic)
-        # Cap total tasks to a reasonable number for short timeframes
-        max_tasks = 8 if weeks and weeks <= 4 else min(12, len(tasks))
-        tasks = tasks[:max_tasks]
-        # If we know the weeks, prefix early tasks with week labels
-        if weeks > 0:
-            # use up to min(weeks, len(tasks)) week labels
-            label_count = min(weeks, len(tasks))
-            labeled = []
-            for i, t in enumerate(tasks):
-                if i < label_count:
-                    pref = f"Week {i+1}: "
-                    labeled.append(_limit_words(pref + t, 10))
-                else:
-                    labeled.append(_limit_words(t, 10))
-            tasks = labeled
-        else:
-            tasks = [_limit_words(t, 10) for t in tasks]
-        # Final sanitizer: drop any empty strings
-        return [t for t in tasks if t]
-    # --- End Smart deterministic planner ---
-    
-    def load_model_offline():
-        """Loads the model from local cache in a background thread."""
-        global model, tokenizer
-        if not _TRANSFORMERS_AVAILABLE:
-            ai_status_var.set("❌ 'transformers' library not found.")
+    ai_status_var = StringVar(value="AI service not checked yet.")
+    ai_state = {"message": ai_status_var.get()}
+    cancel_generation = threading.Event()
+
+    def _set_ai_status(message: str):
+        ai_state["message"] = message
+        ui.post_latest("ai_status", ai_status_var.set, message)
+
+    def connect_ai_service():
+        """Check the shared inference service in a background thread, starting it if needed."""
+        _set_ai_status("🔄 Connecting to the AI service...")
+        try:
+            status = ensure_server(ai_client)
+        except (InferenceUnavailable, InferenceError) as e:
+            print(f"AI service unavailable: {e}")
+            _set_ai_status("⚠️ AI service offline — using the smart planner.")
             return
+        ui.post_latest("service_status", service_status_var.set, describe_status(status))
+        if status.get("state") in USABLE_STATES:
+            _set_ai_status(f"✅ AI service ready ({status.get('model')}).")
+        elif status.get("state") == "loading":
+            _set_ai_status("🔄 AI service is loading the model — using the smart planner meanwhile.")
+        else:
+            _set_ai_status("⚠️ AI model unavailable — using the smart planner.")
 
-        if model and tokenizer:
-            ai_status_var.set("✅ AI model is ready.")
-            generate_ai_tasks_button.config(state=NORMAL)
+    def refresh_service_status():
+        """Poll the service's state and memory in the background while this screen is shown."""
+        if not service_status_label.winfo_exists():
             return
 
-        ai_status_var.set("🔄 Loading AI model...")
-        try:
-            if not os.path.exists(MODEL_PATH):
-                ai_status_var.set(f"❌ Model not found at '{MODEL_PATH}'.")
-                messagebox.showwarning("AI Model Not Found", f"The model cache was not found at '{MODEL_PATH}'.\nPlease run `download_model.py` first.")
-                return
+        def poll():
+            try:
+                line = describe_status(ai_client.status())
+            except (InferenceUnavailable, InferenceError):
+                line = "AI service offline"
+            ui.post_latest("service_status", service_status_var.set, line)
 
-            tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH, local_files_only=True)
-            model = AutoModelForCausalLM.from_pretrained(MODEL_PATH, local_files_only=True)
-            ai_status_var.set("✅ AI model is ready.")
-            generate_ai_tasks_button.config(state=NORMAL)
-        except Exception as e:
-            ai_status_var.set("❌ Error loading AI model.")
-            messagebox.showerror("AI Model Error", f"Failed to load the local AI model:\n{e}")
+        threading.Thread(target=poll, daemon=True).start()
+        parent_frame.after(SERVICE_STATUS_REFRESH_MS, refresh_service_status)
 
     def generate_tasks_threaded():
         """Generates tasks in a thread to keep UI responsive."""
@@ -159,101 +90,85 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
         if not goal_title:
             messagebox.showwarning("Input Needed", "Please provide a Goal Title to generate tasks.")
             return
-        
+
+        # Disable right away (not via the dispatcher) so a quick second click cannot start another run
+        generate_ai_tasks_button.config(state=DISABLED)
         threading.Thread(target=generate_tasks, args=(goal_title, goal_desc)).start()
 
     def generate_tasks(goal_title, goal_desc):
-        """Uses the AI model to generate tasks."""
-        if not model or not tokenizer:
-            ai_status_var.set("❌ AI model not loaded.")
-            return
+        """Stream tasks from the AI service into the list, falling back to the smart planner when it is down or unhelpful.
 
-        ai_status_var.set("⏳ Generating tasks...")
-        generate_ai_tasks_button.config(state=DISABLED)
-        ai_tasks_listbox.delete(0, END)
+        Generation stops on Cancel, after GENERATION_DEADLINE_SEC, or once enough tasks are parsed.
+        """
+        cancel_generation.clear()
+        deadline = time.monotonic() + GENERATION_DEADLINE_SEC
+        ui.post_latest("ai_status", ai_status_var.set, "⏳ Generating tasks...")
+        ui.post(generate_ai_tasks_button.config, state=DISABLED)
+        ui.post(cancel_ai_tasks_button.config, state=NORMAL)
+        ui.post(ai_tasks_listbox.delete, 0, END)
+
+        def stop_requested():
+            return cancel_generation.is_set() or time.monotonic() >= deadline
 
         try:
-            # 1) Try deterministic smart planner first for relevance and brevity
-            planner_tasks = _build_rule_based_plan(goal_title, goal_desc)
-            if planner_tasks:
-                for task in planner_tasks:
-                    ai_tasks_listbox.insert(END, task)
-                ai_status_var.set(f"✅ Generated {len(planner_tasks)} tasks (smart planner).")
-                return
+            tasks, source = [], "smart planner"
+            cache = get_plan_cache()
+            model_id = ai_client.model_id()
+            cached = cache.get(goal_title, goal_desc, model_id, GOAL_PROMPT_PARAMS) if cache else None
+            if cached:
+                tasks, source = cached, "AI service, cached"
+                for task in tasks:
+                    ui.post(ai_tasks_listbox.insert, END, task)
+            else:
+                # Each task appears as soon as its line is complete; stop once there are enough
+                parser = TaskStreamParser(max_tasks=GOAL_PROMPT_PARAMS["max_tasks"])
+
+                def show_task(task):
+                    ui.post(ai_tasks_listbox.insert, END, task)
+                    ui.post_latest("ai_status", ai_status_var.set,
+                                   f"⏳ Generating tasks... ({len(parser.tasks)} so far)")
+
+                try:
+                    stream = ai_client.stream(
+                        goal_prompt(goal_title, goal_desc), prefix=GOAL_PROMPT_PREFIX, should_stop=stop_requested,
+                        deadline_sec=GENERATION_DEADLINE_SEC, max_new_tokens=GOAL_PROMPT_PARAMS["max_new_tokens"],
+                        **task_list_params(GOAL_PROMPT_PARAMS["max_tasks"]),
+                    )
+                    tasks, source = collect_streamed_tasks(stream, parser, show_task, stop_requested), "AI service"
+                    if cancel_generation.is_set():
+                        ui.post_latest("ai_status", ai_status_var.set,
+                                       f"⏹ Generation cancelled ({len(tasks)} tasks kept).")
+                        return
+                    if stop_requested() and not parser.done:
+                        print(f"AI generation hit the {GENERATION_DEADLINE_SEC:.0f}s deadline with {len(tasks)} tasks.")
+                        if len(tasks) < MIN_USEFUL_TASKS:
+                            tasks = []
+                    elif cache and tasks:
+                        cache.put(goal_title, goal_desc, ai_client.model_id(), GOAL_PROMPT_PARAMS, tasks)
+                except (InferenceUnavailable, InferenceError) as e:
+                    print(f"AI service unavailable, using the smart planner: {e}")
+                    tasks = []
+            if not tasks:
+                # Deterministic planner: always relevant and brief
+                tasks, source = build_rule_based_plan(goal_title, goal_desc), "smart planner"
+                ui.post(ai_tasks_listbox.delete, 0, END)
+                for task in tasks:
+                    ui.post(ai_tasks_listbox.insert, END, task)
 
-            # 2) Fallback to the offline model if planner yields nothing
-            # A much simpler and more direct prompt to avoid confusing the small model.
-            # It no longer contains a complex example that the model might copy.
-            prompt = (
-                "Create a short, numbered list of tasks for the following goal. "
-                "Base the tasks ONLY on the Goal and Description provided.\n"
-                f"Goal: {goal_title}\n"
-                f"Description: {goal_desc}\n\n"
-                "Tasks:\n1."
-            )
-            inputs = tokenizer(prompt, return_tensors="pt")
-            outputs = model.generate(
-                **inputs,
-                max_new_tokens=100,
-                num_return_sequences=1,
-                no_repeat_ngram_size=2,
-                temperature=0.7,
-                top_k=50,
-                top_p=0.95,
-                pad_token_id=tokenizer.eos_token_id
-            )
-            generated_text = tokenizer.decode(outputs[0], skip_special_tokens=True)
-            
-            tasks = parse_generated_tasks(generated_text)
-            
             if tasks:
-                for task in tasks:
-                    ai_tasks_listbox.insert(END, task)
-                ai_status_var.set(f"✅ Generated {len(tasks)} tasks.")
+                ui.post_latest("ai_status", ai_status_var.set, f"✅ Generated {len(tasks)} tasks ({source}).")
             else:
-                ai_status_var.set("⚠️ No tasks generated. Try a different goal.")
+                ui.post_latest("ai_status", ai_status_var.set, "⚠️ No tasks generated. Try a different goal.")
         except Exception as e:
-            ai_status_var.set("❌ Task generation failed.")
-            messagebox.showerror("AI Generation Error", f"An error occurred: {e}")
+            ui.post_latest("ai_status", ai_status_var.set, "❌ Task generation failed.")
+            ui.post(messagebox.showerror, "AI Generation Error", f"An error occurred: {e}")
         finally:
-            generate_ai_tasks_button.config(state=NORMAL)
+            ui.post(generate_ai_tasks_button.config, state=NORMAL)
+            ui.post(cancel_ai_tasks_button.config, state=DISABLED)
 
-    def parse_generated_tasks(text: str) -> list:
-        """
-        Parses the raw model output to extract a clean list of tasks,
-        enforcing a word limit and filtering out irrelevant content.
-        """
-        # Find the 'Tasks:' section and work from there.
-        plan_section_match = re.search(r"Tasks:(.*)", text, re.DOTALL)
-        if not plan_section_match:
-            return []
-        
-        plan_section = plan_section_match.group(1)
-        
-        # Extract numbered list items.
-        raw_tasks = re.findall(r"\d+\.\s*(.+)", plan_section)
-        
-        cleaned_tasks = []
-        # Keywords to filter out irrelevant, example-based responses.
-        filter_keywords = ['python', 'numpy', 'pandas', 'matplotlib', 'data analysis', 'skill']
-
-        for task in raw_tasks:
-            task_lower = task.lower()
-            # 1. Filter out tasks that contain keywords from the old, irrelevant examples.
-            if any(keyword in task_lower for keyword in filter_keywords):
-                continue
-
-            # 2. Truncate to 10 words to keep tasks concise.
-            words = task.strip().split()
-            if len(words) > 10:
-                task = ' '.join(words[:10]) + '...'
-            else:
-                task = ' '.join(words)
-            
-            if task:
-                cleaned_tasks.append(task)
-                
-        return cleaned_tasks
+    def cancel_generation_clicked():
+        cancel_generation.set()
+        ai_status_var.set("⏹ Cancelling...")
 
     # --- End AI Model Handling ---
 
@@ -336,11 +251,19 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
     ai_frame = Frame(form_container, bg="#ffffff")
     ai_frame.pack(pady=10, padx=16, fill=X)
 
-    generate_ai_tasks_button = ttk.Button(ai_frame, text="🤖 Generate Tasks with AI", command=generate_tasks_threaded, state=DISABLED)
-    generate_ai_tasks_button.pack(pady=(5, 10))
+    ai_buttons = Frame(ai_frame, bg="#ffffff")
+    ai_buttons.pack(pady=(5, 10))
+    generate_ai_tasks_button = ttk.Button(ai_buttons, text="🤖 Generate Tasks with AI", command=generate_tasks_threaded)
+    generate_ai_tasks_button.pack(side=LEFT, padx=(0, 6))
+    cancel_ai_tasks_button = ttk.Button(ai_buttons, text="⏹ Cancel", command=cancel_generation_clicked, state=DISABLED)
+    cancel_ai_tasks_button.pack(side=LEFT)
 
     ai_status_label = Label(ai_frame, textvariable=ai_status_var, font=("Segoe UI", 9), bg="#ffffff", fg="#555")
     ai_status_label.pack()
+    service_status_var = StringVar(value="")
+    service_status_label = Label(ai_frame, textvariable=service_status_var, font=("Segoe UI", 8), bg="#ffffff",
+                                 fg="#888")
+    service_status_label.pack()
 
     ai_tasks_listbox = Listbox(ai_frame, height=6, font=("Segoe UI", 10), relief="solid", bd=1)
     ai_tasks_listbox.pack(fill=X, expand=True, pady=(5, 10))
@@ -360,8 +283,8 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
         if not conn: return
         try:
             cursor = conn.cursor()
-            for task_desc in tasks_to_save:
-                cursor.execute("INSERT INTO goal_tasks (goal_id, task_description) VALUES (%s, %s)", (goal_id, task_desc))
+            cursor.executemany("INSERT INTO goal_tasks (goal_id, task_description) VALUES (%s, %s)",
+                               [(goal_id, task_desc) for task_desc in tasks_to_save])
             conn.commit()
             messagebox.showinfo("Success", f"{len(tasks_to_save)} AI-generated tasks have been saved for this goal.")
             ai_tasks_listbox.delete(0, END)
@@ -372,6 +295,100 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
             if conn: conn.close()
 
     ttk.Button(ai_frame, text="💾 Save Generated Tasks", command=save_generated_tasks).pack(pady=5)
+
+    def plan_all_unplanned_goals():
+        """Plan every goal without sub-tasks in one background run (batched model calls, one DB transaction)."""
+        if not messagebox.askyesno("Plan All Goals", "Generate and save sub-tasks for every goal that has none?"):
+            return
+        plan_all_button.config(state=DISABLED)
+
+        def progress(done, total):
+            ui.post_latest("ai_status", ai_status_var.set, f"⏳ Planning goals... {done}/{total}")
+
+        def run():
+            try:
+                summary = plan_all_unplanned(connect_db, on_progress=progress, client=ai_client)
+                ui.post_latest("ai_status", ai_status_var.set,
+                               f"✅ Planned {summary['goals']} goals ({summary['goals_per_sec']} goals/s).")
+                ui.post(messagebox.showinfo, "Plan All Goals",
+                       f"Saved {summary['tasks']} tasks for {summary['goals']} goals in {summary['seconds']}s.\n"
+                       f"AI: {summary['model']}, cached: {summary['cached']}, similar goals: {summary['similar']}, "
+                       f"planner: {summary['planner']}")
+            except Exception as e:
+                ui.post_latest("ai_status", ai_status_var.set, "❌ Batch planning failed.")
+                ui.post(messagebox.showerror, "Plan All Goals", f"Batch planning failed: {e}")
+            finally:
+                ui.post(plan_all_button.config, state=NORMAL)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    plan_all_button = ttk.Button(ai_frame, text="🗂️ Plan All Unplanned Goals", command=plan_all_unplanned_goals)
+    plan_all_button.pack(pady=5)
+
+    def find_similar_plans():
+        """Offer the task lists of the most similar past goals (TF-IDF index, no model involved)."""
+        goal_title = title_entry.get().strip()
+        goal_desc = desc_text.get("1.0", END).strip()
+        if not goal_title:
+            messagebox.showwarning("Input Needed", "Please provide a Goal Title to look for similar goals.")
+            return
+        exclude = int(selected_goal_id.get()) if selected_goal_id.get() else None
+        ai_status_var.set("🔎 Looking for similar goals...")
+
+        def run():
+            try:
+                suggestions = suggest_plans(connect_db, goal_title, goal_desc, exclude=exclude)
+            except Exception as e:
+                ui.post_latest("ai_status", ai_status_var.set, "❌ Similar-goal search failed.")
+                print(f"Similar-goal search failed: {e}")
+                return
+            ui.post(show_similar_plans, suggestions)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def show_similar_plans(suggestions):
+        if not suggestions:
+            if peek_goal_index() is None:
+                ai_status_var.set("⚠️ Similar-goal search is unavailable (needs NumPy and the database).")
+            else:
+                ai_status_var.set("No similar goals with tasks found.")
+            return
+        ai_status_var.set(f"🔎 Found {len(suggestions)} similar goal(s).")
+        dialog = Toplevel(parent_frame)
+        dialog.title("Plans from Similar Goals")
+        dialog.geometry("520x360")
+        dialog.transient(parent_frame.winfo_toplevel())
+
+        matches = Listbox(dialog, height=len(suggestions), font=("Segoe UI", 10), exportselection=False)
+        matches.pack(fill=X, padx=10, pady=(10, 6))
+        for _, title, score, tasks in suggestions:
+            matches.insert(END, f"{title} — {score:.0%} match ({len(tasks)} tasks)")
+        preview = Listbox(dialog, font=("Segoe UI", 10))
+        preview.pack(fill=BOTH, expand=True, padx=10)
+
+        def on_select(_=None):
+            preview.delete(0, END)
+            if matches.curselection():
+                for task in suggestions[matches.curselection()[0]][3]:
+                    preview.insert(END, task)
+
+        def use_plan():
+            if not matches.curselection():
+                return
+            _, title, _, tasks = suggestions[matches.curselection()[0]]
+            ai_tasks_listbox.delete(0, END)
+            for task in tasks:
+                ai_tasks_listbox.insert(END, task)
+            ai_status_var.set(f"📋 Plan copied from '{title}' — review it, then save.")
+            dialog.destroy()
+
+        matches.bind("<<ListboxSelect>>", on_select)
+        matches.bind("<Double-1>", lambda _: use_plan())
+        matches.selection_set(0)
+        on_select()
+        ttk.Button(dialog, text="📋 Use This Plan", command=use_plan).pack(pady=8)
+
+    ttk.Button(ai_frame, text="🔎 Reuse Plan from Similar Goal", command=find_similar_plans).pack(pady=5)
     # --- End AI Task Generation UI ---
 
     info_var = StringVar(value="")
@@ -453,6 +470,10 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
                     (title, description, target_date, status)
                 )
             conn.commit()
+            # Keep the similar-goal index current without rebuilding it
+            index = peek_goal_index()
+            if index is not None:
+                index.add(int(goal_id or cursor.lastrowid), title, description)
             info_var.set("Goal saved successfully!")
             clear_form()
             refresh_table()
@@ -469,7 +490,7 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
         
         # Clear AI tasks when a new goal is selected
         ai_tasks_listbox.delete(0, END)
-        ai_status_var.set("✅ AI model is ready.")
+        ai_status_var.set(ai_state["message"])
 
         item_values = tree.item(selected_item, "values")
         goal_id = item_values[0]
@@ -507,6 +528,9 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
             cursor = conn.cursor()
             cursor.execute("DELETE FROM goals WHERE id = %s", (goal_id,))
             conn.commit()
+            index = peek_goal_index()
+            if index is not None:
+                index.remove(int(goal_id))
             messagebox.showinfo("Success", "Goal deleted successfully.")
             clear_form()
             refresh_table()
@@ -576,8 +600,11 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
     tree.bind("<<TreeviewSelect>>", on_row_select)
     tree.bind("<Double-1>", on_double_click)
 
-    # --- Load AI model in background ---
-    threading.Thread(target=load_model_offline, daemon=True).start()
+    # --- Connect to the shared AI service in background ---
+    threading.Thread(target=connect_ai_service, daemon=True).start()
+    parent_frame.after(SERVICE_STATUS_REFRESH_MS, refresh_service_status)
+    # Build the similar-goal index up front so the first search is fast and saves update it incrementally
+    threading.Thread(target=get_goal_index, args=(connect_db,), daemon=True).start()
     # ---
 
     def show_single_goal_view(goal_id):
@@ -611,7 +638,7 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
 
         nav_frame = Frame(parent_frame, bg="#f8f9fc")
         nav_frame.pack(fill=X, padx=20, pady=(0, 10))
-        Button(nav_frame, text="⬅️ Back to All Goals", command=lambda: show_goals(parent_frame, connect_db, go_back), bg="#34495e", fg="white", font=("Segoe UI", 10), relief="flat", padx=10, pady=4).pack(side=LEFT)
+        Button(nav_frame, text="⬅️ Back to All Goals", command=lambda: leave_view(), bg="#34495e", fg="white", font=("Segoe UI", 10), relief="flat", padx=10, pady=4).pack(side=LEFT)
 
         main_container = Frame(parent_frame, bg="#f8f9fc")
         main_container.pack(fill=BOTH, expand=True, padx=20, pady=10)
@@ -640,42 +667,101 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
         tasks_frame.pack(fill=BOTH, expand=True, padx=10)
 
         sub_tasks = []
-
-        def update_progress():
-            completed_tasks = sum(1 for _, _, var in sub_tasks if var.get())
-            total_tasks = len(sub_tasks)
-            progress = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+        # Toggles are applied to the UI at once and written to the database in one debounced transaction
+        counts = {"completed": 0, "total": 0}
+        pending = {"toggles": {}, "progress": False, "job": None, "failed": False}
+
+        def goal_status(completed, total):
+            if total == 0:
+                return None
+            if completed == 0:
+                return "Not Started"
+            return "Achieved" if completed == total else "In Progress"
+
+        def current_progress():
+            total = counts["total"]
+            progress = (counts["completed"] / total * 100) if total > 0 else 0
+            return progress, goal_status(counts["completed"], total)
+
+        def show_progress():
+            progress, new_status = current_progress()
             progress_var.set(progress)
             progress_label.config(text=f"{progress:.0f}%")
+            if new_status is not None:
+                status_text_var.set(f"Status: {new_status}")
+            return progress, new_status
+
+        def flush_changes():
+            """Write pending toggles and the goal's progress/status with a single commit.
+
+            Returns False when the write failed; the changes stay pending and are retried.
+            """
+            if pending["job"] is not None:
+                parent_frame.after_cancel(pending["job"])
+                pending["job"] = None
+            toggles = pending["toggles"]
+            if not toggles and not pending["progress"]:
+                return True
+            # No widget access here: a flush may run after the user has left this view
+            progress, new_status = current_progress()
             try:
                 c = conn.cursor()
-                # Decide new status based on completion
-                new_status = None
-                if total_tasks > 0:
-                    if completed_tasks == 0:
-                        new_status = "Not Started"
-                    elif completed_tasks == total_tasks:
-                        new_status = "Achieved"
-                    else:
-                        new_status = "In Progress"
-
+                if toggles:
+                    c.executemany("UPDATE goal_tasks SET is_completed = %s WHERE id = %s",
+                                  [(done, task_id) for task_id, done in toggles.items()])
                 if new_status is not None:
                     c.execute("UPDATE goals SET progress = %s, status = %s WHERE id = %s", (progress, new_status, goal_id))
-                    status_text_var.set(f"Status: {new_status}")
                 else:
                     c.execute("UPDATE goals SET progress = %s WHERE id = %s", (progress, goal_id))
                 conn.commit()
+                pending["toggles"], pending["progress"], pending["failed"] = {}, False, False
+                return True
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to update progress: {e}")
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                if not pending["failed"]:
+                    pending["failed"] = True
+                    messagebox.showerror("Error", f"Failed to update sub-tasks, retrying in the background: {e}")
+                schedule_flush(TOGGLE_RETRY_MS)
+                return False
+
+        def schedule_flush(delay_ms=TOGGLE_FLUSH_MS):
+            if pending["job"] is not None:
+                parent_frame.after_cancel(pending["job"])
+            pending["job"] = parent_frame.after(delay_ms, flush_changes)
+
+        def confirm_discard():
+            """Flush once more; when that fails, ask before the pending changes are dropped."""
+            if flush_changes():
+                return True
+            count = len(pending["toggles"])
+            what = f"{count} sub-task change(s)" if count else "The goal's progress"
+            if not messagebox.askyesno("Unsaved Changes", f"{what} could not be saved. Leave anyway and discard it?"):
+                return False
+            if pending["job"] is not None:
+                parent_frame.after_cancel(pending["job"])
+                pending["job"] = None
+            pending["toggles"], pending["progress"] = {}, False
+            return True
 
         def toggle_task_completion(task_id, check_var):
+            done = bool(check_var.get())
+            counts["completed"] += 1 if done else -1
+            pending["toggles"][task_id] = done
+            pending["progress"] = True
+            show_progress()
+            schedule_flush()
+
+        def leave_view():
+            if not confirm_discard():
+                return
             try:
-                c = conn.cursor()
-                c.execute("UPDATE goal_tasks SET is_completed = %s WHERE id = %s", (check_var.get(), task_id))
-                conn.commit()
-                update_progress()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to update sub-task: {e}")
+                conn.close()
+            except Exception:
+                pass
+            show_goals(parent_frame, connect_db, go_back)
 
         def render_sub_tasks():
             for widget in tasks_frame.winfo_children():
@@ -690,7 +776,15 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
                     cb = ttk.Checkbutton(tasks_frame, text=task['task_description'], variable=var, command=lambda t_id=task['id'], v=var: toggle_task_completion(t_id, v))
                     cb.pack(anchor=W, padx=10)
                     sub_tasks.append((task['id'], task['task_description'], var))
-                update_progress()
+                counts["completed"] = sum(1 for task in tasks if task['is_completed'])
+                counts["total"] = len(tasks)
+                progress, new_status = show_progress()
+                # Only write when the stored values are stale (e.g. tasks were added elsewhere)
+                if round(progress, 2) != round(float(goal['progress'] or 0), 2) or (
+                        new_status is not None and new_status != goal['status']):
+                    pending["progress"] = True
+                    flush_changes()
+                    goal['progress'], goal['status'] = progress, new_status or goal['status']
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to fetch sub-tasks: {e}")
 
@@ -703,6 +797,8 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
             desc = new_task_entry.get().strip()
             if not desc:
                 return
+            if not flush_changes():   # the list is re-read from the database below
+                return
             try:
                 c = conn.cursor()
                 c.execute("INSERT INTO goal_tasks (goal_id, task_description) VALUES (%s, %s)", (goal_id, desc))
@@ -715,10 +811,5 @@ def show_goals(parent_frame: Frame, connect_db, go_back):
         ttk.Button(add_task_frame, text="Add Task", command=add_new_task).pack(side=LEFT, padx=5)
         
         render_sub_tasks()
-        
-        def on_close():
-            if conn:
-                conn.close()
-            parent_frame.destroy()
 
     refresh_table()
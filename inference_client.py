@@ -0,0 +1,221 @@
+# inference_client.py
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from model_manifest import MODEL_CACHE_DIR, ManifestError, verify_manifest
+
+# --- Inference Service Configuration ---
+# The service listens on localhost only; override with LM_INFER_HOST / LM_INFER_PORT.
+DEFAULT_HOST = os.getenv("LM_INFER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.getenv("LM_INFER_PORT", "8765"))
+CONNECT_TIMEOUT = 1.0
+GENERATE_TIMEOUT = 180.0
+STREAM_POLL_SEC = 0.1   # how often a waiting stream checks its cancel callback
+# Wall-clock budget per interactive generation; slower runs fall back to the rule-based planner
+GENERATION_DEADLINE_SEC = float(os.getenv("LM_INFER_DEADLINE_SEC", "20"))
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inference_server.py")
+SERVER_LOG = os.path.join(".", "model_cache", "inference_server.log")
+# An "unloaded" (idle) service reloads its model on the next request, so it counts as usable
+USABLE_STATES = ("ready", "unloaded")
+STATE_LABELS = {
+    "loading": "loading the model",
+    "ready": "ready",
+    "unloaded": "unloaded while idle (reloads on next use)",
+    "error": "model unavailable",
+}
+
+
+class InferenceUnavailable(ConnectionError):
+    """The inference service is not running or did not answer."""
+
+
+class InferenceError(RuntimeError):
+    """The inference service answered with an error (model missing, queue full, ...)."""
+
+
+class InferenceClient:
+    """Client for the local inference service: one JSON object per line each way."""
+
+    def __init__(self, host: str = None, port: int = None, timeout: float = GENERATE_TIMEOUT):
+        self.host = host or DEFAULT_HOST
+        self.port = int(port or DEFAULT_PORT)
+        self.timeout = timeout
+        self.last_status = {}
+
+    def request(self, payload: dict, timeout: float = None) -> dict:
+        """Send one request and return the decoded reply (raises InferenceUnavailable when down)."""
+        try:
+            with socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT) as sock:
+                sock.settimeout(timeout or self.timeout)
+                sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+                with sock.makefile("r", encoding="utf-8") as reader:
+                    line = reader.readline()
+        except OSError as e:
+            raise InferenceUnavailable(f"Inference service unreachable at {self.host}:{self.port}: {e}") from e
+        if not line:
+            raise InferenceUnavailable("Inference service closed the connection.")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise InferenceError(reply.get("error") or "Unknown inference error")
+        return reply
+
+    def status(self) -> dict:
+        """Service status: model name/id, state ('loading', 'ready', 'unloaded', 'error'), memory, counters."""
+        self.last_status = self.request({"op": "status"}, timeout=CONNECT_TIMEOUT * 5)
+        return self.last_status
+
+    def is_ready(self) -> bool:
+        try:
+            return self.status().get("state") in USABLE_STATES
+        except (InferenceUnavailable, InferenceError):
+            return False
+
+    def model_id(self):
+        """Identity of the service's loaded model (from the last status, refreshed when unknown)."""
+        if not self.last_status.get("model_id"):
+            try:
+                self.status()
+            except (InferenceUnavailable, InferenceError):
+                return None
+        return self.last_status.get("model_id")
+
+    def generate(self, prompt: str, prefix: str = None, **params) -> str:
+        """Generate text for ``prompt``; ``params`` override the service's sampling defaults.
+
+        ``prefix`` marks the constant start of ``prompt``; the service encodes it once and reuses it.
+        """
+        reply = self.request({"op": "generate", "prompt": prompt, "prefix": prefix, "params": params})
+        if reply.get("model_id"):
+            self.last_status["model_id"] = reply["model_id"]
+        return reply["text"]
+
+    def generate_batch(self, prompts, **params) -> list:
+        """Generate for several prompts in one padded batch; texts come back in prompt order."""
+        reply = self.request({"op": "generate_batch", "prompts": list(prompts), "params": params},
+                             timeout=self.timeout * 2)
+        if reply.get("model_id"):
+            self.last_status["model_id"] = reply["model_id"]
+        return reply["texts"]
+
+    def stream(self, prompt: str, prefix: str = None, should_stop=None, deadline_sec: float = None, **params):
+        """Yield generated text chunks (prompt excluded) as the model produces them.
+
+        Stop iterating (or close the generator) to cancel the rest of the generation.
+        ``should_stop()`` is polled while waiting, so a cancel button takes effect even
+        before the first chunk; ``deadline_sec`` makes the service stop generating on time.
+        """
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=CONNECT_TIMEOUT)
+        except OSError as e:
+            raise InferenceUnavailable(f"Inference service unreachable at {self.host}:{self.port}: {e}") from e
+        with sock:
+            payload = {"op": "generate_stream", "prompt": prompt, "prefix": prefix, "params": params,
+                       "deadline_sec": deadline_sec}
+            sock.sendall((json.dumps(payload) + "\n").encode("utf-8"))
+            sock.settimeout(STREAM_POLL_SEC if should_stop else self.timeout)
+            buffer, last_data = b"", time.monotonic()
+            while True:
+                if should_stop and should_stop():
+                    return
+                line, sep, rest = buffer.partition(b"\n")
+                if not sep:
+                    try:
+                        data = sock.recv(65536)
+                    except socket.timeout:
+                        if time.monotonic() - last_data > self.timeout:
+                            raise InferenceUnavailable("Timed out waiting for the inference service.")
+                        continue
+                    except OSError as e:
+                        raise InferenceUnavailable(f"Inference stream interrupted: {e}") from e
+                    if not data:
+                        raise InferenceUnavailable("Inference service closed the connection.")
+                    buffer, last_data = buffer + data, time.monotonic()
+                    continue
+                buffer = rest
+                reply = json.loads(line)
+                if not reply.get("ok"):
+                    raise InferenceError(reply.get("error") or "Unknown inference error")
+                if "delta" not in reply:
+                    if reply.get("model_id"):
+                        self.last_status["model_id"] = reply["model_id"]
+                    return
+                yield reply["delta"]
+
+    def shutdown(self):
+        return self.request({"op": "shutdown"}, timeout=CONNECT_TIMEOUT * 5)
+
+
+def describe_status(status: dict) -> str:
+    """One status line: model, backend, load state, memory and threads."""
+    state = status.get("state") or "unknown"
+    parts = [f"{status.get('model')} ({status.get('backend') or '-'})", STATE_LABELS.get(state, state)]
+    if status.get("model_mb"):
+        parts.append(f"model {status['model_mb']:.0f} MB")
+    if status.get("rss_mb"):
+        budget = f" of {status['mem_budget_mb']} MB" if status.get("mem_budget_mb") else ""
+        parts.append(f"process {status['rss_mb']:.0f} MB{budget}")
+    if (status.get("workers") or 1) > 1:
+        parts.append(f"{status['workers']} worker processes")
+    if status.get("threads"):
+        parts.append(f"{status['threads']} threads")
+    return " · ".join(parts)
+
+
+def spawn_server():
+    """Start the inference service as a detached background process."""
+    os.makedirs(os.path.dirname(SERVER_LOG), exist_ok=True)
+    log = open(SERVER_LOG, "a", encoding="utf-8")
+    kwargs = {"stdout": log, "stderr": subprocess.STDOUT, "stdin": subprocess.DEVNULL, "close_fds": True}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    try:
+        return subprocess.Popen([sys.executable, SERVER_SCRIPT], **kwargs)
+    finally:
+        log.close()
+
+
+def ensure_server(client: InferenceClient = None, wait_sec: float = 5.0) -> dict:
+    """Return the service status, starting the service first if nothing is listening.
+
+    Waits up to ``wait_sec`` for the new process to accept connections; the model
+    may still be loading afterwards (state 'loading'). A model cache that does not
+    match its manifest raises InferenceError instead of starting a doomed service.
+    """
+    client = client or InferenceClient()
+    try:
+        return client.status()
+    except InferenceUnavailable:
+        pass
+    if os.path.isdir(MODEL_CACHE_DIR):
+        try:
+            verify_manifest(MODEL_CACHE_DIR)   # stats only; hashes just the files whose mtime changed
+        except ManifestError as e:
+            raise InferenceError(str(e)) from e
+    spawn_server()
+    deadline = time.monotonic() + wait_sec
+    while True:
+        try:
+            return client.status()
+        except InferenceUnavailable:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.2)
+
+
+if __name__ == "__main__":
+    # Quick check: python inference_client.py [prompt]
+    c = InferenceClient()
+    try:
+        print(json.dumps(c.status(), indent=2))
+        print(describe_status(c.last_status))
+        if len(sys.argv) > 1:
+            print(c.generate(" ".join(sys.argv[1:])))
+    except (InferenceUnavailable, InferenceError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -0,0 +1,98 @@
+# inference_resources.py
+import os
+import sys
+
+# Optional: psutil gives RSS on every platform; without it /proc is read (Linux only)
+try:
+    import psutil
+    _PSUTIL_AVAILABLE = True
+except ImportError:
+    psutil = None
+    _PSUTIL_AVAILABLE = False
+
+# --- Inference Resource Configuration ---
+# Torch intra-op threads. The default leaves one core to the Tk apps, which share the machine.
+INFER_THREADS = int(os.getenv("LM_INFER_THREADS", "0") or 0)
+# CPUs the inference service may run on, e.g. "2-5" or "0,2" (empty: no pinning; Linux only)
+INFER_AFFINITY = os.getenv("LM_INFER_AFFINITY", "")
+# Memory budget in MB (0: none). Used to pick a backend that fits and to drop prefix KV caches
+# when the process grows past it.
+MEM_BUDGET_MB = int(os.getenv("LM_INFER_MEM_MB", "0") or 0)
+# Model processes of the inference service; each holds its own copy of the model
+INFER_WORKERS = max(1, int(os.getenv("LM_INFER_WORKERS", "1") or 1))
+# The model is unloaded after this many idle seconds (0: never) and reloaded by the next request
+IDLE_UNLOAD_SEC = float(os.getenv("LM_INFER_IDLE_SEC", "900") or 0)
+
+
+def parse_cpu_list(spec: str) -> set:
+    """CPU ids of a list such as "0-2,5" (empty set for an empty spec)."""
+    cpus = set()
+    for part in (spec or "").replace(" ", "").split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def apply_limits(torch_module=None, threads: int = INFER_THREADS, affinity: str = INFER_AFFINITY) -> dict:
+    """Pin this process to ``affinity`` and cap torch's threads; returns what was applied.
+
+    Call once, before the model runs its first forward pass.
+    """
+    cpus = None
+    if affinity:
+        if not hasattr(os, "sched_setaffinity"):
+            print(f"⚠️ LM_INFER_AFFINITY is not supported on {sys.platform}; ignoring it.")
+        else:
+            try:
+                os.sched_setaffinity(0, parse_cpu_list(affinity))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not apply CPU affinity '{affinity}': {e}")
+    if hasattr(os, "sched_getaffinity"):
+        cpus = sorted(os.sched_getaffinity(0))
+    available = len(cpus) if cpus else (os.cpu_count() or 1)
+    threads = threads or max(1, available - 1)
+    if torch_module is not None:
+        torch_module.set_num_threads(threads)
+        try:
+            torch_module.set_num_interop_threads(1)   # one request at a time: no inter-op parallelism needed
+        except RuntimeError:
+            pass   # already fixed once torch has run parallel work
+    return {"threads": threads, "cpus": cpus}
+
+
+def model_memory_mb(model) -> float:
+    """Memory held by the model's weights and buffers (None when not a torch module)."""
+    state_dict = getattr(model, "state_dict", None)
+    if state_dict is None or not hasattr(model, "parameters"):
+        return None
+    total = 0
+    for value in state_dict().values():
+        # Quantized layers keep packed (weight, bias) tuples instead of plain tensors
+        for tensor in value if isinstance(value, (tuple, list)) else (value,):
+            if hasattr(tensor, "element_size"):
+                try:
+                    total += tensor.numel() * tensor.element_size()
+                except RuntimeError:
+                    pass   # opaque packed tensors without a size
+    return round(total / 2 ** 20, 1)
+
+
+def process_rss_mb() -> float:
+    """Resident memory of this process in MB, or None when it cannot be read."""
+    if _PSUTIL_AVAILABLE:
+        return round(psutil.Process().memory_info().rss / 2 ** 20, 1)
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def over_budget(budget_mb: int = MEM_BUDGET_MB) -> bool:
+    rss = process_rss_mb()
+    return bool(budget_mb) and rss is not None and rss > budget_mb
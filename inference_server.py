@@ -0,0 +1,543 @@
+# inference_server.py
+import gc
+import json
+import multiprocessing
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from inference_client import DEFAULT_HOST, DEFAULT_PORT, GENERATE_TIMEOUT
+from inference_resources import (IDLE_UNLOAD_SEC, INFER_WORKERS, MEM_BUDGET_MB, apply_limits, model_memory_mb,
+                                 over_budget, process_rss_mb)
+from model_manifest import verify_manifest
+from model_runtime import (MODEL_NAME, MODEL_PATH, PrefixCache, artifact_path, generate_batch, generate_text,
+                           load_model, model_fingerprint, release_grammars, select_backend, stream_text, torch,
+                           warm_up)
+from task_parsing import GOAL_PROMPT_PREFIX, goal_prompt
+
+# --- Service Configuration ---
+MAX_QUEUED_REQUESTS = 16   # further generate requests are rejected until the queue drains
+MAX_BATCH_PROMPTS = 16     # prompts per generate_batch request (one padded forward pass per step)
+IDLE_CHECK_SEC = 5.0       # how often an idle worker checks whether to unload the model
+STATUS_REPORT_SEC = 2.0    # how often pool worker processes report their status
+CANCEL_SLOTS = 1024        # ring of cancelled job ids shared with pool worker processes
+
+
+class ModelWorker:
+    """Owns the model and runs queued generate requests one at a time on its own thread.
+
+    The model is loaded at startup; requests arriving while it loads wait in
+    the queue, so clients never race on the model. After IDLE_UNLOAD_SEC without
+    requests the model is unloaded ("unloaded") and the next request loads it again.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH):
+        self.model_path = model_path
+        self.model = None
+        self.tokenizer = None
+        self.backend = None
+        self.model_id = None
+        self.prefix_cache = None
+        self.warmup_sec = None
+        self.model_mb = None
+        self.limits = {}
+        self.state = "loading"
+        self.error = None
+        self.busy = False
+        self.served = 0
+        self.failed = 0
+        self.loads = 0
+        self.unloads = 0
+        self.started_at = time.time()
+        self.last_used = time.monotonic()
+        self.jobs = queue.Queue(maxsize=MAX_QUEUED_REQUESTS)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _load(self):
+        t0 = time.perf_counter()
+        self.state = "loading"
+        try:
+            self.backend = select_backend(self.model_path, max_mb=MEM_BUDGET_MB or None)
+            # Cheap: stats the files and hashes only those whose mtime changed since the download
+            for directory in {self.model_path, artifact_path(self.backend, self.model_path)}:
+                if os.path.isdir(directory):
+                    verify_manifest(directory)
+            self.model, self.tokenizer = load_model(self.model_path, self.backend)
+            self.model_id = model_fingerprint(self.model_path, self.backend)
+            self.prefix_cache = PrefixCache(self.model, self.tokenizer)
+            self.model_mb = model_memory_mb(self.model)
+            self.loads += 1
+            print(f"✅ Model '{MODEL_NAME}' ({self.backend}) loaded in {time.perf_counter() - t0:.1f}s")
+            if MEM_BUDGET_MB and self.model_mb and self.model_mb > MEM_BUDGET_MB:
+                print(f"⚠️ The model alone takes {self.model_mb:.0f} MB, over the {MEM_BUDGET_MB} MB budget.")
+        except Exception as e:
+            self.state, self.error = "error", str(e)
+            print(f"❌ Failed to load model: {e}")
+            return
+        try:
+            # Pay lazy initialization and encode the goal prompt prefix before the first client does
+            self.warmup_sec = round(warm_up(self.model, self.tokenizer, self.prefix_cache,
+                                            [(GOAL_PROMPT_PREFIX, goal_prompt("Learn Excel", ""))]), 2)
+        except Exception as e:
+            print(f"⚠️ Warm-up failed (continuing without it): {e}")
+        self.state = "ready"
+
+    def _unload(self):
+        """Free the model and its caches; the next request loads it again."""
+        self.model = self.tokenizer = self.prefix_cache = None
+        self.model_mb = None
+        release_grammars()
+        gc.collect()
+        self.state = "unloaded"
+        self.unloads += 1
+        print(f"💤 Model unloaded after {IDLE_UNLOAD_SEC:.0f}s idle (process now {process_rss_mb()} MB)")
+
+    def _run(self):
+        # Before the first forward pass: thread and CPU limits cannot be changed reliably afterwards
+        self.limits = apply_limits(torch)
+        self._load()
+        while True:
+            try:
+                job = self.jobs.get(timeout=IDLE_CHECK_SEC)
+            except queue.Empty:
+                if self.state == "ready" and IDLE_UNLOAD_SEC and time.monotonic() - self.last_used >= IDLE_UNLOAD_SEC:
+                    self._unload()
+                continue
+            if job is None:
+                return
+            if self.state == "unloaded":
+                self._load()   # queued requests wait for the reload
+            if self.state != "ready":
+                job["reply"].put({"ok": False, "error": self.error or "Model is not loaded"})
+                continue
+            if job["cancel"].is_set():
+                continue   # the client left (or timed out) while the job was queued
+            if _stop_reason(job) == "deadline":
+                job["reply"].put({"ok": False, "error": "Deadline passed before generation started"})
+                continue
+
+            def should_stop(job=job):
+                return _stop_reason(job) is not None
+
+            self.busy = True
+            try:
+                if job.get("stream"):
+                    text = stream_text(
+                        self.model, self.tokenizer, job["prompt"],
+                        lambda chunk: job["reply"].put({"ok": True, "delta": chunk}),
+                        should_stop, self.prefix_cache, job.get("prefix"), **job["params"],
+                    )
+                    reply = {"ok": True, "text": text}
+                elif job.get("prompts"):
+                    reply = {"ok": True, "texts": generate_batch(self.model, self.tokenizer, job["prompts"],
+                                                                 **job["params"])}
+                else:
+                    reply = {"ok": True, "text": generate_text(self.model, self.tokenizer, job["prompt"],
+                                                               self.prefix_cache, job.get("prefix"), should_stop,
+                                                               **job["params"])}
+                reply["model_id"] = self.model_id
+                reply["stopped"] = _stop_reason(job)
+                job["reply"].put(reply)
+                self.served += len(job["prompts"]) if "prompts" in job else 1
+            except Exception as e:
+                self.failed += 1
+                job["reply"].put({"ok": False, "error": f"Generation failed: {e}"})
+            finally:
+                self.busy = False
+                self.last_used = time.monotonic()
+                if self.prefix_cache and over_budget():
+                    # Cached prefix KV tensors are the only memory the service can give back cheaply
+                    self.prefix_cache.clear()
+                    gc.collect()
+
+    def submit(self, prompt, params: dict, timeout: float = GENERATE_TIMEOUT, prefix: str = None,
+               deadline_sec: float = None) -> dict:
+        """Queue a generate request (one prompt, or a list for a batch) and wait for its reply.
+
+        ``prefix`` names the constant start of ``prompt`` whose KV cache may be reused;
+        ``deadline_sec`` bounds the wall-clock time from now, queueing included.
+        """
+        if self.state == "error":
+            return {"ok": False, "error": self.error}
+        reply = queue.Queue(maxsize=1)
+        job = {"params": params or {}, "reply": reply, "cancel": threading.Event(), "prefix": prefix,
+               "deadline": _deadline(deadline_sec)}
+        job["prompts" if isinstance(prompt, list) else "prompt"] = prompt
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            return {"ok": False, "error": "Inference queue is full, try again shortly"}
+        try:
+            return reply.get(timeout=timeout)
+        except queue.Empty:
+            job["cancel"].set()   # nobody waits for the result any more: skip or stop the job
+            return {"ok": False, "error": "Timed out waiting for the model"}
+
+    def stream(self, prompt: str, params: dict, timeout: float = GENERATE_TIMEOUT, prefix: str = None,
+               deadline_sec: float = None):
+        """Queue a streaming request and yield its replies: ``delta`` chunks, then the final ``text``.
+
+        Closing the generator early (client disconnected or has enough) cancels the generation.
+        """
+        if self.state == "error":
+            yield {"ok": False, "error": self.error}
+            return
+        job = {"prompt": prompt, "params": params or {}, "reply": queue.Queue(), "cancel": threading.Event(),
+               "stream": True, "prefix": prefix, "deadline": _deadline(deadline_sec)}
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            yield {"ok": False, "error": "Inference queue is full, try again shortly"}
+            return
+        try:
+            while True:
+                try:
+                    event = job["reply"].get(timeout=timeout)
+                except queue.Empty:
+                    yield {"ok": False, "error": "Timed out waiting for the model"}
+                    return
+                yield event
+                if "delta" not in event:
+                    return
+        finally:
+            job["cancel"].set()
+
+    def status(self) -> dict:
+        return {
+            "ok": True,
+            "model": MODEL_NAME,
+            "backend": self.backend,
+            "model_id": self.model_id,
+            "state": self.state,
+            "error": self.error,
+            "busy": self.busy,
+            "queued": self.jobs.qsize(),
+            "served": self.served,
+            "failed": self.failed,
+            "uptime_sec": round(time.time() - self.started_at, 1),
+            "warmup_sec": self.warmup_sec,
+            "prefix_cache": self.prefix_cache.stats() if self.prefix_cache else None,
+            "model_mb": self.model_mb,
+            "rss_mb": process_rss_mb(),
+            "mem_budget_mb": MEM_BUDGET_MB or None,
+            "threads": self.limits.get("threads"),
+            "cpus": self.limits.get("cpus"),
+            "idle_sec": round(time.monotonic() - self.last_used, 1),
+            "idle_unload_sec": IDLE_UNLOAD_SEC or None,
+            "loads": self.loads,
+            "unloads": self.unloads,
+            "workers": 1,
+            "pid": os.getpid(),
+        }
+
+    def stop(self):
+        try:
+            self.jobs.put_nowait(None)
+        except queue.Full:
+            pass
+
+
+def _pool_worker_main(index: int, model_path: str, jobs, results, cancelled):
+    """Entry point of one pool process: a ModelWorker fed from the shared job queue."""
+    worker = ModelWorker(model_path)
+    worker.start()
+
+    def report():
+        while True:
+            results.put(("status", index, worker.status()))
+            time.sleep(STATUS_REPORT_SEC)
+
+    threading.Thread(target=report, daemon=True).start()
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        job_id = job["id"]
+        if cancelled[job_id % CANCEL_SLOTS] == job_id:
+            continue
+        deadline_sec = job["deadline_at"] - time.time() if job["deadline_at"] else None
+        if deadline_sec is not None and deadline_sec <= 0:
+            results.put(("reply", job_id, {"ok": False, "error": "Deadline passed before generation started"}))
+            continue
+        if job["stream"]:
+            events = worker.stream(job["prompt"], job["params"], prefix=job["prefix"], deadline_sec=deadline_sec)
+            try:
+                for event in events:
+                    results.put(("reply", job_id, event))
+                    if cancelled[job_id % CANCEL_SLOTS] == job_id:
+                        break   # client left; closing the stream stops generation
+            finally:
+                events.close()
+        else:
+            reply = worker.submit(job["prompt"], job["params"], job["timeout"], job["prefix"], deadline_sec)
+            results.put(("reply", job_id, reply))
+        results.put(("status", index, worker.status()))
+    worker.stop()
+
+
+class ProcessWorkerPool:
+    """N worker processes, each with its own model copy, behind the ModelWorker interface.
+
+    Jobs go to a shared queue that any idle process takes from, so concurrent
+    requests (batch planning, several open screens) run in parallel. At most
+    MAX_QUEUED_REQUESTS jobs wait beyond the ones running; further requests are
+    rejected. Every request gets a Future (or a stream queue) completed by a
+    collector thread reading the processes' results.
+    """
+
+    def __init__(self, n_workers: int, model_path: str = MODEL_PATH):
+        self.n_workers = n_workers
+        self.model_path = model_path
+        self.max_pending = MAX_QUEUED_REQUESTS + n_workers
+        ctx = multiprocessing.get_context("spawn")
+        self.jobs = ctx.Queue()
+        self.results = ctx.Queue()
+        self.cancelled = ctx.Array("q", CANCEL_SLOTS, lock=False)
+        self.processes = [
+            ctx.Process(target=_pool_worker_main, args=(i, model_path, self.jobs, self.results, self.cancelled),
+                        daemon=True)
+            for i in range(n_workers)
+        ]
+        self._statuses = [None] * n_workers
+        self._pending = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+
+    def start(self):
+        # Split the cores between the processes unless LM_INFER_THREADS says otherwise
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+        os.environ.setdefault("LM_INFER_THREADS", str(max(1, (cores - 1) // self.n_workers)))
+        for process in self.processes:
+            process.start()
+        self._collector.start()
+
+    def _collect(self):
+        while True:
+            item = self.results.get()
+            if item is None:
+                return
+            kind, key, payload = item
+            if kind == "status":
+                self._statuses[key] = payload
+                continue
+            with self._lock:
+                sink = self._pending.get(key)
+                if isinstance(sink, Future):
+                    del self._pending[key]
+            if isinstance(sink, Future):
+                sink.set_result(payload)
+            elif sink is not None:
+                sink.put(payload)
+
+    def _enqueue(self, prompt, params, prefix, deadline_sec, timeout, sink):
+        """Queue a job with ``sink`` for its replies; returns its id, or None when the pool is saturated."""
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                return None
+            self._next_id += 1
+            job_id = self._next_id
+            self._pending[job_id] = sink
+        self.jobs.put({
+            "id": job_id, "prompt": prompt, "params": params or {}, "prefix": prefix, "timeout": timeout,
+            "deadline_at": time.time() + float(deadline_sec) if deadline_sec else None,
+            "stream": not isinstance(sink, Future),
+        })
+        return job_id
+
+    def _forget(self, job_id: int):
+        """Drop a finished or abandoned job; a process still running it stops at its next token."""
+        self.cancelled[job_id % CANCEL_SLOTS] = job_id
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+    def _unusable(self):
+        statuses = [s for s in self._statuses if s]
+        if len(statuses) == self.n_workers and all(s["state"] == "error" for s in statuses):
+            return statuses[0].get("error") or "Model is not loaded"
+        return None
+
+    def submit(self, prompt, params: dict, timeout: float = GENERATE_TIMEOUT, prefix: str = None,
+               deadline_sec: float = None) -> dict:
+        error = self._unusable()
+        if error:
+            return {"ok": False, "error": error}
+        future = Future()
+        job_id = self._enqueue(prompt, params, prefix, deadline_sec, timeout, future)
+        if job_id is None:
+            return {"ok": False, "error": "Inference queue is full, try again shortly"}
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            self._forget(job_id)
+            return {"ok": False, "error": "Timed out waiting for the model"}
+
+    def stream(self, prompt: str, params: dict, timeout: float = GENERATE_TIMEOUT, prefix: str = None,
+               deadline_sec: float = None):
+        error = self._unusable()
+        if error:
+            yield {"ok": False, "error": error}
+            return
+        events = queue.Queue()
+        job_id = self._enqueue(prompt, params, prefix, deadline_sec, timeout, events)
+        if job_id is None:
+            yield {"ok": False, "error": "Inference queue is full, try again shortly"}
+            return
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=timeout)
+                except queue.Empty:
+                    yield {"ok": False, "error": "Timed out waiting for the model"}
+                    return
+                yield event
+                if "delta" not in event:
+                    return
+        finally:
+            self._forget(job_id)
+
+    def status(self) -> dict:
+        statuses = [s for s in self._statuses if s]
+        merged = dict(statuses[0]) if statuses else {"ok": True, "model": MODEL_NAME, "state": "loading"}
+        states = [s["state"] for s in statuses]
+        # Usable as soon as one process is
+        merged["state"] = next((state for state in ("ready", "unloaded", "loading") if state in states),
+                               states[0] if states else "loading")
+        for key in ("served", "failed", "loads", "unloads"):
+            merged[key] = sum(s.get(key) or 0 for s in statuses)
+        for key in ("model_mb", "rss_mb"):
+            merged[key] = round(sum(s.get(key) or 0 for s in statuses), 1) or None
+        merged["busy"] = any(s.get("busy") for s in statuses)
+        merged["queued"] = max(0, len(self._pending) - sum(bool(s.get("busy")) for s in statuses))
+        merged["workers"] = self.n_workers
+        merged["workers_alive"] = sum(p.is_alive() for p in self.processes)
+        merged["threads"] = sum(s.get("threads") or 0 for s in statuses) or None
+        merged["pid"] = os.getpid()
+        return merged
+
+    def stop(self):
+        for _ in self.processes:
+            self.jobs.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+        self.results.put(None)
+        self._collector.join(timeout=5)
+
+
+def _deadline(deadline_sec):
+    return time.monotonic() + float(deadline_sec) if deadline_sec else None
+
+
+def _stop_reason(job: dict):
+    """'cancelled' or 'deadline' once the job should stop generating, else None (checked per token)."""
+    if job.get("cancel") and job["cancel"].is_set():
+        return "cancelled"
+    if job.get("deadline") and time.monotonic() >= job["deadline"]:
+        return "deadline"
+    return None
+
+
+def _prefix_of(request: dict):
+    """The request's constant prompt prefix, if it really is one."""
+    prefix, prompt = request.get("prefix"), request.get("prompt")
+    return prefix if isinstance(prefix, str) and prefix and prompt.startswith(prefix) else None
+
+
+class InferenceRequestHandler(socketserver.StreamRequestHandler):
+    """Reads JSON requests line by line and writes one JSON reply per request."""
+
+    def handle(self):
+        for raw in self.rfile:
+            try:
+                request = json.loads(raw.decode("utf-8"))
+                if not isinstance(request, dict):
+                    raise ValueError("A request must be a JSON object")
+                if request.get("op") == "generate_stream":
+                    self._stream(request)
+                    continue
+                reply = self.server.dispatch(request)
+            except ValueError:
+                reply = {"ok": False, "error": "Malformed request"}
+            self._send(reply)
+
+    def _send(self, reply: dict):
+        self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+    def _stream(self, request: dict):
+        prompt = request.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            self._send({"ok": False, "error": "A non-empty prompt is required"})
+            return
+        events = self.server.worker.stream(prompt, request.get("params"), prefix=_prefix_of(request),
+                                           deadline_sec=request.get("deadline_sec"))
+        try:
+            for event in events:
+                self._send(event)
+        except OSError:
+            pass   # client hung up; closing the stream below cancels generation
+        finally:
+            events.close()
+
+
+class InferenceServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, model_path: str = MODEL_PATH,
+                 workers: int = INFER_WORKERS):
+        super().__init__((host, port), InferenceRequestHandler)
+        self.worker = ModelWorker(model_path) if workers <= 1 else ProcessWorkerPool(workers, model_path)
+
+    def dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "status":
+            return self.worker.status()
+        if op == "generate":
+            prompt = request.get("prompt")
+            if not isinstance(prompt, str) or not prompt.strip():
+                return {"ok": False, "error": "A non-empty prompt is required"}
+            return self.worker.submit(prompt, request.get("params"), prefix=_prefix_of(request),
+                                      deadline_sec=request.get("deadline_sec"))
+        if op == "generate_batch":
+            prompts = request.get("prompts")
+            if not isinstance(prompts, list) or not prompts or not all(
+                    isinstance(p, str) and p.strip() for p in prompts):
+                return {"ok": False, "error": "A non-empty list of prompts is required"}
+            if len(prompts) > MAX_BATCH_PROMPTS:
+                return {"ok": False, "error": f"At most {MAX_BATCH_PROMPTS} prompts per batch"}
+            # A batch may take a while longer than one prompt
+            return self.worker.submit(prompts, request.get("params"), timeout=GENERATE_TIMEOUT * 2)
+        if op == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {"ok": True}
+        return {"ok": False, "error": f"Unknown op: {op}"}
+
+    def serve(self):
+        self.worker.start()
+        print(f"🧠 Inference service listening on {self.server_address[0]}:{self.server_address[1]} (pid {os.getpid()})")
+        try:
+            self.serve_forever()
+        finally:
+            self.worker.stop()
+            self.server_close()
+
+
+if __name__ == "__main__":
+    # Long-lived local service shared by goals_ui and goal_tasks_app: python inference_server.py
+    try:
+        server = InferenceServer()
+    except OSError as e:
+        print(f"❌ Could not bind {DEFAULT_HOST}:{DEFAULT_PORT} (already running?): {e}")
+        sys.exit(1)
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
@@ -10,6 +10,7 @@ TRANSLATIONS = {
         "active_meds": "Active Meds",
         "active_goals": "Active Goals",
         "monthly_expense": "Monthly Expense",
+        "budget_alerts": "Budget Alerts",
         "task_management": "Task Management",
         "expense_tracker": "Expense Tracker",
         "goal_setting": "Goal Setting",
@@ -39,6 +40,7 @@ TRANSLATIONS = {
         "active_meds": "সক্রিয় ঔষধ",
         "active_goals": "সক্রিয় লক্ষ্য",
         "monthly_expense": "মাসিক খরচ",
+        "budget_alerts": "বাজেট সতর্কতা",
         "task_management": "টাস্ক ম্যানেজমেন্ট",
         "expense_tracker": "খরচ ট্র্যাকার",
         "goal_setting": "লক্ষ্য নির্ধারণ",
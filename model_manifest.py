@@ -0,0 +1,120 @@
+# model_manifest.py
+import hashlib
+import json
+import os
+import sys
+import time
+
+# --- Model Manifest Configuration ---
+MANIFEST_FILE = "manifest.json"
+# Same directory as model_runtime.MODEL_PATH; repeated here so the UI processes need not import torch
+MODEL_CACHE_DIR = os.path.join(".", "model_cache", "distilgpt2")
+HASH_CHUNK = 1 << 20   # bytes read per hashing step
+
+
+class ManifestError(RuntimeError):
+    """A model directory does not match its manifest (missing, resized or corrupted files)."""
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _model_files(directory: str) -> list:
+    found = []
+    for dirpath, _, files in os.walk(directory):
+        for name in files:
+            rel = os.path.relpath(os.path.join(dirpath, name), directory).replace(os.sep, "/")
+            if rel != MANIFEST_FILE:
+                found.append(rel)
+    return sorted(found)
+
+
+def write_manifest(directory: str) -> dict:
+    """Hash every file of ``directory`` once and record size, mtime and SHA-256 in its manifest."""
+    files = {}
+    for rel in _model_files(directory):
+        path = os.path.join(directory, rel)
+        st = os.stat(path)
+        files[rel] = {"size": st.st_size, "mtime": int(st.st_mtime), "sha256": file_sha256(path)}
+    manifest = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "files": files}
+    tmp = os.path.join(directory, MANIFEST_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(directory, MANIFEST_FILE))
+    return manifest
+
+
+def read_manifest(directory: str):
+    """The manifest of ``directory``, or None when it has none (caches from older downloads)."""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        raise ManifestError(f"Unreadable manifest in '{directory}': {e}") from e
+
+
+def verify_manifest(directory: str, deep: bool = False, required: bool = False) -> dict:
+    """Check ``directory`` against its manifest; raises ManifestError listing every mismatch.
+
+    The cheap check only stats files: a file is hashed only when its mtime changed
+    (e.g. after a copy), so an intact cache is verified without reading the weights.
+    ``deep`` hashes every file; ``required`` also fails a directory without a manifest.
+    Returns ``{"manifest", "files", "hashed"}``.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        if required:
+            raise ManifestError(f"'{directory}' has no {MANIFEST_FILE}; rebuild it with "
+                                "`download_model.py --optimize-only`.")
+        return {"manifest": False, "files": 0, "hashed": 0}
+    problems, hashed = [], 0
+    for rel, expected in manifest.get("files", {}).items():
+        path = os.path.join(directory, rel)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            problems.append(f"{rel}: missing")
+            continue
+        if st.st_size != expected["size"]:
+            problems.append(f"{rel}: size {st.st_size} != {expected['size']}")
+            continue
+        if deep or int(st.st_mtime) != expected["mtime"]:
+            hashed += 1
+            if file_sha256(path) != expected["sha256"]:
+                problems.append(f"{rel}: checksum mismatch")
+    if problems:
+        raise ManifestError(f"Model cache '{directory}' is damaged ({'; '.join(problems)}). "
+                            "Run `download_model.py` again.")
+    return {"manifest": True, "files": len(manifest.get("files", {})), "hashed": hashed}
+
+
+if __name__ == "__main__":
+    # Check or (re)write a model directory's manifest:
+    # python model_manifest.py [directory] [--deep | --write]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    target = args[0] if args else MODEL_CACHE_DIR
+    if not os.path.isdir(target):
+        print(f"❌ No model directory at '{target}'.")
+        sys.exit(1)
+    t0 = time.perf_counter()
+    if "--write" in sys.argv[1:]:
+        written = write_manifest(target)
+        print(f"✅ Manifest written for {len(written['files'])} files in {time.perf_counter() - t0:.2f}s")
+        sys.exit(0)
+    try:
+        result = verify_manifest(target, deep="--deep" in sys.argv[1:])
+    except ManifestError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if not result["manifest"]:
+        print(f"⚠️ '{target}' has no {MANIFEST_FILE}; create one with --write.")
+    else:
+        print(f"✅ {result['files']} files match the manifest ({result['hashed']} hashed) "
+              f"in {(time.perf_counter() - t0) * 1000:.1f} ms")
@@ -0,0 +1,521 @@
+# model_runtime.py
+import copy
+import hashlib
+import importlib.util
+import os
+import shutil
+import time
+from collections import OrderedDict
+
+from model_manifest import ManifestError, verify_manifest, write_manifest
+
+# Optional: transformers/torch are only needed by the inference service process
+try:
+    import torch
+    from transformers import (AutoConfig, AutoModelForCausalLM, AutoTokenizer, LogitsProcessor,
+                              LogitsProcessorList, StoppingCriteria, StoppingCriteriaList, TextStreamer)
+    _TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    torch = None
+    AutoConfig, AutoModelForCausalLM, AutoTokenizer = None, None, None
+    LogitsProcessor, LogitsProcessorList = object, None
+    StoppingCriteria, StoppingCriteriaList, TextStreamer = object, None, object
+    _TRANSFORMERS_AVAILABLE = False
+
+# Optional: reusable KV caches need a transformers version with DynamicCache
+try:
+    from transformers import DynamicCache
+except ImportError:
+    DynamicCache = None
+
+# Optional: ONNX Runtime through Hugging Face Optimum (pip install optimum[onnxruntime])
+try:
+    from optimum.onnxruntime import ORTModelForCausalLM
+    _ONNX_AVAILABLE = True
+except ImportError:
+    ORTModelForCausalLM = None
+    _ONNX_AVAILABLE = False
+
+# --- AI Model Configuration ---
+MODEL_NAME = "distilgpt2"
+MODEL_PATH = os.path.join(".", "model_cache", MODEL_NAME)
+INT8_WEIGHTS = "int8_state_dict.pt"
+SAFETENSORS_WEIGHTS = "model.safetensors"
+# Backend: "auto" picks the fastest artifact present (onnx > int8 > fp32)
+BACKEND = os.getenv("LM_INFER_BACKEND", "auto").lower()
+BACKENDS = ("onnx", "int8", "fp32")
+
+# Optimized artifacts must agree with fp32 on at least this share of next-token choices
+MIN_TOP1_AGREEMENT = 0.9
+TOLERANCE_PROMPTS = (
+    "Create a short, numbered list of tasks for the following goal.\nGoal: Learn Excel\n\nTasks:\n1.",
+    "Goal: Run a half marathon\nDescription: in 3 months\n\nHere are the tasks:\n1.",
+    "Goal: Save money for a trip\n\nTasks:\n1.",
+)
+
+MAX_CACHED_PREFIXES = 8   # distinct constant prompt prefixes kept as precomputed KV caches
+WARMUP_NEW_TOKENS = 8
+MIN_ITEM_WORDS = 2        # constrained task lists: shortest item that may end its line
+
+# Sampling settings shared by every client; requests may override only these keys
+DEFAULT_GENERATION = {
+    "max_new_tokens": 100,
+    "no_repeat_ngram_size": 2,
+    "temperature": 0.7,
+    "top_k": 50,
+    "top_p": 0.95,
+    "do_sample": True,
+}
+
+
+def artifact_path(backend: str, model_path: str = MODEL_PATH) -> str:
+    """Directory holding the optimized artifact for ``backend`` (next to the fp32 cache)."""
+    return model_path if backend == "fp32" else f"{model_path.rstrip(os.sep)}-{backend}"
+
+
+def _artifact_verified(backend: str, model_path: str) -> bool:
+    """Whether an optimized artifact matches the manifest written when it was exported."""
+    try:
+        verify_manifest(artifact_path(backend, model_path), required=True)
+        return True
+    except ManifestError as e:
+        print(f"⚠️ Ignoring the {backend} model: {e}")
+        return False
+
+
+def available_backends(model_path: str = MODEL_PATH) -> list:
+    """Backends whose artifact exists, passes its manifest and whose runtime is installed, fastest first."""
+    found = []
+    if _ONNX_AVAILABLE and os.path.isdir(artifact_path("onnx", model_path)) and _artifact_verified("onnx", model_path):
+        found.append("onnx")
+    if (_TRANSFORMERS_AVAILABLE and os.path.exists(os.path.join(artifact_path("int8", model_path), INT8_WEIGHTS))
+            and _artifact_verified("int8", model_path)):
+        found.append("int8")
+    if os.path.isdir(model_path):
+        found.append("fp32")
+    return found
+
+
+def artifact_size_mb(backend: str, model_path: str = MODEL_PATH) -> float:
+    """On-disk size of ``backend``'s artifact, a rough lower bound for its memory once loaded."""
+    total = 0
+    for dirpath, _, files in os.walk(artifact_path(backend, model_path)):
+        total += sum(os.path.getsize(os.path.join(dirpath, name)) for name in files)
+    return total / 2 ** 20
+
+
+def select_backend(model_path: str = MODEL_PATH, preferred: str = None, max_mb: float = None) -> str:
+    """The backend to load; "auto" takes the fastest one whose artifact fits ``max_mb`` (else the smallest)."""
+    preferred = (preferred or BACKEND).lower()
+    found = available_backends(model_path)
+    if preferred != "auto":
+        if preferred not in found:
+            raise RuntimeError(f"Backend '{preferred}' is not available (found: {', '.join(found) or 'none'}).")
+        return preferred
+    if not found:
+        return "fp32"
+    if max_mb:
+        sizes = {backend: artifact_size_mb(backend, model_path) for backend in found}
+        fitting = [backend for backend in found if sizes[backend] <= max_mb]
+        return fitting[0] if fitting else min(found, key=sizes.get)
+    return found[0]
+
+
+def model_fingerprint(model_path: str = MODEL_PATH, backend: str = "fp32") -> str:
+    """Cheap identity of the loaded weights (file names, sizes and mtimes), used to invalidate caches."""
+    digest = hashlib.sha1(f"{MODEL_NAME}:{backend}".encode("utf-8"))
+    root = artifact_path(backend, model_path)
+    for dirpath, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            st = os.stat(os.path.join(dirpath, name))
+            digest.update(f"{name}:{st.st_size}:{int(st.st_mtime)}".encode("utf-8"))
+    return f"{MODEL_NAME}/{backend}/{digest.hexdigest()[:12]}"
+
+
+def _conv1d_to_linear(model):
+    """Swap GPT-2's Conv1D projections for nn.Linear so dynamic quantization can reach them."""
+    from transformers.pytorch_utils import Conv1D
+
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if isinstance(child, Conv1D):
+                n_in, n_out = child.weight.shape
+                linear = torch.nn.Linear(n_in, n_out)
+                linear.weight.data = child.weight.data.t().contiguous()
+                linear.bias.data = child.bias.data
+                setattr(parent, name, linear)
+    return model
+
+
+def _quantize(model):
+    return torch.quantization.quantize_dynamic(_conv1d_to_linear(model), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_model(model_path: str = MODEL_PATH, backend: str = "fp32"):
+    """Load tokenizer and model for ``backend`` from the local cache only; returns ``(model, tokenizer)``."""
+    if not _TRANSFORMERS_AVAILABLE:
+        raise RuntimeError("The 'transformers' library is not installed (pip install transformers).")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(
+            f"The model cache was not found at '{model_path}'. Please run `download_model.py` first."
+        )
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    if backend != "fp32":
+        # Optimized artifacts are only loaded when they match their export manifest (the int8
+        # weights are unpickled below)
+        verify_manifest(artifact_path(backend, model_path), required=True)
+    if backend == "onnx":
+        model = ORTModelForCausalLM.from_pretrained(artifact_path("onnx", model_path), local_files_only=True)
+    elif backend == "int8":
+        # Rebuild the quantized module tree from the config, then load the int8 weights into it
+        config = AutoConfig.from_pretrained(model_path, local_files_only=True)
+        model = _quantize(AutoModelForCausalLM.from_config(config))
+        # Packed int8 params are not plain tensors; the file is our own artifact, checked above.
+        # mmap: plain tensors are paged in from the file instead of read up front.
+        state = torch.load(os.path.join(artifact_path("int8", model_path), INT8_WEIGHTS), map_location="cpu",
+                           weights_only=False, mmap=True)
+        model.load_state_dict(state)
+        model.eval()
+    else:
+        model = AutoModelForCausalLM.from_pretrained(model_path, local_files_only=True, **_fast_load_kwargs(model_path))
+        model.eval()
+    return model, tokenizer
+
+
+def _fast_load_kwargs(model_path: str) -> dict:
+    """Read safetensors weights through a memory map, and skip the random init when accelerate allows it."""
+    kwargs = {}
+    if os.path.exists(os.path.join(model_path, SAFETENSORS_WEIGHTS)):
+        kwargs["use_safetensors"] = True
+    if importlib.util.find_spec("accelerate") is not None:
+        kwargs["low_cpu_mem_usage"] = True
+    return kwargs
+
+
+def generation_params(overrides=None) -> dict:
+    """Defaults merged with the known keys of ``overrides`` (unknown keys are dropped)."""
+    params = dict(DEFAULT_GENERATION)
+    for key, value in (overrides or {}).items():
+        if key in DEFAULT_GENERATION and value is not None:
+            params[key] = type(DEFAULT_GENERATION[key])(value)
+    return params
+
+
+class PrefixCache:
+    """Past key/values of constant prompt prefixes, computed once per model and reused by every request.
+
+    Only the goal-specific suffix is encoded per request. Torch backends only;
+    used from the worker thread alone, so no locking.
+    """
+
+    def __init__(self, model, tokenizer, max_entries: int = MAX_CACHED_PREFIXES):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.enabled = DynamicCache is not None and torch is not None and isinstance(model, torch.nn.Module)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def _entry(self, prefix: str):
+        entry = self._entries.get(prefix)
+        if entry is not None:
+            self._entries.move_to_end(prefix)
+            return entry
+        ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"]
+        with torch.no_grad():
+            past = self.model(ids, use_cache=True).past_key_values
+        if not isinstance(past, DynamicCache):
+            past = DynamicCache.from_legacy_cache(past)
+        entry = self._entries[prefix] = (ids, past)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def past_for(self, prefix: str, input_ids):
+        """A private copy of the KV cache for ``prefix`` if it is a strict token prefix of ``input_ids``."""
+        if not self.enabled or not prefix or input_ids.shape[0] != 1:
+            return None
+        ids, past = self._entry(prefix)
+        n = ids.shape[1]
+        # BPE may merge across the boundary; then the cached tokens are not a prefix and are skipped
+        if input_ids.shape[1] <= n or not torch.equal(input_ids[0, :n], ids[0]):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(past)   # generate() extends the cache in place
+
+    def clear(self):
+        """Drop every cached prefix (they are recomputed on the next request that uses them)."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "prefixes": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class _StopWhen(StoppingCriteria):
+    def __init__(self, should_stop):
+        self.should_stop = should_stop
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.full((input_ids.shape[0],), bool(self.should_stop()), dtype=torch.bool)
+
+
+_grammars = {}
+
+
+class TaskListGrammar:
+    """Vocabulary masks for numbered task lists, computed once per tokenizer and shared by all requests."""
+
+    def __init__(self, tokenizer, vocab_size: int):
+        self.tokenizer = tokenizer
+        pieces = tokenizer.batch_decode([[i] for i in range(min(len(tokenizer), vocab_size))])
+        pieces += [""] * (vocab_size - len(pieces))   # padded embedding rows decode to nothing
+        self.newline_id = tokenizer.encode("\n", add_special_tokens=False)[0]
+        self.eos_id = tokenizer.eos_token_id
+        # Every token that would break the "N. phrase\n" layout: other newlines and empty pieces
+        self.off_grammar = torch.tensor(["\n" in p or not p for p in pieces], dtype=torch.bool)
+        self.off_grammar[self.newline_id] = False
+        if self.eos_id is not None:
+            self.off_grammar[self.eos_id] = False
+        self.word_starts = torch.tensor([p[:1].isspace() and "\n" not in p for p in pieces], dtype=torch.bool)
+        self._pieces = pieces
+        self._word_masks = {}
+        self._token_of = {}
+
+    def banned_words(self, words) -> "torch.Tensor":
+        """Mask of tokens that spell one of ``words`` on their own (case-insensitive)."""
+        key = frozenset(w.lower() for w in words)
+        mask = self._word_masks.get(key)
+        if mask is None:
+            mask = torch.tensor([p.strip().lower() in key for p in self._pieces], dtype=torch.bool)
+            self._word_masks[key] = mask
+        return mask
+
+    def first_token(self, text: str) -> int:
+        token = self._token_of.get(text)
+        if token is None:
+            token = self._token_of[text] = self.tokenizer.encode(text, add_special_tokens=False)[0]
+        return token
+
+
+def release_grammars():
+    """Forget the vocabulary masks (call when the model and tokenizer are unloaded)."""
+    _grammars.clear()
+
+
+def task_list_grammar(model, tokenizer) -> TaskListGrammar:
+    vocab_size = getattr(model.config, "vocab_size", None) or len(tokenizer)
+    key = (id(tokenizer), vocab_size)
+    if key not in _grammars:
+        _grammars[key] = TaskListGrammar(tokenizer, vocab_size)
+    return _grammars[key]
+
+
+class TaskListProcessor(LogitsProcessor):
+    """Lets the model write only ``"N. <phrase>\n"`` lines and stops after ``max_items`` of them.
+
+    Item numbers are forced, an item needs MIN_ITEM_WORDS words before its newline
+    and may not start a word past ``max_words``; tokens of ``ban_words`` are never
+    chosen. The state is re-read from the decoded text of each row, so batches and
+    reused prefix caches need no bookkeeping. ``heads`` is the unfinished last line
+    of each prompt (e.g. "1.").
+    """
+
+    def __init__(self, grammar: TaskListGrammar, prompt_len: int, heads, max_items: int, max_words: int = 10,
+                 ban_words=()):
+        self.grammar = grammar
+        self.prompt_len = prompt_len
+        self.heads = list(heads)
+        self.max_items = max_items
+        self.max_words = max_words
+        self.banned = grammar.off_grammar | grammar.banned_words(ban_words) if ban_words else grammar.off_grammar
+
+    def __call__(self, input_ids, scores):
+        tokenizer = self.grammar.tokenizer
+        for row in range(input_ids.shape[0]):
+            text = tokenizer.decode(input_ids[row, self.prompt_len:], skip_special_tokens=True)
+            self._constrain(scores[row], self.heads[row] + text)
+        return scores
+
+    def _constrain(self, scores, text: str):
+        g = self.grammar
+        lines = text.split("\n")
+        done = len(lines) - 1
+        if done >= self.max_items:
+            return self._force(scores, g.eos_id if g.eos_id is not None else g.newline_id)
+        line, header = lines[-1], f"{done + 1}."
+        if len(line) < len(header) and header.startswith(line):
+            return self._force(scores, g.first_token(header[len(line):]))
+        body = line[len(header):]
+        words = len(body.split())
+        banned = self.banned.clone()
+        if g.eos_id is not None:
+            banned[g.eos_id] = True
+        if not body:
+            banned |= ~g.word_starts          # "1. Learn", never "1.Learn"
+        if words < MIN_ITEM_WORDS:
+            banned[g.newline_id] = True
+        elif words >= self.max_words:
+            banned |= g.word_starts           # finish the current word, then the line
+        scores.masked_fill_(banned, float("-inf"))
+        if torch.isinf(scores).all():
+            # Other processors (e.g. no_repeat_ngram_size) removed every allowed token: end the item
+            scores[g.newline_id] = 0.0
+
+    @staticmethod
+    def _force(scores, token_id: int):
+        scores.fill_(float("-inf"))
+        scores[token_id] = 0.0
+
+
+def _task_list_kwargs(model, tokenizer, prompts, prompt_len: int, overrides: dict) -> dict:
+    """``logits_processor`` for requests that ask for a task list (``list_items``, ``item_words``, ``ban_words``)."""
+    max_items = overrides.get("list_items")
+    if not max_items or torch is None:
+        return {}
+    processor = TaskListProcessor(
+        task_list_grammar(model, tokenizer), prompt_len, [p.rsplit("\n", 1)[-1] for p in prompts], int(max_items),
+        int(overrides.get("item_words") or 10), [w for w in overrides.get("ban_words") or () if isinstance(w, str)],
+    )
+    return {"logits_processor": LogitsProcessorList([processor])}
+
+
+def _extra_kwargs(inputs, prefix_cache, prefix, should_stop) -> dict:
+    extra = {}
+    past = prefix_cache.past_for(prefix, inputs["input_ids"]) if prefix_cache and prefix else None
+    if past is not None:
+        extra["past_key_values"] = past
+    if should_stop:
+        # Checked after every token: cancellation and deadlines end generation mid-sequence
+        extra["stopping_criteria"] = StoppingCriteriaList([_StopWhen(should_stop)])
+    return extra
+
+
+def generate_text(model, tokenizer, prompt: str, prefix_cache: PrefixCache = None, prefix: str = None,
+                  should_stop=None, **overrides) -> str:
+    """Run one generation and return the decoded text (prompt included).
+
+    With ``prefix_cache`` and a constant ``prefix`` of ``prompt``, the prefix is not re-encoded;
+    generation ends early once ``should_stop()`` is true. ``list_items`` in ``overrides`` constrains
+    the output to that many numbered items (see TaskListProcessor).
+    """
+    inputs = tokenizer(prompt, return_tensors="pt")
+    outputs = model.generate(
+        **inputs,
+        num_return_sequences=1,
+        pad_token_id=tokenizer.eos_token_id,
+        **_extra_kwargs(inputs, prefix_cache, prefix, should_stop),
+        **_task_list_kwargs(model, tokenizer, [prompt], inputs["input_ids"].shape[1], overrides),
+        **generation_params(overrides),
+    )
+    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+
+def warm_up(model, tokenizer, prefix_cache: PrefixCache = None, prompts=()) -> float:
+    """Run short generations so lazy initialization is paid before the first request; returns seconds.
+
+    ``prompts`` are ``(prefix, prompt)`` pairs; their prefixes end up in ``prefix_cache``.
+    """
+    t0 = time.perf_counter()
+    if torch is not None:
+        task_list_grammar(model, tokenizer)   # vocabulary masks for constrained task lists
+    for prefix, prompt in prompts or ((None, TOLERANCE_PROMPTS[0]),):
+        generate_text(model, tokenizer, prompt, prefix_cache, prefix, max_new_tokens=WARMUP_NEW_TOKENS,
+                      do_sample=False)
+    return time.perf_counter() - t0
+
+
+def generate_batch(model, tokenizer, prompts, **overrides) -> list:
+    """Generate for several prompts in one left-padded batch; returns decoded texts in prompt order."""
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    # Decoder-only models continue from the last position, so pad on the left
+    tokenizer.padding_side = "left"
+    prompts = list(prompts)
+    inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+    outputs = model.generate(
+        **inputs,
+        num_return_sequences=1,
+        pad_token_id=tokenizer.pad_token_id,
+        **_task_list_kwargs(model, tokenizer, prompts, inputs["input_ids"].shape[1], overrides),
+        **generation_params(overrides),
+    )
+    return tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+
+class _CallbackStreamer(TextStreamer):
+    """Hands each decoded chunk of new text (prompt excluded) to ``on_text`` as soon as it is final."""
+
+    def __init__(self, tokenizer, on_text):
+        super().__init__(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        self.on_text = on_text
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.on_text(text)
+
+
+def stream_text(model, tokenizer, prompt: str, on_text, should_stop=None, prefix_cache: PrefixCache = None,
+                prefix: str = None, **overrides) -> str:
+    """Like generate_text, but calls ``on_text(chunk)`` while decoding and stops once ``should_stop()`` is true."""
+    inputs = tokenizer(prompt, return_tensors="pt")
+    outputs = model.generate(
+        **inputs,
+        num_return_sequences=1,
+        pad_token_id=tokenizer.eos_token_id,
+        streamer=_CallbackStreamer(tokenizer, on_text),
+        **_extra_kwargs(inputs, prefix_cache, prefix, should_stop),
+        **_task_list_kwargs(model, tokenizer, [prompt], inputs["input_ids"].shape[1], overrides),
+        **generation_params(overrides),
+    )
+    return tokenizer.decode(outputs[0], skip_special_tokens=True)
+
+
+def compare_backends(reference, candidate, tokenizer, prompts=TOLERANCE_PROMPTS) -> dict:
+    """Next-token agreement and max log-prob difference of ``candidate`` against ``reference``."""
+    agree, total, max_diff = 0, 0, 0.0
+    with torch.no_grad():
+        for prompt in prompts:
+            inputs = tokenizer(prompt, return_tensors="pt")
+            ref = torch.log_softmax(reference(**inputs).logits[0].float(), dim=-1)
+            cand = torch.log_softmax(torch.as_tensor(candidate(**inputs).logits[0]).float(), dim=-1)
+            agree += int((ref.argmax(-1) == cand.argmax(-1)).sum())
+            total += ref.shape[0]
+            max_diff = max(max_diff, float((ref - cand).abs().max()))
+    return {"top1_agreement": agree / max(1, total), "max_logprob_diff": max_diff}
+
+
+def export_int8(model_path: str = MODEL_PATH) -> dict:
+    """Write the dynamically quantized (int8) weights once and check them against fp32."""
+    reference, tokenizer = load_model(model_path, "fp32")
+    out_dir = artifact_path("int8", model_path)
+    os.makedirs(out_dir, exist_ok=True)
+    quantized = _quantize(copy.deepcopy(reference))
+    quantized.eval()
+    torch.save(quantized.state_dict(), os.path.join(out_dir, INT8_WEIGHTS))
+    return _verify_or_discard(reference, quantized, tokenizer, out_dir)
+
+
+def export_onnx(model_path: str = MODEL_PATH) -> dict:
+    """Export the model to ONNX for ONNX Runtime once and check it against fp32."""
+    if not _ONNX_AVAILABLE:
+        raise RuntimeError("ONNX export needs optimum[onnxruntime] (pip install optimum[onnxruntime]).")
+    reference, tokenizer = load_model(model_path, "fp32")
+    out_dir = artifact_path("onnx", model_path)
+    ORTModelForCausalLM.from_pretrained(model_path, export=True, local_files_only=True).save_pretrained(out_dir)
+    tokenizer.save_pretrained(out_dir)
+    candidate = ORTModelForCausalLM.from_pretrained(out_dir, local_files_only=True)
+    return _verify_or_discard(reference, candidate, tokenizer, out_dir)
+
+
+def _verify_or_discard(reference, candidate, tokenizer, out_dir: str) -> dict:
+    metrics = compare_backends(reference, candidate, tokenizer)
+    if metrics["top1_agreement"] < MIN_TOP1_AGREEMENT:
+        # Never leave an artifact behind that the loader would pick automatically
+        shutil.rmtree(out_dir, ignore_errors=True)
+        raise RuntimeError(
+            f"Optimized model disagrees with fp32 (top-1 agreement {metrics['top1_agreement']:.1%}); discarded."
+        )
+    write_manifest(out_dir)
+    return metrics
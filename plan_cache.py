@@ -0,0 +1,136 @@
+# plan_cache.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+
+# --- Plan Cache Configuration ---
+CACHE_FILE = os.path.join(".", "model_cache", "plan_cache.sqlite3")
+MAX_ENTRIES = 2000   # least recently used plans are evicted beyond this
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_goal_text(text: str) -> str:
+    """Casefold, drop punctuation and collapse whitespace so trivially different goals share a key."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def plan_key(title: str, description: str, model_id: str, params: dict) -> str:
+    payload = json.dumps(
+        [normalize_goal_text(title), normalize_goal_text(description), model_id, params or {}],
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """Generated task plans in a local SQLite file, bounded by LRU eviction.
+
+    Every entry records the model it came from; seeing a different model id
+    drops all entries produced by the previous one.
+    """
+
+    def __init__(self, path: str = CACHE_FILE, max_entries: int = MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS plans (
+                    key TEXT PRIMARY KEY,
+                    model_id TEXT NOT NULL,
+                    tasks TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_last_used ON plans (last_used)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+
+    def ensure_model(self, model_id: str):
+        """Invalidate every cached plan when the model changed since the last call."""
+        if not model_id:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'model_id'").fetchone()
+            if row and row[0] == model_id:
+                return
+            self._conn.execute("DELETE FROM plans WHERE model_id <> ?", (model_id,))
+            self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('model_id', ?)", (model_id,))
+
+    def get(self, title: str, description: str, model_id: str, params: dict = None):
+        """Cached task list for the goal, or None."""
+        if not model_id:
+            return None
+        key = plan_key(title, description, model_id, params)
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT tasks FROM plans WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE plans SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, title: str, description: str, model_id: str, params: dict, tasks: list):
+        if not model_id or not tasks:
+            return
+        self.ensure_model(model_id)
+        key = plan_key(title, description, model_id, params)
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plans (key, model_id, tasks, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model_id, json.dumps(list(tasks), ensure_ascii=False), now, now),
+            )
+            # Evict least recently used entries beyond the bound
+            self._conn.execute(
+                """
+                DELETE FROM plans WHERE key IN (
+                    SELECT key FROM plans ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM plans")
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, hits = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM plans").fetchone()
+        return {"entries": count, "hits": hits, "max_entries": self.max_entries}
+
+
+def get_plan_cache():
+    """Shared per-process plan cache (None if the cache file cannot be opened)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = PlanCache()
+            except sqlite3.Error as e:
+                print(f"Plan cache unavailable: {e}")
+                return None
+        return _cache
+
+
+if __name__ == "__main__":
+    # Inspect or empty the cache: python plan_cache.py [--clear]
+    cache = get_plan_cache()
+    if cache is None:
+        sys.exit(1)
+    if "--clear" in sys.argv[1:]:
+        cache.clear()
+    print(cache.stats())
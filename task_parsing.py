@@ -0,0 +1,135 @@
+# task_parsing.py
+import os
+import re
+
+from goal_planner import limit_words
+
+_NUMBERED_ITEM = re.compile(r"\d+\.\s*(.+)")
+
+# Constrained decoding: the AI service lets the model write only "N. <short phrase>" lines and stops
+# after the last wanted item (see model_runtime.TaskListProcessor). Set LM_CONSTRAINED_DECODING=0 to
+# go back to free-form output that is only parsed afterwards.
+CONSTRAINED_DECODING = os.getenv("LM_CONSTRAINED_DECODING", "1") != "0"
+MAX_TASK_WORDS = 10
+
+# Goal-screen prompt settings; part of the plan cache key, so bump "prompt" when the prompt or parsing changes
+GOAL_PROMPT_PARAMS = {"prompt": "goals_ui/v2", "max_new_tokens": 100, "max_tasks": 7,
+                      "constrained": CONSTRAINED_DECODING}
+# A generation cut short by its deadline is kept only if it produced at least this many tasks
+MIN_USEFUL_TASKS = 3
+
+# Keywords of old, irrelevant example responses the small model tends to copy
+FILTER_KEYWORDS = ("python", "numpy", "pandas", "matplotlib", "data analysis", "skill")
+
+
+# A much simpler and more direct prompt to avoid confusing the small model.
+# It no longer contains a complex example that the model might copy.
+# Constant, so the inference service can reuse its encoded form (see model_runtime.PrefixCache).
+GOAL_PROMPT_PREFIX = (
+    "Create a short, numbered list of tasks for the following goal. "
+    "Base the tasks ONLY on the Goal and Description provided.\n"
+)
+
+
+def goal_prompt(title: str, description: str) -> str:
+    """Prompt for a goal's task list; ends inside item 1 so the model continues the list."""
+    return (
+        GOAL_PROMPT_PREFIX +
+        f"Goal: {title}\n"
+        f"Description: {description}\n\n"
+        "Tasks:\n1."
+    )
+
+
+def task_list_params(max_tasks: int, max_words: int = MAX_TASK_WORDS) -> dict:
+    """Generation params asking for exactly ``max_tasks`` short numbered items ({} when not constrained)."""
+    if not CONSTRAINED_DECODING:
+        return {}
+    # Single-word keywords can be banned token by token; the rest is still left to clean_task
+    return {"list_items": max_tasks, "item_words": max_words,
+            "ban_words": [keyword for keyword in FILTER_KEYWORDS if " " not in keyword]}
+
+
+def clean_task(task: str, max_words: int = MAX_TASK_WORDS):
+    """Filtered and shortened task text, or None when the task should be dropped."""
+    lowered = task.lower()
+    if any(keyword in lowered for keyword in FILTER_KEYWORDS):
+        return None
+    return limit_words(task, max_words) or None
+
+
+class TaskStreamParser:
+    """Turns streamed model text into numbered tasks, one per completed line.
+
+    ``prefix`` is the part of the list already in the prompt (e.g. "1."), so the
+    first streamed line is recognized as item 1.
+    """
+
+    def __init__(self, clean=clean_task, max_tasks: int = None, prefix: str = "1."):
+        self.clean = clean
+        self.max_tasks = max_tasks
+        self.tasks = []
+        self._buffer = prefix
+
+    @property
+    def done(self) -> bool:
+        return self.max_tasks is not None and len(self.tasks) >= self.max_tasks
+
+    def feed(self, chunk: str) -> list:
+        """Add streamed text; returns the tasks completed by it."""
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        return self._take(lines)
+
+    def close(self) -> list:
+        """Flush the trailing line once the stream ends."""
+        line, self._buffer = self._buffer, ""
+        return self._take([line])
+
+    def _take(self, lines) -> list:
+        found = []
+        for line in lines:
+            if self.done:
+                break
+            for item in _NUMBERED_ITEM.findall(line):
+                task = self.clean(item) if self.clean else item.strip()
+                if task:
+                    self.tasks.append(task)
+                    found.append(task)
+        return found
+
+
+def collect_streamed_tasks(chunks, parser: TaskStreamParser, on_task=None, interrupted=None) -> list:
+    """Feed streamed ``chunks`` to ``parser`` until the stream ends or the parser has enough tasks.
+
+    The stream is closed on exit, which cancels the remaining generation. The trailing
+    line is only kept when the stream was not ``interrupted()`` (it may be cut mid-task).
+    """
+    def emit(tasks):
+        for task in tasks:
+            if on_task:
+                on_task(task)
+
+    try:
+        for chunk in chunks:
+            emit(parser.feed(chunk))
+            if parser.done:
+                break
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+    if not (interrupted and interrupted()):
+        emit(parser.close())
+    return parser.tasks
+
+
+def parse_tasks(text: str, clean=clean_task, marker: str = "Tasks:") -> list:
+    """All numbered tasks after ``marker`` in a complete generation."""
+    head, found, section = text.partition(marker)
+    if not found:
+        return []
+    parser = TaskStreamParser(clean, prefix="")
+    parser.feed(section)
+    parser.close()
+    return parser.tasks
@@ -0,0 +1,75 @@
+# ui_dispatch.py
+import queue
+import threading
+import tkinter as tk
+import traceback
+
+# --- UI Dispatch Configuration ---
+PUMP_INTERVAL_MS = 30     # how often the Tk thread drains posted calls
+MAX_CALLS_PER_PUMP = 200  # keep each pump short so input events stay responsive
+
+
+class UIDispatcher:
+    """Runs calls posted from worker threads on the Tk main loop.
+
+    Workers never touch Tk themselves: ``post`` queues a call in order, and
+    ``post_latest`` keeps only the newest call per key (e.g. a status line that
+    changes per token), applied once per pump. Calls aimed at widgets that were
+    destroyed meanwhile are dropped.
+    """
+
+    def __init__(self, root, interval_ms: int = PUMP_INTERVAL_MS):
+        self.root = root
+        self.interval_ms = interval_ms
+        self._calls = queue.SimpleQueue()
+        self._latest = {}
+        self._latest_lock = threading.Lock()
+        self._closed = False
+        self.root.after(self.interval_ms, self._pump)
+
+    def post(self, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` for the Tk thread (safe from any thread)."""
+        self._calls.put((fn, args, kwargs))
+
+    def post_latest(self, key, fn, *args, **kwargs):
+        """Like post, but a later call with the same ``key`` replaces one not yet run."""
+        with self._latest_lock:
+            self._latest[key] = (fn, args, kwargs)
+
+    def _apply(self, fn, args, kwargs):
+        try:
+            fn(*args, **kwargs)
+        except tk.TclError:
+            pass   # target widget was destroyed (screen closed) before the call ran
+        except Exception:
+            traceback.print_exc()
+
+    def _pump(self):
+        if self._closed:
+            return
+        for _ in range(MAX_CALLS_PER_PUMP):
+            try:
+                fn, args, kwargs = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            self._apply(fn, args, kwargs)
+        with self._latest_lock:
+            latest, self._latest = self._latest, {}
+        for fn, args, kwargs in latest.values():
+            self._apply(fn, args, kwargs)
+        try:
+            self.root.after(self.interval_ms, self._pump)
+        except tk.TclError:
+            self._closed = True   # application is shutting down
+
+    def close(self):
+        self._closed = True
+
+
+def get_dispatcher(widget) -> UIDispatcher:
+    """The dispatcher of ``widget``'s toplevel window, created on first use (call from the Tk thread)."""
+    root = widget.winfo_toplevel()
+    dispatcher = getattr(root, "_ui_dispatcher", None)
+    if dispatcher is None:
+        dispatcher = root._ui_dispatcher = UIDispatcher(root)
+    return dispatcher